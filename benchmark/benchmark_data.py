@@ -0,0 +1,53 @@
+"""
+Author........... Gabriel Böhnke
+University....... UCLouvain, Faculty of bioscience engineering
+Email............ gabriel.bohnke@student.uclouvain.be
+
+Description...... bundled raw data (GEE_RAW_DATA) for benchmarks, in legacy or chunk layout
+Version.......... 1.00
+Last changed on.. 17.10.2026
+"""
+
+import os
+import pandas as pd
+from util.raw_data_cache_util import gee_raw_data_directory, legacy_file_name_pattern, raw_data_category_dict, \
+    get_chunk_list, load_bands
+
+
+def get_bundled_location_list():
+    # location keys of GEE_RAW_DATA, e.g. 00945730_03647590
+    location_set = set()
+    for file_name in os.listdir(gee_raw_data_directory):
+        match = legacy_file_name_pattern.match(file_name)
+        if match is not None:
+            location_set.add(match.group(1))
+        elif os.path.isdir(gee_raw_data_directory + '/' + file_name):
+            location_set.add(file_name)
+    return sorted(location_set)
+
+
+def load_bundled_raw_data(location_key, category):
+    # raw data of a category ('pcp', 'tmp', ...), read from a legacy file or assembled from chunk files
+    # returns None if the category is not cached for this location
+    for file_name in sorted(os.listdir(gee_raw_data_directory)):
+        match = legacy_file_name_pattern.match(file_name)
+        if match is not None and match.group(1) == location_key and match.group(4) == category:
+            df_raw = pd.read_csv(gee_raw_data_directory + '/' + file_name)
+            df_raw['datetime'] = pd.to_datetime(df_raw['datetime'])
+            return df_raw
+
+    collection, list_of_bands = raw_data_category_dict[category]
+    chunk_list = get_chunk_list(location_key, collection, list_of_bands[0])
+    if len(chunk_list) == 0:
+        return None
+    return load_bands(location_key, collection, list_of_bands, chunk_list[0][0], max(chunk[1] for chunk in chunk_list))
+
+
+def get_daily_precipitation(df_half_hourly):
+    # same daily reduction as retrieve_station_data.get_daily_precipitation_imerg
+    df_daily = pd.DataFrame({'date': df_half_hourly['datetime'].dt.date,
+                             'total_precipitation': df_half_hourly['precipitationCal'] / 2})  # mm/hr to mm/half-hour
+    df_daily = df_daily.groupby(['date'], as_index=False)[['total_precipitation']].sum()
+    df_daily[['total_precipitation']] = df_daily[['total_precipitation']].round(decimals=0)
+    df_daily['month'] = pd.to_datetime(df_daily['date']).dt.month
+    return df_daily
@@ -0,0 +1,76 @@
+"""
+Author........... Gabriel Böhnke
+University....... UCLouvain, Faculty of bioscience engineering
+Email............ gabriel.bohnke@student.uclouvain.be
+
+Description...... benchmark of getRegion response parsing: generic (object dtype) vs typed parser
+                  run from project directory: python -m benchmark.benchmark_ee_array_to_df
+Version.......... 1.00
+Last changed on.. 17.10.2026
+"""
+
+import time
+import pandas as pd
+from benchmark.benchmark_data import get_bundled_location_list, load_bundled_raw_data
+from util.google_earth_engine_util import ee_array_to_df_generic, ee_array_to_df_typed
+
+# realistic payload: 180 days of half-hourly IMERG records, as returned by getRegion(...).getInfo()
+payload_day_count = 180
+repeat_count = 5
+
+
+def get_imerg_payload(location_key_list):
+    # list of lists: header row, then one row per (image, point)
+    # example of row: ['3B-HHR.MS.MRG.3IMERG.20150101-S000000.V06B', 9.4573, 36.4759, 1420070400000, 0.5]
+    arr = [['id', 'longitude', 'latitude', 'time', 'precipitationCal']]
+    for location_key in location_key_list:
+        df_half_hourly = load_bundled_raw_data(location_key, 'pcp')
+        to_datetime = df_half_hourly['datetime'].iloc[0] + pd.Timedelta(days=payload_day_count)
+        df_half_hourly = df_half_hourly[df_half_hourly['datetime'] < to_datetime]
+
+        # location key to lon/lat, e.g. 00945730_03647590 -> 9.4573, 36.4759
+        lon, lat = [int(part) / 10 ** 5 for part in location_key.split('_')]
+        for timestamp, value in zip(df_half_hourly['datetime'], df_half_hourly['precipitationCal'].tolist()):
+            arr.append(['3B-HHR.MS.MRG.3IMERG.' + timestamp.strftime('%Y%m%d-S%H%M%S') + '.V06B', lon, lat,
+                        int(timestamp.value // 10 ** 6), value])
+    return arr
+
+
+def measure(function, arr, is_coordinate_kept):
+    # best of several runs
+    best_time = None
+    df = None
+    for _ in range(repeat_count):
+        start_time = time.perf_counter()
+        df = function(arr, ['precipitationCal'], is_coordinate_kept)
+        elapsed_time = time.perf_counter() - start_time
+        best_time = elapsed_time if best_time is None else min(best_time, elapsed_time)
+    return df, best_time
+
+
+def main():
+    location_key_list = [location_key for location_key in get_bundled_location_list()
+                         if load_bundled_raw_data(location_key, 'pcp') is not None]
+
+    # single point (one weather station per request) and multi-point (batched retrieval) payloads
+    for description, payload_location_key_list, is_coordinate_kept in [
+            ('1 point', location_key_list[:1], False),
+            (str(len(location_key_list)) + ' points', location_key_list, True)]:
+        arr = get_imerg_payload(payload_location_key_list)
+
+        df_expected, generic_time = measure(ee_array_to_df_generic, arr, is_coordinate_kept)
+        df_actual, typed_time = measure(ee_array_to_df_typed, arr, is_coordinate_kept)
+
+        # results must be identical, not only close
+        if not df_actual.equals(df_expected.reset_index(drop=True)):
+            raise AssertionError(description + ': typed parser differs from generic parser')
+
+        print(description + ' - ' + str(payload_day_count) + ' days - rows:', len(arr) - 1)
+        print('generic parser: {:.4f} s'.format(generic_time))
+        print('typed parser:   {:.4f} s'.format(typed_time))
+        print('speed-up: {:.1f}x'.format(generic_time / typed_time))
+        print('\n')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,309 @@
+"""
+Author........... Gabriel Böhnke
+University....... UCLouvain, Faculty of bioscience engineering
+Email............ gabriel.bohnke@student.uclouvain.be
+
+Description...... benchmark suite: raw parsing, daily reduction, weather generator statistics, weather file writing,
+                  end-to-end runs against the local Earth Engine stand-in (see benchmark/fake_ee.py), outputs
+                  compared with the committed SWAT_INPUT_DATA (golden files)
+                  run from project directory: python -m benchmark.benchmark_suite [--stations 35,500,5000]
+Version.......... 1.00
+Last changed on.. 17.10.2026
+"""
+
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import tempfile
+import subprocess
+import numpy as np
+import pandas as pd
+from benchmark.benchmark_data import get_bundled_location_list, load_bundled_raw_data
+from benchmark.benchmark_ee_array_to_df import get_imerg_payload
+from util.google_earth_engine_util import ee_array_to_df
+from util.date_util import get_daily_values, get_day_array, get_year_and_day_of_year
+from util.weather_generator_util import get_generator_input, get_generator_data
+from util.swat_file_util import write_weather_file, station_file_name
+from retrieve_station_data import precipitation_imerg_aggregation_dict, solar_radiation_aggregation_dict
+
+# golden files: SWAT+ input set of the 35 weather stations of retrieve_station_data.py, as committed
+golden_directory = 'SWAT_INPUT_DATA'
+
+# numbers of golden files and outputs may differ in the last digits (e.g. statistics summed in another order)
+relative_tolerance = 1e-9
+
+# best of several runs, for micro benchmarks
+repeat_count = 3
+
+
+def measure(function, *arguments):
+    best_time = None
+    result = None
+    for _ in range(repeat_count):
+        start_time = time.perf_counter()
+        result = function(*arguments)
+        elapsed_time = time.perf_counter() - start_time
+        best_time = elapsed_time if best_time is None else min(best_time, elapsed_time)
+    return result, best_time
+
+
+def load_daily_input_list(location_key_list):
+    # daily values of bundled weather stations, as retrieve_station_data.py computes them:
+    # list of (wgn_id, {variable: daily dataframe})
+    daily_input_list = []
+    for wgn_id, location_key in enumerate(location_key_list, start=1):
+        df_pcp = load_bundled_raw_data(location_key, 'pcp')
+        df_tmp = load_bundled_raw_data(location_key, 'tmp')
+        df_wnd = load_bundled_raw_data(location_key, 'wnd')
+        df_slr = load_bundled_raw_data(location_key, 'slr')
+        df_dew = load_bundled_raw_data(location_key, 'dew')
+        if any(df_raw is None for df_raw in [df_pcp, df_tmp, df_wnd, df_slr, df_dew]):
+            continue
+        df_pcp = get_daily_values(df_pcp, precipitation_imerg_aggregation_dict)
+        df_pcp[['total_precipitation', 'max_half_hour_precipitation']] /= 2
+        df_pcp['total_precipitation'] = df_pcp['total_precipitation'].round(decimals=0)
+        df_tmp[['maximum_2m_air_temperature', 'minimum_2m_air_temperature']] -= 273.15
+        df_wnd['wind_speed'] = (df_wnd['u_component_of_wind_10m'] ** 2 + df_wnd['v_component_of_wind_10m'] ** 2) ** (
+                1 / 2)
+        df_slr = get_daily_values(df_slr, solar_radiation_aggregation_dict)
+        df_slr['surface_net_solar_radiation'] /= 10 ** 6
+        df_dew['dewpoint_2m_temperature'] -= 273.15
+        daily_input_list.append((wgn_id, {'pcp': df_pcp, 'tmp': df_tmp, 'wnd': df_wnd, 'slr': df_slr,
+                                          'dew': df_dew}))
+    return daily_input_list
+
+
+def benchmark_parsing(location_key_list):
+    # getRegion response of all bundled points (see benchmark_ee_array_to_df.py)
+    arr = get_imerg_payload(location_key_list)
+    _, parsing_time = measure(ee_array_to_df, arr, ['precipitationCal'], True)
+    return {'rows': len(arr) - 1, 'time': parsing_time}
+
+
+def benchmark_daily_reduction(location_key_list):
+    df_half_hourly_list = [df_raw for df_raw in [load_bundled_raw_data(location_key, 'pcp')
+                                                 for location_key in location_key_list] if df_raw is not None]
+    _, reduction_time = measure(lambda: [get_daily_values(df_half_hourly, precipitation_imerg_aggregation_dict)
+                                         for df_half_hourly in df_half_hourly_list])
+    return {'rows': sum(len(df_half_hourly) for df_half_hourly in df_half_hourly_list), 'time': reduction_time}
+
+
+def benchmark_generator_statistics(daily_input_list):
+    column_dict = {'tmp': {'maximum_2m_air_temperature': 'tmp_max', 'minimum_2m_air_temperature': 'tmp_min'},
+                   'pcp': {'total_precipitation': 'pcp', 'max_half_hour_precipitation': 'pcp_max'},
+                   'slr': {'surface_net_solar_radiation': 'slr'},
+                   'dew': {'dewpoint_2m_temperature': 'dew'},
+                   'wnd': {'wind_speed': 'wnd'}}
+    generator_input_dict = {variable: pd.concat([get_generator_input(wgn_id, df_daily_dict[variable], 'datetime',
+                                                                     column_dict[variable])
+                                                 for wgn_id, df_daily_dict in daily_input_list], ignore_index=True)
+                            for variable in column_dict}
+    df_generator_data, generator_time = measure(
+        get_generator_data, generator_input_dict['tmp'], generator_input_dict['pcp'], generator_input_dict['slr'],
+        generator_input_dict['dew'], generator_input_dict['wnd'], True)
+    return {'rows': len(df_generator_data), 'time': generator_time}
+
+
+def benchmark_file_writing(daily_input_list):
+    # weather files (.pcp) of all bundled weather stations, written synchronously to a temporary directory
+    directory = tempfile.mkdtemp()
+    try:
+        file_list = []
+        for wgn_id, df_daily_dict in daily_input_list:
+            file_name = 'station_' + str(wgn_id).zfill(3) + '.pcp'
+            year_array, step_array = get_year_and_day_of_year(get_day_array(df_daily_dict['pcp']['datetime']))
+            file_list.append((directory + '/' + file_name, file_name, [wgn_id, file_name[:-4], 0.0, 0.0, 0, 6],
+                              year_array, step_array, [df_daily_dict['pcp']['total_precipitation']]))
+
+        # weather file writes print the file path: not measured
+        with open(os.devnull, 'w') as devnull:
+            standard_output = sys.stdout
+            sys.stdout = devnull
+            try:
+                _, writing_time = measure(lambda: [write_weather_file(*file_details) for file_details in file_list])
+            finally:
+                sys.stdout = standard_output
+        return {'files': len(file_list), 'time': writing_time}
+    finally:
+        shutil.rmtree(directory)
+
+
+def get_synthetic_station_list(station_count, seed=0):
+    # weather stations spread at random over the area of the golden weather stations (+/- 0.05°); elevation of the
+    # nearest golden weather station. The local stand-in answers each of them with the data of the nearest bundled
+    # pixel.
+    df_stations = pd.read_csv(golden_directory + '/' + station_file_name)
+    random_state = np.random.RandomState(seed)
+    lon_array = random_state.uniform(df_stations['lon'].min() - 0.05, df_stations['lon'].max() + 0.05,
+                                     station_count).round(4)
+    lat_array = random_state.uniform(df_stations['lat'].min() - 0.05, df_stations['lat'].max() + 0.05,
+                                     station_count).round(4)
+    nearest_index_array = ((lon_array[:, None] - df_stations['lon'].to_numpy()) ** 2 +
+                           (lat_array[:, None] - df_stations['lat'].to_numpy()) ** 2).argmin(axis=1)
+    return pd.DataFrame({'lon': lon_array, 'lat': lat_array,
+                         'elev': df_stations['elev'].to_numpy()[nearest_index_array]})
+
+
+def is_close(value, golden_value):
+    try:
+        number, golden_number = float(value), float(golden_value)
+    except ValueError:
+        return False
+    return bool(np.isclose(number, golden_number, rtol=relative_tolerance, atol=0, equal_nan=True))
+
+
+def compare_text_file(file_path, golden_file_path):
+    # 'identical', 'close' (numbers within relative_tolerance) or 'different'
+    with open(file_path, 'r', encoding='utf-8') as file:
+        line_list = file.read().splitlines()
+    with open(golden_file_path, 'r', encoding='utf-8') as file:
+        golden_line_list = file.read().splitlines()
+    if line_list == golden_line_list:
+        return 'identical'
+    if len(line_list) != len(golden_line_list):
+        return 'different'
+    for line, golden_line in zip(line_list, golden_line_list):
+        if line == golden_line:
+            continue
+        value_list, golden_value_list = line.replace(',', ' ').split(' '), golden_line.replace(',', ' ').split(' ')
+        if len(value_list) != len(golden_value_list) or not all(
+                value == golden_value or is_close(value, golden_value)
+                for value, golden_value in zip(value_list, golden_value_list)):
+            return 'different'
+    return 'close'
+
+
+def compare_excel_file(file_path, golden_file_path):
+    df_result, df_golden = pd.read_excel(file_path), pd.read_excel(golden_file_path)
+    if df_result.equals(df_golden):
+        return 'identical'
+    if list(df_result.columns) != list(df_golden.columns) or len(df_result) != len(df_golden):
+        return 'different'
+    for column in df_golden.columns:
+        if df_golden[column].dtype.kind == 'f' or df_result[column].dtype.kind == 'f':
+            if not np.allclose(df_result[column], df_golden[column], rtol=relative_tolerance, atol=0,
+                               equal_nan=True):
+                return 'different'
+        elif not df_result[column].equals(df_golden[column]):
+            return 'different'
+    return 'close'
+
+
+def compare_with_golden_files(output_directory):
+    # every golden file must be found in output_directory; outputs without golden file (e.g. run report) are ignored
+    comparison_dict = {'identical': 0, 'close': 0, 'different': [], 'missing': []}
+    for directory_path, _, file_name_list in os.walk(golden_directory):
+        for file_name in sorted(file_name_list):
+            golden_file_path = directory_path.replace(os.sep, '/') + '/' + file_name
+            file_path = output_directory + golden_file_path[len(golden_directory):]
+            if not os.path.exists(file_path):
+                comparison_dict['missing'].append(golden_file_path)
+                continue
+            if file_name.endswith('.xlsx'):
+                result = compare_excel_file(file_path, golden_file_path)
+            else:
+                result = compare_text_file(file_path, golden_file_path)
+            if result == 'different':
+                comparison_dict['different'].append(golden_file_path)
+            else:
+                comparison_dict[result] += 1
+    return comparison_dict
+
+
+def run_end_to_end(station_count, working_directory, fake_argument_list, retrieve_argument_list):
+    # retrieve_station_data.py in a process of its own, against the local stand-in; returns time and run report
+    log_file_path = working_directory + '/benchmark.log'
+    start_time = time.perf_counter()
+    with open(log_file_path, 'a', encoding='utf-8') as log_file:
+        return_code = subprocess.call(
+            [sys.executable, '-m', 'benchmark.fake_ee', '--working-directory', working_directory,
+             *fake_argument_list, '--', *retrieve_argument_list], stdout=log_file, stderr=subprocess.STDOUT)
+    elapsed_time = time.perf_counter() - start_time
+    if return_code != 0:
+        raise RuntimeError(str(station_count) + ' weather stations: run failed, see ' + log_file_path)
+    with open(working_directory + '/SWAT_INPUT_DATA/run_report.json', 'r', encoding='utf-8') as file:
+        run_report = json.load(file)
+    return {'time': elapsed_time, 'peak_memory_mb': run_report['peak_memory_mb'],
+            'stages': {stage: round(span['total_time'], 3) for stage, span in run_report['stages'].items()},
+            'counters': run_report['counters']}
+
+
+def benchmark_end_to_end(station_count, fake_argument_list):
+    # cold run (empty cache: all raw data retrieved from the local stand-in), then warm run (cache only)
+    working_directory = tempfile.mkdtemp()
+    try:
+        retrieve_argument_list = []
+        if station_count != 35:
+            station_file_path = working_directory + '/stations.csv'
+            get_synthetic_station_list(station_count).to_csv(station_file_path, index=False)
+            retrieve_argument_list = ['--station-file', station_file_path]
+
+        result_dict = {'cold': run_end_to_end(station_count, working_directory, fake_argument_list,
+                                              retrieve_argument_list),
+                       'warm': run_end_to_end(station_count, working_directory, fake_argument_list,
+                                              retrieve_argument_list + ['--restart'])}
+
+        # golden files: weather stations of retrieve_station_data.py only
+        if station_count == 35:
+            result_dict['golden'] = compare_with_golden_files(working_directory + '/SWAT_INPUT_DATA')
+        return result_dict
+    finally:
+        shutil.rmtree(working_directory)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='benchmark suite, against a local Earth Engine stand-in')
+    parser.add_argument('--stations', default='35',
+                        help='numbers of weather stations of end-to-end runs, e.g. 35,500,5000 (0: none)')
+    parser.add_argument('--latency', default='0', help='seconds added to each request of the local stand-in')
+    parser.add_argument('--max-values', default='1048576', help='max values of a getRegion response')
+    parser.add_argument('--error-rate', default='0', help='share of requests failing (throttling)')
+    parser.add_argument('--report', help='save results as JSON, to compare two versions')
+    arguments = parser.parse_args()
+
+    result_dict = {}
+    location_key_list = get_bundled_location_list()
+    daily_input_list = load_daily_input_list(location_key_list)
+
+    for description, function, argument in [
+            ('raw parsing', benchmark_parsing, location_key_list),
+            ('daily reduction', benchmark_daily_reduction, location_key_list),
+            ('weather generator statistics', benchmark_generator_statistics, daily_input_list),
+            ('weather file writing', benchmark_file_writing, daily_input_list)]:
+        result_dict[description] = function(argument)
+        print(description + ': {:.4f} s'.format(result_dict[description]['time']),
+              {key: value for key, value in result_dict[description].items() if key != 'time'})
+
+    fake_argument_list = ['--latency', arguments.latency, '--max-values', arguments.max_values, '--error-rate',
+                          arguments.error_rate]
+    is_golden_different = False
+    for station_count in [int(count) for count in arguments.stations.split(',') if int(count) > 0]:
+        description = 'end-to-end ' + str(station_count) + ' weather stations'
+        result_dict[description] = benchmark_end_to_end(station_count, fake_argument_list)
+        for run in ['cold', 'warm']:
+            print(description + ' - ' + run + ': {:.1f} s'.format(result_dict[description][run]['time']),
+                  '- peak memory:', result_dict[description][run]['peak_memory_mb'], 'MB')
+            print('    stages:', result_dict[description][run]['stages'])
+        if 'golden' in result_dict[description]:
+            comparison_dict = result_dict[description]['golden']
+            print('    golden files: identical:', comparison_dict['identical'], '- close:', comparison_dict['close'],
+                  '- different:', len(comparison_dict['different']), '- missing:', len(comparison_dict['missing']))
+            for file_path in comparison_dict['different'] + comparison_dict['missing']:
+                print('    not as golden file: ' + file_path)
+            is_golden_different = len(comparison_dict['different']) + len(comparison_dict['missing']) > 0
+
+    if arguments.report is not None:
+        with open(arguments.report, 'w', encoding='utf-8') as file:
+            json.dump(result_dict, file, indent=2)
+        print(arguments.report + ' saved')
+
+    # outputs differing from golden files: regression
+    if is_golden_different:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,73 @@
+"""
+Author........... Gabriel Böhnke
+University....... UCLouvain, Faculty of bioscience engineering
+Email............ gabriel.bohnke@student.uclouvain.be
+
+Description...... benchmark of wet/dry transition probabilities: rolling-apply vs shifted arrays
+                  run from project directory: python -m benchmark.benchmark_transition_probabilities
+Version.......... 1.00
+Last changed on.. 17.10.2026
+"""
+
+import time
+import numpy as np
+import pandas as pd
+from benchmark.benchmark_data import get_bundled_location_list, load_bundled_raw_data, get_daily_precipitation
+from util.weather_generator_util import get_transition_probabilities
+
+
+def get_transition_probabilities_rolling_apply(month, precipitation):
+    # former implementation of get_generator_columns: one Python call per day of record
+    df_daily = pd.DataFrame({'month': np.asarray(month), 'total_precipitation': np.asarray(precipitation)})
+
+    wet_following_dry = lambda x: (x[-1] == 0 and x[0] > 0)  # current = x[-1], previous = x[0]
+    wet_following_wet = lambda x: (x[-1] > 0 and x[0] > 0)
+    df_daily['wet_dry'] = df_daily['total_precipitation'].rolling(2).apply(wet_following_dry, raw=True).replace(
+        {np.nan: 0.0})
+    df_daily['wet_wet'] = df_daily['total_precipitation'].rolling(2).apply(wet_following_wet, raw=True).replace(
+        {np.nan: 0.0})
+
+    df_daily['row_counter'] = 1
+    df_monthly = df_daily.groupby(['month'], as_index=False)[['wet_dry', 'wet_wet', 'row_counter']].sum()
+    df_monthly['wet_dry'] = df_monthly['wet_dry'] / df_monthly['row_counter']
+    df_monthly['wet_wet'] = df_monthly['wet_wet'] / df_monthly['row_counter']
+
+    return df_monthly[['month', 'wet_dry', 'wet_wet']]
+
+
+def main():
+    rolling_apply_time = 0.0
+    shifted_array_time = 0.0
+    location_count = 0
+    day_count = 0
+
+    for location_key in get_bundled_location_list():
+        df_half_hourly = load_bundled_raw_data(location_key, 'pcp')
+        if df_half_hourly is None:
+            continue
+        df_daily = get_daily_precipitation(df_half_hourly)
+
+        start_time = time.perf_counter()
+        df_expected = get_transition_probabilities_rolling_apply(df_daily['month'], df_daily['total_precipitation'])
+        rolling_apply_time += time.perf_counter() - start_time
+
+        start_time = time.perf_counter()
+        df_actual = get_transition_probabilities(df_daily['month'], df_daily['total_precipitation'])
+        shifted_array_time += time.perf_counter() - start_time
+
+        # results must be identical, not only close
+        if not df_actual.reset_index(drop=True).equals(df_expected.reset_index(drop=True)):
+            raise AssertionError(location_key + ': transition probabilities differ from rolling-apply results')
+
+        location_count += 1
+        day_count += len(df_daily)
+
+    print('locations:', location_count, '- days of record:', day_count)
+    print('rolling-apply:  {:.4f} s'.format(rolling_apply_time))
+    print('shifted arrays: {:.4f} s'.format(shifted_array_time))
+    if shifted_array_time > 0:
+        print('speed-up: {:.1f}x'.format(rolling_apply_time / shifted_array_time))
+
+
+if __name__ == '__main__':
+    main()
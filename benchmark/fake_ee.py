@@ -0,0 +1,399 @@
+"""
+Author........... Gabriel Böhnke
+University....... UCLouvain, Faculty of bioscience engineering
+Email............ gabriel.bohnke@student.uclouvain.be
+
+Description...... local stand-in for the Earth Engine API (ee module): getRegion and computePixels answered from
+                  bundled raw data, with configurable latency, payload limit and error injection
+                  run from project directory: python -m benchmark.fake_ee [options] -- [retrieve_station_data options]
+Version.......... 1.00
+Last changed on.. 17.10.2026
+"""
+
+import os
+import sys
+import time
+import runpy
+import random
+import argparse
+import threading
+import numpy as np
+import pandas as pd
+from types import SimpleNamespace
+from benchmark.benchmark_data import get_bundled_location_list, load_bundled_raw_data
+from util.raw_data_cache_util import raw_data_category_dict, get_location_from_key, get_pixel_key
+from util.swat_file_util import station_file_name
+from util.station_util import dem_collection, dem_band
+
+# only the part of the API used by util/google_earth_engine_util.py (server-side composites are not supported)
+# https://developers.google.com/earth-engine/apidocs/ee-imagecollection-getregion
+# https://developers.google.com/earth-engine/apidocs/ee-data-computepixels
+
+# configuration: seconds added to each getInfo() call, max values (rows x columns) of a getRegion response as
+# enforced by GEE, share of requests failing with a throttling error (retried by util/request_util.py)
+latency_in_seconds = 0.0
+max_values_per_request = 1048576
+error_rate = 0.0
+error_random = random.Random(0)
+
+# statistics of the run
+request_statistics_dict = {'requests': 0, 'values': 0, 'errors': 0}
+request_statistics_lock = threading.Lock()
+
+# bundled data: {(collection, pixel key): (epoch milliseconds, {band: values})}
+# pixels of bundled locations only: a point elsewhere (e.g. synthetic weather stations) gets the data of the nearest
+# bundled pixel
+bundled_data_dict = {}
+bundled_pixel_dict = {}  # {collection: (pixel key list, lon array, lat array)}
+bundled_time_dict = {}  # {collection: epoch milliseconds of all images}
+
+# computePixels fails above this payload (bytes)
+max_bytes_per_request = 48 * 1024 * 1024
+
+# getRegion returns coordinates of the pixel at the requested scale: points are snapped to a grid of about 30 m
+response_grid_size = 0.00027
+
+
+class EEException(Exception):
+    pass
+
+
+ee_exception = SimpleNamespace(EEException=EEException)
+
+
+def Authenticate(*arguments, **keyword_arguments):
+    pass
+
+
+def Initialize(*arguments, **keyword_arguments):
+    pass
+
+
+class Geometry:
+    class Point:
+        def __init__(self, lon, lat):
+            self.point_list = [[lon, lat]]
+
+    class MultiPoint:
+        def __init__(self, point_list):
+            self.point_list = [list(point) for point in point_list]
+
+
+class ComputedObject:
+    # result of a request, computed when getInfo() is called
+    def __init__(self, function):
+        self.function = function
+
+    def getInfo(self):
+        return self.function()
+
+
+def get_epoch_milliseconds(date_string):
+    return int(np.datetime64(date_string, 'ms').astype(np.int64))
+
+
+def get_bundled_data(collection, lon, lat):
+    pixel_key = get_pixel_key(lon, lat, collection)
+    if (collection, pixel_key) not in bundled_data_dict:
+        if collection not in bundled_pixel_dict:
+            return None
+        pixel_key_list, lon_array, lat_array = bundled_pixel_dict[collection]
+        pixel_key = pixel_key_list[int(((lon_array - lon) ** 2 + (lat_array - lat) ** 2).argmin())]
+    return bundled_data_dict[(collection, pixel_key)]
+
+
+class Filter:
+    # filter of images by time: function returning a mask of epoch milliseconds
+    def __init__(self, function):
+        self.function = function
+
+    @staticmethod
+    def lte(property_name, value):
+        # property 'forecast_hours' only: bundled GFS images are analyses (forecast hour 0), all kept
+        return Filter(lambda time_array: np.ones(len(time_array), dtype=bool))
+
+    @staticmethod
+    def calendarRange(start, end, field):
+        # field 'hour' only (UTC)
+        return Filter(lambda time_array: (start <= time_array // 3600000 % 24) & (time_array // 3600000 % 24 <= end))
+
+
+class ImageCollection:
+    def __init__(self, collection, list_of_bands=None, date_from=None, date_to=None, filter_list=()):
+        if isinstance(collection, list):
+            # collection of a single mosaic (e.g. DEM): images of the collection of the mosaic
+            image_collection = collection[0].image_collection
+            collection, list_of_bands, date_from, date_to, filter_list = (
+                image_collection.collection, image_collection.list_of_bands, image_collection.date_from,
+                image_collection.date_to, image_collection.filter_list)
+        self.collection = collection
+        self.list_of_bands = list_of_bands
+        self.date_from = date_from
+        self.date_to = date_to
+        self.filter_list = filter_list
+
+    def select(self, list_of_bands):
+        return ImageCollection(self.collection, list_of_bands, self.date_from, self.date_to, self.filter_list)
+
+    def filterDate(self, date_from, date_to):
+        return ImageCollection(self.collection, self.list_of_bands, date_from, date_to, self.filter_list)
+
+    def filter(self, image_filter):
+        return ImageCollection(self.collection, self.list_of_bands, self.date_from, self.date_to,
+                               self.filter_list + (image_filter,))
+
+    def get_filter_mask(self, time_array):
+        mask = np.ones(len(time_array), dtype=bool)
+        for image_filter in self.filter_list:
+            mask &= image_filter.function(time_array)
+        return mask
+
+    def get_region(self, geometry):
+        time.sleep(latency_in_seconds)
+        with request_statistics_lock:
+            request_statistics_dict['requests'] += 1
+            if error_rate > 0 and error_random.random() < error_rate:
+                request_statistics_dict['errors'] += 1
+                raise EEException('Too many concurrent aggregations.')
+
+        # no date filter (e.g. DEM): all images
+        if self.date_from is None:
+            time_from, time_to = np.iinfo(np.int64).min, np.iinfo(np.int64).max
+        else:
+            time_from, time_to = get_epoch_milliseconds(self.date_from), get_epoch_milliseconds(self.date_to)
+        arr = [['id', 'longitude', 'latitude', 'time', *self.list_of_bands]]
+        for lon, lat in geometry.point_list:
+            bundled_data = get_bundled_data(self.collection, lon, lat)
+            if bundled_data is None:
+                continue
+            time_array, band_dict = bundled_data
+            lower_index, upper_index = np.searchsorted(time_array, [time_from, time_to])
+            index_array = np.arange(lower_index, upper_index)
+            index_array = index_array[self.get_filter_mask(time_array[index_array])]
+            response_lon = round(round(lon / response_grid_size) * response_grid_size, 8)
+            response_lat = round(round(lat / response_grid_size) * response_grid_size, 8)
+            value_list_list = [band_dict[band][index_array].tolist() for band in self.list_of_bands]
+            for index, timestamp in enumerate(time_array[index_array].tolist()):
+                arr.append([str(timestamp), response_lon, response_lat, timestamp,
+                            *[value_list[index] for value_list in value_list_list]])
+
+        value_count = (len(arr) - 1) * len(arr[0])
+        with request_statistics_lock:
+            request_statistics_dict['values'] += value_count
+        if value_count > max_values_per_request:
+            raise EEException('ImageCollection.getRegion: Too many values: ' + str(value_count) + ' > ' +
+                              str(max_values_per_request) + '.')
+        # missing values are returned as None, as by GEE
+        return [[None if isinstance(value, float) and value != value else value for value in row] for row in arr]
+
+    def getRegion(self, geometry, scale):
+        return ComputedObject(lambda: self.get_region(geometry))
+
+    def get_time_array(self):
+        time_array = bundled_time_dict.get(self.collection, np.array([], dtype=np.int64))
+        lower_index, upper_index = np.searchsorted(time_array, [get_epoch_milliseconds(self.date_from),
+                                                                get_epoch_milliseconds(self.date_to)])
+        time_array = time_array[lower_index:upper_index]
+        return time_array[self.get_filter_mask(time_array)]
+
+    def aggregate_array(self, property_name):
+        # property 'system:time_start' only
+        def get_time_list():
+            time.sleep(latency_in_seconds)
+            with request_statistics_lock:
+                request_statistics_dict['requests'] += 1
+            return self.get_time_array().tolist()
+
+        return ComputedObject(get_time_list)
+
+    def filterBounds(self, geometry):
+        # bundled data holds the pixels of bundled locations only: all kept
+        return self
+
+    def toBands(self):
+        return Image(self)
+
+    def mosaic(self):
+        return Image(self)
+
+
+class Image:
+    # image of all bands of all images of a collection (toBands), as a raster block for computePixels
+    def __init__(self, image_collection, missing_value=None):
+        self.image_collection = image_collection
+        self.missing_value = missing_value
+
+    def unmask(self, value):
+        return Image(self.image_collection, value)
+
+    def toDouble(self):
+        return self
+
+    def set(self, property_name, value):
+        return self
+
+    def compute_pixels(self, grid):
+        # values of the pixel centers of the grid: value of the bundled pixel holding each center (nearest bundled
+        # pixel elsewhere)
+        time.sleep(latency_in_seconds)
+        with request_statistics_lock:
+            request_statistics_dict['requests'] += 1
+            if error_rate > 0 and error_random.random() < error_rate:
+                request_statistics_dict['errors'] += 1
+                raise EEException('Too many concurrent aggregations.')
+
+        image_collection = self.image_collection
+        time_array = image_collection.get_time_array()
+        width, height = grid['dimensions']['width'], grid['dimensions']['height']
+        affine_transform = grid['affineTransform']
+        name_list = [str(index) + '_' + band for index in range(len(time_array))
+                     for band in image_collection.list_of_bands]
+        byte_count = width * height * len(name_list) * 8
+        with request_statistics_lock:
+            request_statistics_dict['values'] += width * height * len(name_list)
+        if byte_count > max_bytes_per_request:
+            raise EEException('Total request size (' + str(byte_count) + ' bytes) must be less than or equal to ' +
+                              str(max_bytes_per_request) + ' bytes.')
+
+        value_array = np.full((len(time_array), len(image_collection.list_of_bands), height, width),
+                              np.nan if self.missing_value is None else self.missing_value, dtype=np.float64)
+        for row in range(height):
+            for column in range(width):
+                lon = affine_transform['translateX'] + (column + 0.5) * affine_transform['scaleX']
+                lat = affine_transform['translateY'] + (row + 0.5) * affine_transform['scaleY']
+                bundled_data = get_bundled_data(image_collection.collection, lon, lat)
+                if bundled_data is None:
+                    continue
+                pixel_time_array, band_dict = bundled_data
+                _, index_array, pixel_index_array = np.intersect1d(time_array, pixel_time_array,
+                                                                   return_indices=True)
+                for band_index, band in enumerate(image_collection.list_of_bands):
+                    values = band_dict[band][pixel_index_array]
+                    value_array[index_array, band_index, row, column] = np.where(np.isnan(values),
+                                                                                 self.missing_value, values)
+
+        # structured array (height, width), one field per image and band
+        pixel_array = np.zeros((height, width), dtype=[(name, np.float64) for name in name_list])
+        for index, name in enumerate(name_list):
+            pixel_array[name] = value_array.reshape(-1, height, width)[index]
+        return pixel_array
+
+
+def computePixels(request):
+    return request['expression'].compute_pixels(request['grid'])
+
+
+data = SimpleNamespace(computePixels=computePixels)
+
+
+def add_bundled_data(collection, lon, lat, df_raw, list_of_bands):
+    # df_raw: 'datetime' + bands; bands of the same collection and pixel are joined on their time
+    pixel_key = get_pixel_key(lon, lat, collection)
+    time_array = df_raw['datetime'].to_numpy(dtype='datetime64[ms]').astype(np.int64)
+    band_dict = {band: df_raw[band].to_numpy(dtype=np.float64) for band in list_of_bands}
+    if (collection, pixel_key) in bundled_data_dict:
+        former_time_array, former_band_dict = bundled_data_dict[(collection, pixel_key)]
+        if any(band in former_band_dict for band in list_of_bands):
+            # weather stations of the same pixel: same records
+            return
+        time_array, former_index_array, index_array = np.intersect1d(former_time_array, time_array,
+                                                                     return_indices=True)
+        band_dict = {**{band: values[former_index_array] for band, values in former_band_dict.items()},
+                     **{band: values[index_array] for band, values in band_dict.items()}}
+    bundled_data_dict[(collection, pixel_key)] = (time_array, band_dict)
+
+
+def get_golden_relative_humidity(golden_directory):
+    # relative humidity is not bundled in GEE_RAW_DATA: 6-hourly records rebuilt from golden weather files (.hmd),
+    # 4 equal records per day, whose daily mean gives back the golden value
+    # returns list of (lon, lat, df_raw)
+    df_stations = pd.read_csv(golden_directory + '/' + station_file_name, float_precision='round_trip')
+    station_data_list = []
+    for station_name, lon, lat in zip(df_stations['name'], df_stations['lon'], df_stations['lat']):
+        file_path = golden_directory + '/WEATHER_STATIONS/' + station_name + '.hmd'
+        if not os.path.exists(file_path):
+            continue
+        df_daily = pd.read_csv(file_path, sep=' ', skiprows=3, header=None, usecols=[0, 1, 2],
+                               names=['year', 'step', 'value'], float_precision='round_trip').dropna()
+        day_array = (df_daily['year'].to_numpy() - 1970).astype('datetime64[Y]').astype('datetime64[D]') + (
+                df_daily['step'].to_numpy() - 1)
+        datetime_array = (day_array.astype('datetime64[h]')[:, None] + np.array([0, 6, 12, 18])).ravel()
+        station_data_list.append((lon, lat, pd.DataFrame({
+            'datetime': datetime_array.astype('datetime64[ns]'),
+            'relative_humidity_2m_above_ground': np.repeat(df_daily['value'].to_numpy(dtype=np.float64) * 100, 4)})))
+    return station_data_list
+
+
+def get_golden_elevation(golden_directory):
+    # DEM: elevations of the golden station file, as a single image (a point elsewhere gets the elevation of the
+    # nearest golden weather station)
+    # returns list of (lon, lat, df_raw)
+    df_stations = pd.read_csv(golden_directory + '/' + station_file_name, float_precision='round_trip')
+    return [(lon, lat, pd.DataFrame({'datetime': [pd.Timestamp('2011-01-01')], dem_band: [float(elev)]}))
+            for lon, lat, elev in zip(df_stations['lon'], df_stations['lat'], df_stations['elev'])]
+
+
+def load_bundled_data(golden_directory='SWAT_INPUT_DATA'):
+    # raw data of GEE_RAW_DATA (legacy or chunk layout), read once, before the run
+    for location_key in get_bundled_location_list():
+        lon, lat = get_location_from_key(location_key)
+        for category, (collection, list_of_bands) in raw_data_category_dict.items():
+            df_raw = load_bundled_raw_data(location_key, category)
+            if df_raw is not None:
+                add_bundled_data(collection, lon, lat, df_raw, list_of_bands)
+
+    collection, list_of_bands = raw_data_category_dict['hmd']
+    if os.path.exists(golden_directory + '/' + station_file_name):
+        for lon, lat, df_raw in get_golden_relative_humidity(golden_directory):
+            add_bundled_data(collection, lon, lat, df_raw, list_of_bands)
+        for lon, lat, df_raw in get_golden_elevation(golden_directory):
+            add_bundled_data(dem_collection, lon, lat, df_raw, [dem_band])
+
+    for collection in set(collection for collection, _ in bundled_data_dict):
+        pixel_key_list = sorted(pixel_key for pixel_collection, pixel_key in bundled_data_dict
+                                if pixel_collection == collection)
+        location_array = np.array([get_location_from_key(pixel_key) for pixel_key in pixel_key_list])
+        bundled_pixel_dict[collection] = (pixel_key_list, location_array[:, 0], location_array[:, 1])
+        bundled_time_dict[collection] = np.unique(np.concatenate([bundled_data_dict[(collection, pixel_key)][0]
+                                                                  for pixel_key in pixel_key_list]))
+
+    print('fake ee: ' + str(len(bundled_data_dict)) + ' bundled pixel(s) loaded')
+
+
+def install():
+    # import ee (see google_earth_engine_util.initialize_earth_engine) then returns this module
+    sys.modules['ee'] = sys.modules[__name__]
+
+
+def main():
+    # end-to-end run of retrieve_station_data.py against the fake, in a working directory of its own
+    # example: python -m benchmark.fake_ee --working-directory /tmp/run --latency 0.2 -- --station-file stations.csv
+    parser = argparse.ArgumentParser(description='run retrieve_station_data.py against a local Earth Engine stand-in')
+    parser.add_argument('--working-directory', required=True,
+                        help='directory of GEE_RAW_DATA and SWAT_INPUT_DATA of the run (empty: cold cache)')
+    parser.add_argument('--latency', type=float, default=0.0, help='seconds added to each request')
+    parser.add_argument('--max-values', type=int, default=1048576, help='max values of a getRegion response')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='share of requests failing (throttling)')
+    parser.add_argument('retrieve_argument', nargs='*', help='options of retrieve_station_data.py, after --')
+    arguments = parser.parse_args()
+
+    global latency_in_seconds, max_values_per_request, error_rate
+    latency_in_seconds = arguments.latency
+    max_values_per_request = arguments.max_values
+    error_rate = arguments.error_rate
+
+    project_directory = os.getcwd()
+    load_bundled_data()
+    install()
+
+    os.makedirs(arguments.working_directory, exist_ok=True)
+    os.chdir(arguments.working_directory)
+    sys.argv = ['retrieve_station_data.py', *arguments.retrieve_argument]
+    try:
+        runpy.run_path(project_directory + '/retrieve_station_data.py', run_name='__main__')
+    finally:
+        print('fake ee:', request_statistics_dict)
+
+
+if __name__ == '__main__':
+    main()
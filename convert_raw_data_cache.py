@@ -0,0 +1,27 @@
+"""
+Author........... Gabriel Böhnke
+University....... UCLouvain, Faculty of bioscience engineering
+Email............ gabriel.bohnke@student.uclouvain.be
+
+Description...... convert all raw data files of GEE_RAW_DATA into one file format (npz or csv)
+Version.......... 1.00
+Last changed on.. 17.10.2026
+"""
+
+import sys
+from util.raw_data_cache_util import convert_raw_data_files, raw_data_file_format_list
+
+
+def main(file_format):
+
+    if file_format not in raw_data_file_format_list:
+        print('unknown file format: ' + file_format + ' (expected: ' + ', '.join(raw_data_file_format_list) + ')')
+        sys.exit(1)
+
+    convert_raw_data_files(file_format)
+
+
+if __name__ == '__main__':
+
+    # default: compressed binary columns
+    main(sys.argv[1] if len(sys.argv) > 1 else 'npz')
@@ -0,0 +1,34 @@
+"""
+Author........... Gabriel Böhnke
+University....... UCLouvain, Faculty of bioscience engineering
+Email............ gabriel.bohnke@student.uclouvain.be
+
+Description...... merge output directories of shards (see retrieve_station_data.py --shard) into one SWAT+ input set
+Version.......... 1.00
+Last changed on.. 17.10.2026
+"""
+
+import sys
+import argparse
+from util.shard_util import merge_shard_directories
+
+
+def main(shard_directory_list, output_directory):
+
+    try:
+        merge_shard_directories(shard_directory_list, output_directory)
+    except (ValueError, FileNotFoundError) as exception:
+        print('shards not merged: ' + str(exception))
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+
+    # example: python merge_shards.py SHARD_0 SHARD_1 SHARD_2 --output-directory SWAT_INPUT_DATA
+    parser = argparse.ArgumentParser(description='merge output directories of shards into one SWAT+ input set')
+    parser.add_argument('shard_directory', nargs='+', help='output directory of a shard')
+    parser.add_argument('--output-directory', default='SWAT_INPUT_DATA',
+                        help='directory of merged SWAT+ input files (default: SWAT_INPUT_DATA)')
+    arguments = parser.parse_args()
+
+    main(arguments.shard_directory, arguments.output_directory)
@@ -0,0 +1,57 @@
+"""
+Author........... Gabriel Böhnke
+University....... UCLouvain, Faculty of bioscience engineering
+Email............ gabriel.bohnke@student.uclouvain.be
+
+Description...... rebuild the raw data catalog of GEE_RAW_DATA from its files, or summarize cached raw data
+Version.......... 1.00
+Last changed on.. 17.10.2026
+"""
+
+import sys
+import argparse
+from util.raw_data_cache_util import rebuild_raw_data_catalog, get_location_from_key
+from util.raw_data_catalog_util import get_catalog_file_path, is_catalog_available, get_catalog_summary, \
+    get_catalog_location_key_list
+
+
+def print_summary(bounding_box):
+    # cached raw data by collection and band, of all locations or of locations inside a bounding box
+    if not is_catalog_available():
+        print('no raw data catalog: run "python raw_data_catalog.py rebuild" first')
+        sys.exit(1)
+
+    location_key_list = None
+    if bounding_box is not None:
+        lon_min, lat_min, lon_max, lat_max = bounding_box
+        location_key_list = [location_key for location_key in get_catalog_location_key_list()
+                             if lon_min <= get_location_from_key(location_key)[0] <= lon_max and
+                             lat_min <= get_location_from_key(location_key)[1] <= lat_max]
+
+    print(get_catalog_file_path())
+    for collection, band, location_count, file_count, from_date, to_date, row_count in get_catalog_summary(
+            location_key_list):
+        print(collection + ' ' + band + ': ' + str(location_count) + ' location(s), ' + str(file_count) +
+              ' file(s), ' + from_date + ' to ' + to_date + ', ' + str(row_count) + ' record(s)')
+
+
+def main(command, bounding_box=None):
+
+    if command == 'rebuild':
+        rebuild_raw_data_catalog()
+    else:
+        print_summary(bounding_box)
+
+
+if __name__ == '__main__':
+
+    # examples: python raw_data_catalog.py rebuild (after files were added or removed by hand)
+    # python raw_data_catalog.py summary --bbox 9.14 35.82 9.62 36.50
+    parser = argparse.ArgumentParser(description='raw data catalog of GEE_RAW_DATA')
+    parser.add_argument('command', choices=['rebuild', 'summary'],
+                        help='rebuild the catalog from the files of GEE_RAW_DATA, or summarize cached raw data')
+    parser.add_argument('--bbox', nargs=4, type=float, metavar=('LON_MIN', 'LAT_MIN', 'LON_MAX', 'LAT_MAX'),
+                        help='summary of locations inside a bounding box only')
+    arguments = parser.parse_args()
+
+    main(arguments.command, arguments.bbox)
@@ -3,19 +3,46 @@ Author........... Gabriel Böhnke
 University....... UCLouvain, Faculty of bioscience engineering
 Email............ gabriel.bohnke@student.uclouvain.be
 
-Description...... reset folders
+Description...... reset folders, or invalidate outputs of weather stations and variables
 Version.......... 1.00
-Last changed on.. 02.05.2022
+Last changed on.. 17.10.2026
 """
 
+import argparse
 from util.file_util import delete_complete_directory
+from util.journal_util import invalidate_variables
+from util.build_manifest_util import invalidate_outputs
+from util.swat_file_util import cli_file_extension_list
 
 
-def main():
+def main(directory='SWAT_INPUT_DATA', wgn_id_list=None, variable_list=None, is_aggregates=False):
 
-    delete_complete_directory('SWAT_INPUT_DATA')
-    # delete_complete_directory('GEE_RAW_DATA')  # <-- very expensive data fetch: are your sure?
+    if wgn_id_list is None and variable_list is None and not is_aggregates:
+        delete_complete_directory(directory)
+        # delete_complete_directory('GEE_RAW_DATA')  # <-- very expensive data fetch: are your sure?
+        return
+
+    # selective invalidation: processed again by the next run (see util/build_manifest_util.py), aggregated files
+    # depending on them are written again if their content changes
+    if wgn_id_list is not None or variable_list is not None:
+        removed_entry_list = invalidate_variables(directory, wgn_id_list, variable_list)
+        print(str(len(removed_entry_list)) + ' variable(s) of weather stations invalidated in ' + directory)
+    if is_aggregates:
+        output_name_list = invalidate_outputs(directory)
+        print(str(len(output_name_list)) + ' aggregated file(s) invalidated in ' + directory)
 
 if __name__ == '__main__':
 
-    main()
+    # example: python reset_all.py --station 7 12 --variable pcp (weather stations 7 and 12, precipitation only)
+    parser = argparse.ArgumentParser(description='delete SWAT+ input files, or invalidate some of them')
+    parser.add_argument('--station', nargs='+', type=int, metavar='ID',
+                        help='invalidate weather files and weather generator rows of weather stations (wgn_id)')
+    parser.add_argument('--variable', nargs='+', choices=cli_file_extension_list + ['dew'],
+                        help='invalidate variables (all weather stations, or those of --station)')
+    parser.add_argument('--aggregates', action='store_true',
+                        help='invalidate station file, weather generator files and CLI-files')
+    parser.add_argument('--output-directory', default='SWAT_INPUT_DATA',
+                        help='directory of SWAT+ input files (default: SWAT_INPUT_DATA)')
+    arguments = parser.parse_args()
+
+    main(arguments.output_directory, arguments.station, arguments.variable, arguments.aggregates)
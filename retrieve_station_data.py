@@ -5,24 +5,51 @@ Email............ gabriel.bohnke@student.uclouvain.be
 
 Description...... retrieve weather station data for a geolocation, using Google Earth Engine API
 Version.......... 1.00
-Last changed on.. 18.07.2022
+Last changed on.. 17.10.2026
 """
 
-import ee
 import os
-from util.google_earth_engine_util import get_gee_data
+import sys
+import inspect
+import argparse
+from util import date_util, swat_file_util, weather_generator_util
+from util.google_earth_engine_util import get_gee_data, prefetch_gee_data, set_max_points_per_request, set_offline, \
+    get_band_union_dict, get_band_slice, get_composite_band, get_daily_composite_gee_data, \
+    prefetch_daily_composite_gee_data, set_retrieval_engine, get_cache_collection, retrieval_engine_list, \
+    region_sampling_method_list, source_filter_collection_dict, get_raw_data_file_list
+from util.raw_data_cache_util import migrate_legacy_raw_data_files, raw_data_category_dict, gee_raw_data_directory, \
+    get_missing_raw_data_list, collection_grid_dict, open_raw_data_catalog
+from util.concurrency_util import run_in_parallel
+from util.request_util import set_max_concurrent_requests, set_request_rate, print_request_statistics, \
+    get_request_statistics
+from util.swat_file_util import save_weather_file, wait_for_weather_files, set_swat_input_data_directory, \
+    get_swat_input_data_directory, get_weather_station_directory, get_optional_directory, station_file_name, \
+    generator_file_name, cli_file_extension_list, wait_for_weather_file
+from util.shard_util import parse_shard, get_shard_wgn_id_list, read_station_file, shard_method_list
+from util.station_util import get_grid_station_list, set_station_registry, get_station_dataframe, get_station_details, \
+    get_station_name
+from util.date_util import add_year_and_step_columns, get_daily_values
+from util.weather_generator_util import get_generator_data
+from util.journal_util import open_run_journal, is_variable_completed, record_variable, get_journal_entry
+from util.build_manifest_util import open_build_manifest, update_output, get_value_hash, get_text_hash, \
+    get_files_hash
 import pandas as pd
-import numpy as np
-from util.performance_util import start_time_measure, end_time_measure
+from util.performance_util import start_time_measure, end_time_measure, measure_span, measure_context, record_span, \
+    save_run_report, start_profile, end_profile
 import datetime
+from functools import partial
 from dateutil.relativedelta import relativedelta
 
 
 def save_single_cli_file(df_cli, file_name):
-    weather_station_directory = 'SWAT_INPUT_DATA/WEATHER_STATIONS'
-    file_path = weather_station_directory + '/' + file_name
-    df_cli.to_csv(file_path, encoding='utf-8', index=False, header=False)
-    print(file_path + ' saved')
+    file_path = get_weather_station_directory() + '/' + file_name
+
+    def save_cli_file(output_file_path):
+        df_cli.to_csv(output_file_path, encoding='utf-8', index=False, header=False)
+        print(output_file_path + ' saved')
+
+    # written only if its list of weather files changed (see util/build_manifest_util.py)
+    update_output(file_path, get_value_hash(df_cli[0].tolist()), save_cli_file)
 
 
 def save_all_cli_files():
@@ -46,12 +73,11 @@ def update_cli_file_list(file_extension, file_name):
         slr_cli_file_list.append(file_name)
 
 
-def add_header_and_save(df_out, station_name, file_extension):
-    if df_out is not None:
-        # insert 3rd row
-        # station dictionary uses station name as key
-        station_details = station_dict[station_name]
-        # example of station dictionary value: [1, 'station_001', 36.4759, 9.4573, 114, 2]
+def add_header_and_save(df_daily, list_of_columns, station_name, file_extension):
+    if df_daily is not None:
+        # 3rd row: station registry (see util/station_util.py), looked up by station name
+        station_details = get_station_details(station_name)
+        # example of station details: [1, 'station_001', 36.4759, 9.4573, 114, 2]
         # indexes are as follows:
         # 0: station ID
         # 1: station name
@@ -59,40 +85,13 @@ def add_header_and_save(df_out, station_name, file_extension):
         # 3: lon
         # 4: elev
         # 5: rain years
-        df_third_row = pd.DataFrame(
-            [[station_details[5], 0, station_details[2], station_details[3], station_details[4]]],
-            columns=['col1', 'col2', 'col3', 'col4', 'col5'])
-        df_out = pd.concat([df_third_row, df_out])
-
-        # insert 2nd row
-        df_second_row = pd.DataFrame([['NBYR', 'TSTEP', 'LAT', 'LONG', 'ELEV']],
-                                     columns=['col1', 'col2', 'col3', 'col4', 'col5'])
-        df_out = pd.concat([df_second_row, df_out])
-
-        target_filename = station_name + '.' + file_extension
-
-        # insert 1st row
-        df_first_row = pd.DataFrame([[target_filename]], columns=['col1'])
-        df_out = pd.concat([df_first_row, df_out])
-
-        # dataframe to CSV
-        weather_station_directory = 'SWAT_INPUT_DATA/WEATHER_STATIONS'
-        file_path = weather_station_directory + '/' + target_filename
-        # pandas.DataFrame.to_csv
-        # https://pandas.pydata.org/docs/reference/api/pandas.DataFrame.to_csv.html
-        df_out.to_csv(file_path, columns=['col1', 'col2', 'col3', 'col4', 'col5'], encoding='utf-8', index=False,
-                      header=False, sep=' ')
-        print(file_path + ' saved')
-        print('\n')
 
-        # update CLI-file list
-        update_cli_file_list(file_extension, target_filename)
+        # columns: year, step, then values (up to 3 columns), without copy into a dataframe with generic column names
+        save_weather_file(station_name + '.' + file_extension, station_details, df_daily['year'], df_daily['step'],
+                          [df_daily[column] for column in list_of_columns])
 
 
-# def get_daily_precipitation(collection, list_of_bands, station_name, file_extension):
-#     # interval_size_in_days = 3000: no memory issues of GEE with this band
-#     df_result = get_gee_data(lon, lat, collection, list_of_bands, from_date_string, to_date_string, 3000, scale, file_extension)
-#
+# def get_daily_precipitation(df_result, list_of_bands, station_name, file_extension):
 #     if df_result is not None:
 #         # change unit
 #         df_result[[*list_of_bands]] = df_result[[*list_of_bands]] * 10 ** 3  # m to mm
@@ -110,55 +109,35 @@ def add_header_and_save(df_out, station_name, file_extension):
 #         return df_result
 
 
-def get_daily_precipitation_imerg(collection, list_of_bands, station_name, file_extension):
-    # interval_size_in_days = 180: data retrieval by chunks, to bypass memory issues of GEE
-    df_half_hourly = get_gee_data(lon, lat, collection, list_of_bands, from_date_string, to_date_string, 180, scale,
-                                  file_extension)
-    df_daily = df_half_hourly.copy(deep=True)
-    df_daily.rename(columns={'precipitationCal': 'total_precipitation'}, inplace=True)
+# one measure every half-hour: daily sum, and daily max of half-hours (for pcp_hhr)
+precipitation_imerg_aggregation_dict = {'total_precipitation': ('precipitationCal', 'sum'),
+                                        'max_half_hour_precipitation': ('precipitationCal', 'max')}
 
-    if df_half_hourly is not None:
-        # change unit
-        df_half_hourly[['precipitationCal']] = df_half_hourly[
-                                                   ['precipitationCal']] / 2  # mm/hr to mm/half-hour
-        df_daily[['total_precipitation']] = df_daily[
-                                                ['total_precipitation']] / 2  # mm/hr to mm/half-hour
-
-        # one measure every half-hour: calculate daily sum
-        df_daily['date'] = pd.to_datetime(df_daily['datetime']).dt.date
-        df_daily = df_daily.groupby(['date'], as_index=False).sum()
-        df_daily[['total_precipitation']] = df_daily[['total_precipitation']].round(decimals=0)  # no decimals!
 
-        print(station_name + '.' + file_extension)
-        print(df_daily.head())
+def get_daily_precipitation_imerg(df_daily, list_of_bands, station_name, file_extension):
+    # df_daily: daily values (see precipitation_imerg_aggregation_dict)
 
-        # add columns for csv output
-        df_daily['year'] = pd.to_datetime(df_daily['date']).dt.year
+    if df_daily is not None:
+        # change unit (sum and max of half-hours: halving before or after reduction gives the same values)
+        df_daily[['total_precipitation', 'max_half_hour_precipitation']] = df_daily[
+            ['total_precipitation', 'max_half_hour_precipitation']] / 2  # mm/hr to mm/half-hour
 
-        # how to reset a counter every new day using pandas and numpy?
-        # https://stackoverflow.com/questions/59486551/how-to-reset-a-counter-every-new-day-using-pandas-and-numpy
-        df_daily['step'] = 1
-        # increment step for all days of year, and reset to 1 at change of year
-        df_daily['step'] = df_daily[['step', 'year']].groupby('year').transform(lambda x: x.cumsum())
+        df_daily[['total_precipitation']] = df_daily[['total_precipitation']].round(decimals=0)  # no decimals!
 
-        # deep copy, to prevent SettingWithCopyWarning during column renaming
-        df_out = df_daily[['year', 'step', 'total_precipitation']].copy(deep=True)
+        print(station_name + '.' + file_extension)
+        print(df_daily.head())
 
-        # rename columns, because save method uses generic column names
-        df_out.rename(columns={'year': 'col1', 'step': 'col2', 'total_precipitation': 'col3'}, inplace=True)
-        df_out['col4'] = ''
-        df_out['col5'] = ''
+        # add columns for csv output: year and day of year, missing days reported
+        add_year_and_step_columns(df_daily, 'datetime', station_name + '.' + file_extension, from_date_string,
+                                  to_date_string)
 
         # save weather file
-        add_header_and_save(df_out, station_name, file_extension)
+        add_header_and_save(df_daily, ['total_precipitation'], station_name, file_extension)
 
-        return df_half_hourly, df_daily
+        return df_daily
 
 
-def get_daily_temperature(collection, list_of_bands, station_name, file_extension):
-    # interval_size_in_days = 3000: no memory issues of GEE with this band
-    df_result = get_gee_data(lon, lat, collection, list_of_bands, from_date_string, to_date_string, 3000, scale,
-                             file_extension)
+def get_daily_temperature(df_result, list_of_bands, station_name, file_extension):
 
     if df_result is not None:
         # change unit
@@ -167,31 +146,18 @@ def get_daily_temperature(collection, list_of_bands, station_name, file_extensio
         print(station_name + '.' + file_extension)
         print(df_result.head())
 
-        # add columns for csv output
-        df_result['year'] = pd.to_datetime(df_result['datetime']).dt.year
-
-        df_result['step'] = 1
-        # increment step for all days of year, and reset to 1 at change of year
-        df_result['step'] = df_result[['step', 'year']].groupby('year').transform(lambda x: x.cumsum())
-
-        # deep copy, to prevent SettingWithCopyWarning during column renaming
-        df_out = df_result[['year', 'step', 'maximum_2m_air_temperature', 'minimum_2m_air_temperature']].copy(deep=True)
-
-        # rename columns, because save method uses generic column names
-        df_out.rename(columns={'year': 'col1', 'step': 'col2', 'maximum_2m_air_temperature': 'col3',
-                               'minimum_2m_air_temperature': 'col4'}, inplace=True)
-        df_out['col5'] = ''
+        # add columns for csv output: year and day of year, missing days reported
+        add_year_and_step_columns(df_result, 'datetime', station_name + '.' + file_extension, from_date_string,
+                                  to_date_string)
 
         # save weather file
-        add_header_and_save(df_out, station_name, file_extension)
+        add_header_and_save(df_result, ['maximum_2m_air_temperature', 'minimum_2m_air_temperature'], station_name,
+                            file_extension)
 
         return df_result
 
 
-def get_daily_wind_speed(collection, list_of_bands, station_name, file_extension):
-    # interval_size_in_days = 3000: no memory issues of GEE with this band
-    df_result = get_gee_data(lon, lat, collection, list_of_bands, from_date_string, to_date_string, 3000, scale,
-                             file_extension)
+def get_daily_wind_speed(df_result, list_of_bands, station_name, file_extension):
 
     if df_result is not None:
         # derive wind speed from U and V component: vectorized solution
@@ -201,326 +167,362 @@ def get_daily_wind_speed(collection, list_of_bands, station_name, file_extension
         print(station_name + '.' + file_extension)
         print(df_result.head())
 
-        # add columns for csv output
-        df_result['year'] = pd.to_datetime(df_result['datetime']).dt.year
-
-        df_result['step'] = 1
-        # increment step for all days of year, and reset to 1 at change of year
-        df_result['step'] = df_result[['step', 'year']].groupby('year').transform(lambda x: x.cumsum())
-
-        # deep copy, to prevent SettingWithCopyWarning during column renaming
-        df_out = df_result[['year', 'step', 'wind_speed']].copy(deep=True)
-
-        # rename columns, because save method uses generic column names
-        df_out.rename(columns={'year': 'col1', 'step': 'col2', 'wind_speed': 'col3'}, inplace=True)
-        df_out['col4'] = ''
-        df_out['col5'] = ''
+        # add columns for csv output: year and day of year, missing days reported
+        add_year_and_step_columns(df_result, 'datetime', station_name + '.' + file_extension, from_date_string,
+                                  to_date_string)
 
         # save weather file
-        add_header_and_save(df_out, station_name, file_extension)
+        add_header_and_save(df_result, ['wind_speed'], station_name, file_extension)
 
         return df_result
 
 
-def get_daily_relative_humidity(collection, list_of_bands, station_name, file_extension):
-    # interval_size_in_days = 30: data retrieval by chunks, to bypass memory issues of GEE
-    df_result = get_gee_data(lon, lat, collection, list_of_bands, from_date_string, to_date_string, 30, scale,
-                             file_extension)
+# several measures per day: daily mean
+relative_humidity_aggregation_dict = {
+    'relative_humidity_2m_above_ground': ('relative_humidity_2m_above_ground', 'mean')}
 
-    if df_result is not None:
-        # several measures per day: calculate daily mean
-        df_result['date'] = pd.to_datetime(df_result['datetime']).dt.date
-        df_result = df_result.groupby(['date'], as_index=False).mean()
 
+def get_daily_relative_humidity(df_result, list_of_bands, station_name, file_extension):
+    # df_result: daily values (see relative_humidity_aggregation_dict)
+
+    if df_result is not None:
         # change unit
         df_result[[*list_of_bands]] = df_result[[*list_of_bands]] / 100
 
         print(station_name + '.' + file_extension + ' - daily mean')
         print(df_result.head())
 
-        # add columns for csv output
-        df_result['year'] = pd.to_datetime(df_result['date']).dt.year
-
-        df_result['step'] = 1
-        # increment step for all days of year, and reset to 1 at change of year
-        df_result['step'] = df_result[['step', 'year']].groupby('year').transform(lambda x: x.cumsum())
-
-        # deep copy, to prevent SettingWithCopyWarning during column renaming
-        df_out = df_result[['year', 'step', 'relative_humidity_2m_above_ground']].copy(deep=True)
-
-        # rename columns, because save method uses generic column names
-        df_out.rename(columns={'year': 'col1', 'step': 'col2', 'relative_humidity_2m_above_ground': 'col3'},
-                      inplace=True)
-        df_out['col4'] = ''
-        df_out['col5'] = ''
+        # add columns for csv output: year and day of year, missing days reported
+        add_year_and_step_columns(df_result, 'datetime', station_name + '.' + file_extension, from_date_string,
+                                  to_date_string)
 
         # save weather file
-        add_header_and_save(df_out, station_name, file_extension)
+        add_header_and_save(df_result, ['relative_humidity_2m_above_ground'], station_name, file_extension)
 
         return df_result
 
 
-def get_daily_solar_radiation(collection, list_of_bands, station_name, file_extension):
-    # interval_size_in_days = 180: data retrieval by chunks, to bypass memory issues of GEE
-    df_result = get_gee_data(lon, lat, collection, list_of_bands, from_date_string, to_date_string, 180, scale,
-                             file_extension)
+# several measures per day: daily mean
+solar_radiation_aggregation_dict = {'surface_net_solar_radiation': ('surface_net_solar_radiation', 'mean')}
 
-    if df_result is not None:
-        # several measures per day: calculate daily mean
-        df_result['date'] = pd.to_datetime(df_result['datetime']).dt.date
-        df_result = df_result.groupby(['date'], as_index=False).mean()
 
+def get_daily_solar_radiation(df_result, list_of_bands, station_name, file_extension):
+    # df_result: daily values (see solar_radiation_aggregation_dict)
+
+    if df_result is not None:
         # change unit
         df_result[[*list_of_bands]] = df_result[[*list_of_bands]] / 10 ** 6  # divide by 10**6
 
         print(station_name + '.' + file_extension + ' - daily mean')
         print(df_result.head())
 
-        # add columns for csv output
-        df_result['year'] = pd.to_datetime(df_result['date']).dt.year
+        # add columns for csv output: year and day of year, missing days reported
+        add_year_and_step_columns(df_result, 'datetime', station_name + '.' + file_extension, from_date_string,
+                                  to_date_string)
 
-        df_result['step'] = 1
-        # increment step for all days of year, and reset to 1 at change of year
-        df_result['step'] = df_result[['step', 'year']].groupby('year').transform(lambda x: x.cumsum())
+        # save weather file
+        add_header_and_save(df_result, ['surface_net_solar_radiation'], station_name, file_extension)
 
-        # deep copy, to prevent SettingWithCopyWarning during column renaming
-        df_out = df_result[['year', 'step', 'surface_net_solar_radiation']].copy(deep=True)
+        return df_result
 
-        # rename columns, because save method uses generic column names
-        df_out.rename(columns={'year': 'col1', 'step': 'col2', 'surface_net_solar_radiation': 'col3'},
-                      inplace=True)
-        df_out['col4'] = ''
-        df_out['col5'] = ''
 
-        # save weather file
-        add_header_and_save(df_out, station_name, file_extension)
+# daily reduction of half-hourly / hourly collections, by collection
+daily_reduction_dict = {'NASA/GPM_L3/IMERG_V06': precipitation_imerg_aggregation_dict,
+                        'NOAA/GFS0P25': relative_humidity_aggregation_dict,
+                        'ECMWF/ERA5_LAND/HOURLY': solar_radiation_aggregation_dict}
+
+
+def get_run_collection(collection):
+    # source filtering: filtered collection, images selected by GEE (see google_earth_engine_util.source_filter_dict)
+    if is_source_filtering and collection in source_filter_collection_dict:
+        return source_filter_collection_dict[collection]
+    return collection
+
+
+def get_run_collection_band_list():
+    # raw data of a run: list of (collection, list of bands), filtered collections if source filtering
+    # (as well as whole collections as reference, if validated)
+    collection_band_list = [(get_run_collection(collection), list_of_bands)
+                            for collection, list_of_bands in raw_data_category_dict.values()]
+    if is_source_filtering and is_source_filtering_validated:
+        collection_band_list += [(collection, list_of_bands)
+                                 for collection, list_of_bands in raw_data_category_dict.values()
+                                 if collection in source_filter_collection_dict]
+    return collection_band_list
 
-        return df_result
 
+def get_run_daily_reduction_dict():
+    return {get_run_collection(collection): aggregation_dict
+            for collection, aggregation_dict in daily_reduction_dict.items()}
 
-def get_generator_columns(wgn_id, df_half_hourly_precipitation, df_daily_precipitation, df_daily_temperature,
-                          df_daily_wind_speed,
-                          df_daily_solar_radiation):
-    # https://stackoverflow.com/questions/13784192/creating-an-empty-pandas-dataframe-then-filling-it
-    df_generator_data = pd.DataFrame()
-    df_generator_data['id'] = range((wgn_id - 1) * 12 + 1, (wgn_id - 1) * 12 + 13)  # range increases by periods of 12
-    df_generator_data['wgn_id'] = wgn_id
-
-    if df_daily_temperature is not None:
-        # temperature 'month' column
-        df_daily_temperature['month'] = pd.to_datetime(df_daily_temperature['datetime']).dt.month
-
-        # temperature monthly mean
-        df_monthly_tmp_mean = df_daily_temperature.groupby(['month'], as_index=False).mean()
-        # month
-        df_generator_data['month'] = df_monthly_tmp_mean['month']
-        # tmp_max_ave
-        df_generator_data['tmp_max_ave'] = df_monthly_tmp_mean['maximum_2m_air_temperature']
-        # tmp_min_ave
-        df_generator_data['tmp_min_ave'] = df_monthly_tmp_mean['minimum_2m_air_temperature']
-
-        # temperature monthly standard deviation
-        df_monthly_tmp_std = df_daily_temperature.groupby(['month'], as_index=False).std()
-        # tmp_max_sd
-        df_generator_data['tmp_max_sd'] = df_monthly_tmp_std['maximum_2m_air_temperature']
-        # tmp_min_sd
-        df_generator_data['tmp_min_sd'] = df_monthly_tmp_std['minimum_2m_air_temperature']
-
-    if df_daily_precipitation is not None:
-
-        if is_precipitation_data_source_imerg:
-
-            # precipitation 'year' column
-            df_daily_precipitation['year'] = pd.to_datetime(
-                df_daily_precipitation['date']).dt.year  # source column is ['date']
-
-            # precipitation 'month' column
-            df_daily_precipitation['month'] = pd.to_datetime(
-                df_daily_precipitation['date']).dt.month  # source column is ['date']
-
-        else:
-
-            # precipitation 'year' column
-            df_daily_precipitation['year'] = pd.to_datetime(
-                df_daily_precipitation['datetime']).dt.year  # source column is ['datetime']
-
-            # precipitation 'month' column
-            df_daily_precipitation['month'] = pd.to_datetime(
-                df_daily_precipitation['datetime']).dt.month  # source column is ['datetime']
-
-        # rolling comparison with a moving window size of 2 observations
-        wet_following_dry = lambda x: (x[-1] == 0 and x[0] > 0)  # current = x[-1], previous = x[0]
-        # compare = lambda x: (
-        #             x.values[-1] > 0 and x.values[0] > 0)  # call lambda with raw=False: parameters passed as series
-        wet_following_wet = lambda x: (
-                x[-1] > 0 and x[0] > 0)  # call lambda with raw=True: parameters passed as ndarray objects
-        df_daily_precipitation['wet_dry'] = df_daily_precipitation['total_precipitation'].rolling(2).apply(
-            wet_following_dry, raw=True).replace({np.nan: 0.0})
-        df_daily_precipitation['wet_wet'] = df_daily_precipitation['total_precipitation'].rolling(2).apply(
-            wet_following_wet, raw=True).replace({np.nan: 0.0})
-
-        # sum of precipitation-sequences by period (year + month)
-        df_period_pcp_seq_sum = df_daily_precipitation.groupby(['year', 'month'], as_index=False).sum()
-
-        # precipitation monthly average
-        df_monthly_pcp_mean = df_period_pcp_seq_sum.groupby(['month'], as_index=False).mean()
-        # pcp_ave
-        df_generator_data['pcp_ave'] = df_monthly_pcp_mean['total_precipitation']
-
-        # precipitation monthly standard deviation
-        df_monthly_pcp_std = df_period_pcp_seq_sum.groupby(['month'], as_index=False).std()
-        # pcp_sd
-        df_generator_data['pcp_sd'] = df_monthly_pcp_std['total_precipitation']
-
-        # precipitation monthly skew
-        df_monthly_pcp_skew = df_period_pcp_seq_sum.groupby(['month'], as_index=False).skew()
-        # pcp_skew
-        df_generator_data['pcp_skew'] = df_monthly_pcp_skew['total_precipitation']
-
-        # sum of precipitation-sequences by period (year + month)
-        df_daily_precipitation['row_counter'] = 1
-        df_monthly_pcp_seq_sum = df_daily_precipitation.groupby(['month'], as_index=False).sum()
-
-        # wet_dry
-        df_generator_data['wet_dry'] = df_monthly_pcp_seq_sum['wet_dry'] / df_monthly_pcp_seq_sum['row_counter']
-
-        # wet_wet
-        df_generator_data['wet_wet'] = df_monthly_pcp_seq_sum['wet_wet'] / df_monthly_pcp_seq_sum['row_counter']
-
-        # pcp_days
-        df_period_pcp_nonzero = df_daily_precipitation.groupby(['year', 'month'], as_index=False)[
-            'total_precipitation'].agg(np.count_nonzero)
-        df_monthly_pcp_nonzero = df_period_pcp_nonzero.groupby(['month'], as_index=False).mean()
-        df_generator_data['pcp_days'] = df_monthly_pcp_nonzero['total_precipitation']
-
-        if is_precipitation_data_source_imerg:
-
-            # half-hourly precipitation 'year' column
-            df_half_hourly_precipitation['year'] = pd.to_datetime(
-                df_half_hourly_precipitation['datetime']).dt.year  # source column is ['datetime']
-
-            # half-hourly precipitation 'month' column
-            df_half_hourly_precipitation['month'] = pd.to_datetime(
-                df_half_hourly_precipitation['datetime']).dt.month  # source column is ['datetime']
-
-            # pcp_hhr: data granularity is already half-hour
-            df_period_pcp_max = df_half_hourly_precipitation.groupby(['year', 'month'], as_index=False)[
-                'precipitationCal'].max()
-            df_monthly_pcp_max = df_period_pcp_max.groupby(['month'], as_index=False).mean()
-            df_generator_data['pcp_hhr'] = df_monthly_pcp_max['precipitationCal']
-
-        else:
-
-            # pcp_hhr: assumption that half-hour of interest has received 1/2 of pcp of day with max rainfall
-            df_period_pcp_max = df_daily_precipitation.groupby(['year', 'month'], as_index=False)[
-                                    'total_precipitation'].max() / 2  # <-- assumption: 1 hour of rain on that max-day
-            df_monthly_pcp_max = df_period_pcp_max.groupby(['month'], as_index=False).mean()
-            df_generator_data['pcp_hhr'] = df_monthly_pcp_max['total_precipitation']
-
-    if df_daily_solar_radiation is not None:
-        # solar radiation 'month' column
-        df_daily_solar_radiation['month'] = pd.to_datetime(df_daily_solar_radiation['date']).dt.month
-        # solar radiation monthly mean
-        df_monthly_slr_mean = df_daily_solar_radiation.groupby(['month'], as_index=False).mean()
-        # slr_ave
-        df_generator_data['slr_ave'] = df_monthly_slr_mean['surface_net_solar_radiation']
-
-    # get dewpoint daily values (not fetched yet)
-    df_daily_dewpoint = get_gee_data(lon, lat, 'ECMWF/ERA5/DAILY', ['dewpoint_2m_temperature'], from_date_string,
-                                     to_date_string, 3000, scale, 'dew')
-    if df_daily_dewpoint is not None:
-        df_daily_dewpoint[['dewpoint_2m_temperature']] = df_daily_dewpoint[
-                                                             ['dewpoint_2m_temperature']] - 273.15  # Kelvin to Celsius
-        # dewpoint 'month' column
-        df_daily_dewpoint['month'] = pd.to_datetime(df_daily_dewpoint['datetime']).dt.month
-        # dewpoint monthly mean
-        df_monthly_dewpoint_mean = df_daily_dewpoint.groupby(['month'], as_index=False).mean()
-        # dew_ave
-        df_generator_data['dew_ave'] = df_monthly_dewpoint_mean['dewpoint_2m_temperature']
-
-    if df_daily_wind_speed is not None:
-        # wind speed 'month' column
-        df_daily_wind_speed['month'] = pd.to_datetime(df_daily_wind_speed['datetime']).dt.month
-        # wind speed monthly mean
-        df_monthly_wind_speed_mean = df_daily_wind_speed.groupby(['month'], as_index=False).mean()
-        # wnd_ave
-        df_generator_data['wnd_ave'] = df_monthly_wind_speed_mean['wind_speed']
-
-    return df_generator_data
-
-
-def process_single_weather_station(wgn_id):
-    df_half_hourly_precipitation = None
 
+def validate_daily_values(df_reference, df_result, description):
+    # comparison of daily values with reference values: days missing on either side, max absolute difference
+    if df_reference is None or df_result is None:
+        print('VALIDATION:', description, '- no data to compare')
+        return
+    df_comparison = df_reference.merge(df_result, on='datetime', how='outer', suffixes=('_reference', ''),
+                                       indicator=True)
+    print('VALIDATION:', description, '- days missing:',
+          (df_comparison['_merge'] == 'left_only').sum(), '- days not in reference:',
+          (df_comparison['_merge'] == 'right_only').sum())
+    for column in df_result.columns.drop('datetime'):
+        print('VALIDATION:', description, '-', column, '- max absolute difference:',
+              (df_comparison[column] - df_comparison[column + '_reference']).abs().max(), '- mean:',
+              df_comparison[column].mean(), '- mean of reference:', df_comparison[column + '_reference'].mean())
+
+
+def get_daily_dewpoint(df_result, list_of_bands):
+    # dewpoint is only used for weather generator data: no weather file to save
+
+    if df_result is not None:
+        # change unit
+        df_result[[*list_of_bands]] = df_result[[*list_of_bands]] - 273.15  # Kelvin to Celsius
+
+    return df_result
+
+
+# daily values used for weather generator data, by variable: {column: generator input column} (hmd is not used)
+generator_input_column_dict = {
+    'tmp': {'maximum_2m_air_temperature': 'tmp_max', 'minimum_2m_air_temperature': 'tmp_min'},
+    'pcp': {'total_precipitation': 'pcp', 'max_half_hour_precipitation': 'pcp_max'},
+    'slr': {'surface_net_solar_radiation': 'slr'},
+    'dew': {'dewpoint_2m_temperature': 'dew'},
+    'wnd': {'wind_speed': 'wnd'}
+}
+
+
+def get_variable_generator_input(variable, df_daily):
+    # daily values of a variable used for weather generator data, as JSON values (see util/journal_util.py):
+    # {'date': ['2015-01-01', ...], generator input column: [...]}, None if the variable is not used
+    # statistics are computed for all weather stations at once, from the run journal (see get_journal_generator_data)
+    if variable not in generator_input_column_dict or df_daily is None:
+        return None
+    generator_input_dict = {'date': pd.to_datetime(df_daily['datetime']).dt.strftime('%Y-%m-%d').tolist()}
+    for column, input_column in generator_input_column_dict[variable].items():
+        # floats are written with repr: no precision loss
+        generator_input_dict[input_column] = df_daily[column].tolist()
+    return generator_input_dict
+
+
+def get_journal_generator_data(wgn_id_list):
+    # weather generator data of all weather stations, from daily values of the run journal: a single pass of the
+    # weather generator statistics (see util/weather_generator_util.py), whatever the number of weather stations
+    generator_input_dict = {}
+    for variable in generator_input_column_dict:
+        df_input_list = []
+        for wgn_id in wgn_id_list:
+            generator_input = get_journal_entry(wgn_id, variable)['generator_input']
+            if generator_input is not None:
+                df_input = pd.DataFrame(generator_input)
+                df_input.insert(0, 'wgn_id', wgn_id)
+                df_input_list.append(df_input)
+        generator_input_dict[variable] = pd.concat(df_input_list, axis=0, ignore_index=True) if len(
+            df_input_list) > 0 else None
+    return get_generator_data(generator_input_dict['tmp'], generator_input_dict['pcp'], generator_input_dict['slr'],
+                              generator_input_dict['dew'], generator_input_dict['wnd'],
+                              is_precipitation_data_source_imerg)
+
+
+def get_processing_code_hash():
+    # source code of daily reduction, weather file and weather generator functions: outputs are processed again after a
+    # change of these modules
+    # https://docs.python.org/3/library/inspect.html#inspect.getsource
+    return get_value_hash([inspect.getsource(module) for module in [date_util, swat_file_util,
+                                                                    weather_generator_util]])
+
+
+def get_variable_inputs_hash(weather_station_name, variable_details):
+    # inputs of the weather file and daily weather generator values of a variable (see util/build_manifest_util.py):
+    # processing parameters, weather station details, processing function (e.g. unit conversions), variable details
+    # and content of the raw data files it reads
+    variable, function, collection, list_of_bands, aggregation_dict, _ = variable_details
+    station_details = get_station_details(weather_station_name)
+    if is_server_side_reduction and aggregation_dict is not None:
+        raw_data_band_list = [get_composite_band(band, function_name)
+                              for band, function_name in aggregation_dict.values()]
+    else:
+        raw_data_band_list = list_of_bands
+    raw_data_file_list = get_raw_data_file_list(station_details[3], station_details[2], collection,
+                                                raw_data_band_list, from_date_string, to_date_string)
+    return get_value_hash({'parameters': processing_parameter_dict, 'station': station_details,
+                           'variable': [variable, collection, list_of_bands, aggregation_dict],
+                           'function': inspect.getsource(function), 'raw_data': get_files_hash(raw_data_file_list)})
+
+
+def process_single_weather_station(wgn_id, lon, lat):
     # weather station name
-    weather_station_name = 'station_' + str(wgn_id).zfill(3)  # 7 -> station_007
+    weather_station_name = get_station_name(wgn_id)  # 7 -> station_007
 
     weather_station_total_time = start_time_measure(
         ">>> " + weather_station_name + " - starting data retrieval...")
     print("\n")
 
-    # if is_precipitation_data_source_imerg:
-
-    # half-hourly / daily: precipitation IMERG
-    df_half_hourly_precipitation, df_daily_precipitation = get_daily_precipitation_imerg('NASA/GPM_L3/IMERG_V06',
-                                                                                         ['precipitationCal'],
-                                                                                         weather_station_name,
-                                                                                         'pcp')
-
-    # else:
-    #     # daily: precipitation ERA5
-    #     df_daily_precipitation = get_daily_precipitation('ECMWF/ERA5/DAILY', ['total_precipitation'],
-    #                                                      weather_station_name,
-    #                                                      'pcp')
-
-    # daily: temperature
-    df_daily_temperature = get_daily_temperature('ECMWF/ERA5/DAILY',
-                                                 ['maximum_2m_air_temperature', 'minimum_2m_air_temperature'],
-                                                 weather_station_name,
-                                                 'tmp')
-    #
-    # daily: wind speed
-    df_daily_wind_speed = get_daily_wind_speed('ECMWF/ERA5/DAILY',
-                                               ['u_component_of_wind_10m', 'v_component_of_wind_10m'],
-                                               weather_station_name,
-                                               'wnd')
-
-    # daily: relative humidity
-    df_daily_relative_humidity = get_daily_relative_humidity('NOAA/GFS0P25', ['relative_humidity_2m_above_ground'],
-                                                             weather_station_name,
-                                                             'hmd')
-
-    # daily: solar radiation
-    df_daily_solar_radiation = get_daily_solar_radiation('ECMWF/ERA5_LAND/HOURLY', ['surface_net_solar_radiation'],
-                                                         weather_station_name,
-                                                         'slr')
-
-    # get generator data
-    df_generator_data = get_generator_columns(wgn_id, df_half_hourly_precipitation, df_daily_precipitation,
-                                              df_daily_temperature, df_daily_wind_speed,
-                                              df_daily_solar_radiation)
-    print('\n')
-    end_time_measure(weather_station_total_time, ">>> " + weather_station_name + " - data retrieval time: ")
+    # variables of the weather station: variable, processing function, collection, bands, daily reduction, other
+    # arguments
+    # daily reduction: {output column: (band, function)}, None for collections of daily values
+    variable_list = [
+        # half-hourly / daily: precipitation IMERG
+        ('pcp', get_daily_precipitation_imerg, 'NASA/GPM_L3/IMERG_V06', ['precipitationCal'],
+         precipitation_imerg_aggregation_dict, (weather_station_name, 'pcp')),
+        # # daily: precipitation ERA5 (instead of IMERG)
+        # ('pcp', get_daily_precipitation, 'ECMWF/ERA5/DAILY', ['total_precipitation'], None,
+        #  (weather_station_name, 'pcp')),
+        # daily: temperature
+        ('tmp', get_daily_temperature, 'ECMWF/ERA5/DAILY',
+         ['maximum_2m_air_temperature', 'minimum_2m_air_temperature'], None, (weather_station_name, 'tmp')),
+        # daily: wind speed
+        ('wnd', get_daily_wind_speed, 'ECMWF/ERA5/DAILY', ['u_component_of_wind_10m', 'v_component_of_wind_10m'],
+         None, (weather_station_name, 'wnd')),
+        # 6-hourly / daily: relative humidity
+        ('hmd', get_daily_relative_humidity, get_run_collection('NOAA/GFS0P25'),
+         ['relative_humidity_2m_above_ground'],
+         relative_humidity_aggregation_dict, (weather_station_name, 'hmd')),
+        # hourly / daily: solar radiation
+        ('slr', get_daily_solar_radiation, get_run_collection('ECMWF/ERA5_LAND/HOURLY'),
+         ['surface_net_solar_radiation'],
+         solar_radiation_aggregation_dict, (weather_station_name, 'slr')),
+        # daily: dewpoint (weather generator data only)
+        ('dew', get_daily_dewpoint, 'ECMWF/ERA5/DAILY', ['dewpoint_2m_temperature'], None, ())
+    ]
 
-    # check for existence of directory SWAT_INPUT_DATA/OPTIONAL_XLSX_FILES
-    optional_directory = 'SWAT_INPUT_DATA/OPTIONAL_XLSX_FILES'
-    if not os.path.exists(optional_directory):
-        os.makedirs(optional_directory)
+    # incremental run: variables processed by a former run from the same inputs (see util/journal_util.py) are not
+    # processed again; raw data not cached yet gives other inputs
+    variable_list = [variable_details for variable_details in variable_list
+                     if not is_variable_completed(wgn_id, variable_details[0], get_weather_station_directory(),
+                                                  get_variable_inputs_hash(weather_station_name, variable_details))]
+    if len(variable_list) == 0:
+        print(">>> " + weather_station_name + " - up to date: skipped")
+        print('\n')
+        return
+
+    # server-side reduction: variables with a daily reduction are retrieved as daily composites built by GEE
+    # (one record per day instead of 4 to 48); other variables are retrieved from their collection
+    is_server_side_list = [is_server_side_reduction and aggregation_dict is not None
+                           for _, _, _, _, aggregation_dict, _ in variable_list]
+
+    # one retrieval per collection, for the union of the bands of all its variables (e.g. tmp, wnd and dew share
+    # ECMWF/ERA5/DAILY); collections are retrieved concurrently
+    # (number of GEE requests in flight is bounded by request_util.max_concurrent_requests)
+    collection_band_dict = get_band_union_dict([(collection, list_of_bands)
+                                                for (_, _, collection, list_of_bands, _, _), is_server_side
+                                                in zip(variable_list, is_server_side_list) if not is_server_side])
+
+    def retrieve_collection(collection, list_of_bands):
+        # spans and counters of the retrieval are labelled with the weather station and the collection
+        with measure_context(weather_station_name, collection), measure_span('retrieve'):
+            if is_streaming_reduction:
+                return prefetch_gee_data([[lon, lat]], collection, list_of_bands, from_date_string, to_date_string,
+                                         scale)
+            return get_gee_data(lon, lat, collection, list_of_bands, from_date_string, to_date_string, scale)
+
+    if is_streaming_reduction:
+        # streaming reduction: the cache is filled chunk by chunk, then each variable reads its bands chunk by chunk,
+        # reduced to daily values as they are read; memory scales with the chunk size, not with the record length
+        run_in_parallel(retrieve_collection, list(collection_band_dict.items()), max_concurrent_variables)
+    else:
+        # whole record of each collection in memory, then reduced to daily values
+        df_collection_list = run_in_parallel(retrieve_collection, list(collection_band_dict.items()),
+                                             max_concurrent_variables)
+        df_collection_dict = dict(zip(collection_band_dict.keys(), df_collection_list))
+
+    def get_variable_data(variable, collection, list_of_bands, aggregation_dict, is_server_side):
+        with measure_context(weather_station_name, variable), measure_span('load'):
+            return load_variable_data(collection, list_of_bands, aggregation_dict, is_server_side)
+
+    def load_variable_data(collection, list_of_bands, aggregation_dict, is_server_side):
+        # daily values of a variable (all images, if the collection holds daily values)
+        if is_server_side:
+            return get_daily_composite_gee_data(lon, lat, collection, aggregation_dict, from_date_string,
+                                                to_date_string, scale)
+        if is_streaming_reduction:
+            chunk_reducer = partial(get_daily_values, aggregation_dict=aggregation_dict) if aggregation_dict else None
+            return get_gee_data(lon, lat, collection, list_of_bands, from_date_string, to_date_string, scale,
+                                chunk_reducer)
+        # each variable is processed from its slice of the shared collection data
+        df_variable = get_band_slice(df_collection_dict[collection], list_of_bands)
+        return get_daily_values(df_variable, aggregation_dict) if aggregation_dict else df_variable
+
+    df_variable_list = run_in_parallel(
+        get_variable_data, [(variable, collection, list_of_bands, aggregation_dict, is_server_side)
+                            for (variable, _, collection, list_of_bands, aggregation_dict, _), is_server_side
+                            in zip(variable_list, is_server_side_list)], max_concurrent_variables)
+
+    if is_server_side_reduction and is_server_side_reduction_validated:
+        # locally reduced values are the reference of server-side daily composites
+        for (_, _, collection, list_of_bands, aggregation_dict, arguments), is_server_side, df_variable in zip(
+                variable_list, is_server_side_list, df_variable_list):
+            if is_server_side:
+                validate_daily_values(
+                    get_gee_data(lon, lat, collection, list_of_bands, from_date_string, to_date_string, scale,
+                                 partial(get_daily_values, aggregation_dict=aggregation_dict)),
+                    df_variable, weather_station_name + '.' + arguments[1] + ' - daily composites')
+
+    if is_source_filtering and is_source_filtering_validated:
+        # daily values of whole collections (images of all forecast hours, all hourly accumulations) are the
+        # reference of filtered collections; solar radiation differs by definition (accumulation of the whole day,
+        # instead of mean of hourly accumulations since 00:00)
+        for (_, _, collection, list_of_bands, aggregation_dict, arguments), df_variable in zip(variable_list,
+                                                                                            df_variable_list):
+            source_collection_list = [source_collection for source_collection, filtered_collection
+                                      in source_filter_collection_dict.items() if filtered_collection == collection]
+            if len(source_collection_list) > 0:
+                validate_daily_values(
+                    get_gee_data(lon, lat, source_collection_list[0], list_of_bands, from_date_string,
+                                 to_date_string, scale, partial(get_daily_values, aggregation_dict=aggregation_dict)),
+                    df_variable, weather_station_name + '.' + arguments[1] + ' - source filtering')
+
+    def process_variable(variable_details, df_variable):
+        # weather file (if any) and daily weather generator values of the variable, recorded in the run journal with
+        # the hash of their inputs (raw data retrieved by this run included)
+        variable, function, _, list_of_bands, _, arguments = variable_details
+        with measure_context(weather_station_name, variable):
+            with measure_span('process'):
+                df_daily = function(df_variable, list_of_bands, *arguments)
+            file_name = weather_station_name + '.' + variable if df_daily is not None and len(arguments) > 0 else None
+            generator_input = get_variable_generator_input(variable, df_daily)
+            # weather file written by a background thread: on disk before the variable is recorded as completed
+            if file_name is not None:
+                with measure_span('weather_file_wait'):
+                    wait_for_weather_file(file_name)
+            record_variable(wgn_id, variable, get_variable_inputs_hash(weather_station_name, variable_details),
+                            file_name, generator_input)
+
+    run_in_parallel(process_variable, list(zip(variable_list, df_variable_list)), max_concurrent_variables)
 
-    # dataframe to Excel
-    file_path = optional_directory + '/' + 'WGEN_' + weather_station_name + '_mon.xlsx'
-    df_generator_data.to_excel(file_path, encoding='utf-8', index=False, header=True)
     print('\n')
-    print(file_path + ' saved')
+    record_span('station', end_time_measure(weather_station_total_time, ">>> " + weather_station_name +
+                                            " - data retrieval time: ") - weather_station_total_time,
+                weather_station_name)
     print('\n')
     print(
         '==============================================================================================================================================')
     print('\n')
 
-    return df_generator_data
+
+def save_generator_xlsx_files(df_aggregated_generator):
+    # check for existence of directory SWAT_INPUT_DATA/OPTIONAL_XLSX_FILES
+    optional_directory = get_optional_directory()
+    if not os.path.exists(optional_directory):
+        os.makedirs(optional_directory)
+
+    for wgn_id, df_generator_data in df_aggregated_generator.groupby('wgn_id'):
+        # weather station name
+        weather_station_name = get_station_name(wgn_id)  # 7 -> station_007
+
+        def save_xlsx_file(file_path):
+            # dataframe to Excel
+            df_generator_data.to_excel(file_path, encoding='utf-8', index=False, header=True)
+            print(file_path + ' saved')
+
+        # written only if the weather generator data of the weather station changed (see util/build_manifest_util.py)
+        file_path = optional_directory + '/' + 'WGEN_' + weather_station_name + '_mon.xlsx'
+        update_output(file_path, get_text_hash(df_generator_data.to_csv(index=False)), save_xlsx_file)
+    print('\n')
 
 
-def create_station_file(weather_stations):
+def create_station_file(weather_stations, wgn_id_list):
+    # wgn_id_list: weather station IDs, e.g. IDs of a shard (see util/shard_util.py)
     delta = relativedelta(datetime.datetime.strptime(to_date_string, '%Y-%m-%d').date(),
                           datetime.datetime.strptime(from_date_string, '%Y-%m-%d').date())
     # example of delta: relativedelta(years=+5, months=+6, days=+9)
@@ -531,115 +533,242 @@ def create_station_file(weather_stations):
     print('delta years (rounded-up):', delta_years_rounded_up)
     print('\n')
 
-    columns = ['lon', 'lat', 'elev']
-    rows = range(1, len(weather_stations) + 1)
-    df_stations = pd.DataFrame(data=weather_stations, index=rows, columns=columns)
+    # station registry: one array per column (see util/station_util.py), also read by add_header_and_save
+    set_station_registry(wgn_id_list, weather_stations, delta_years_rounded_up)
+    df_stations = get_station_dataframe()
 
-    df_stations['id'] = df_stations.index
+    print(df_stations.head(len(weather_stations)))
+    print('\n')
 
-    df_stations.insert(0, 'name', range(1, len(weather_stations) + 1))
+    if df_stations is not None:
+        def save_station_file(file_path):
+            # dataframe to CSV
+            # pandas.DataFrame.to_csv
+            # https://pandas.pydata.org/docs/reference/api/pandas.DataFrame.to_csv.html
+            df_stations.to_csv(file_path, encoding='utf-8', index=False, header=True)
+            # # dataframe to Excel
+            # file_path = 'SWAT_INPUT_DATA' + '/' + 'WGEN_Siliana_stat.xlsx'
+            # df_stations.to_excel(file_path, encoding='utf-8', index=False, header=True)
+            print(file_path + ' saved')
+
+        update_output(get_swat_input_data_directory() + '/' + station_file_name,
+                      get_text_hash(df_stations.to_csv(index=False)), save_station_file)
+
+
+def get_raw_data_band_dict():
+    # bands needed from each collection by a run: {collection: list of bands}
+    # server-side reduction: bands of daily composites instead of raw bands (as well as raw bands, if validated)
+    collection_band_dict = get_band_union_dict(get_run_collection_band_list())
+    if is_server_side_reduction:
+        for collection, aggregation_dict in get_run_daily_reduction_dict().items():
+            composite_band_list = [get_composite_band(band, function) for band, function in aggregation_dict.values()]
+            if is_server_side_reduction_validated:
+                collection_band_dict[collection] = collection_band_dict[collection] + composite_band_list
+            else:
+                collection_band_dict[collection] = composite_band_list
+    return collection_band_dict
 
-    # Add Leading Zeros to Strings in Pandas Dataframe
-    # https://stackoverflow.com/questions/23836277/add-leading-zeros-to-strings-in-pandas-dataframe
-    # df_stations['name'] = df_stations['name'].astype(str).str.zfill(3)  # 7 -> 007
-    df_stations['name'] = df_stations['name'].apply(lambda x: 'station_' + str(x).zfill(3))  # 7 -> station_007
 
-    df_stations['rain_yrs'] = delta_years_rounded_up
+def get_run_missing_raw_data_list(weather_stations):
+    # collections of the cache (bilinear samples of region retrieval are cached apart)
+    return get_missing_raw_data_list(
+        weather_stations, {get_cache_collection(collection): list_of_bands
+                           for collection, list_of_bands in get_raw_data_band_dict().items()},
+        datetime.datetime.strptime(from_date_string, '%Y-%m-%d').date(),
+        datetime.datetime.strptime(to_date_string, '%Y-%m-%d').date())
 
-    # move column in pandas dataframe
-    # https://stackoverflow.com/questions/35321812/move-column-in-pandas-dataframe
-    df_stations = df_stations[['id', 'name', 'lat', 'lon', 'elev', 'rain_yrs']]
 
-    print(df_stations.head(len(weather_stations)))
+def print_missing_raw_data_list(missing_raw_data_list):
+    for pixel_key, collection, band, missing_interval_list in missing_raw_data_list:
+        print('missing: ' + pixel_key + ' ' + collection + ' ' + band + ' ' + ', '.join(
+            str(from_date) + ' to ' + str(to_date) for from_date, to_date in missing_interval_list))
+
+
+def check_raw_data_coverage(weather_stations):
+    # all raw data files of the run resolved up front: Earth Engine is imported, authenticated and initialized only if
+    # some are missing (see google_earth_engine_util.initialize_earth_engine)
+    missing_raw_data_list = get_run_missing_raw_data_list(weather_stations)
+
+    if len(missing_raw_data_list) == 0:
+        print('all raw data found in ' + gee_raw_data_directory + ': Earth Engine is not used')
+        print('\n')
+        return
+
+    print(str(len(missing_raw_data_list)) + ' raw data band(s) missing from ' + gee_raw_data_directory)
+    if is_offline:
+        # offline mode: fail fast, before any processing
+        print_missing_raw_data_list(missing_raw_data_list)
+        print('offline mode: missing raw data cannot be retrieved')
+        sys.exit(1)
     print('\n')
 
-    if df_stations is not None:
-        # dataframe to CSV
-        file_path = 'SWAT_INPUT_DATA' + '/' + 'WGEN_Siliana_stat.csv'
-        # pandas.DataFrame.to_csv
-        # https://pandas.pydata.org/docs/reference/api/pandas.DataFrame.to_csv.html
-        df_stations.to_csv(file_path, encoding='utf-8', index=False, header=True)
-        # # dataframe to Excel
-        # file_path = 'SWAT_INPUT_DATA' + '/' + 'WGEN_Siliana_stat.xlsx'
-        # df_stations.to_excel(file_path, encoding='utf-8', index=False, header=True)
-        print(file_path + ' saved')
-
-    # keep station details available as dictionary
-    for station_details in df_stations.values.tolist():
-        # example of station_details: [1, 'station_001', 36.4759, 9.4573, 114, 2]
-        # station name is used as dictionary key; dictionary value contains all fields
-        station_dict[station_details[1]] = station_details
-
-
-def main(weather_stations):
-    # # authenticate on GEE, using web page + paste of token
-    # ee.Authenticate(auth_mode='paste')
-    # authenticate on GEE, using gcloud
-    ee.Authenticate()
+
+def check_failed_chunks(weather_stations):
+    # chunks failed for good (retries exhausted, or a single day failing) are not cached and not dropped silently:
+    # files of the run are saved, then periods still missing are listed and the run fails. A new run retrieves
+    # these periods only.
+    print_request_statistics()
+    missing_raw_data_list = get_run_missing_raw_data_list(weather_stations)
+    if len(missing_raw_data_list) > 0:
+        print_missing_raw_data_list(missing_raw_data_list)
+        print(str(len(missing_raw_data_list)) + ' raw data band(s) not retrieved: run again to retry')
+        sys.exit(1)
+
+
+def main(weather_stations, wgn_id_list=None):
+    # wgn_id_list: IDs of the weather stations to process (1 for the 1st weather station of weather_stations), e.g.
+    # weather stations of a shard; None: all weather stations
+    if wgn_id_list is None:
+        wgn_id_list = list(range(1, len(weather_stations) + 1))
+    weather_stations = [weather_stations[wgn_id - 1] for wgn_id in wgn_id_list]
+
+    # output directory of the run (e.g. one per shard)
+    set_swat_input_data_directory(swat_input_data_directory)
+
+    # Earth Engine is never used in offline mode
+    set_offline(is_offline)
+
+    # upper bound of getInfo() calls in flight, over all weather stations and variables
+    set_max_concurrent_requests(max_concurrent_requests)
+    set_request_rate(max_requests_per_second, request_burst_size)
+    set_max_points_per_request(max_points_per_request)
+    set_retrieval_engine(retrieval_engine, region_sampling_method)
 
     # set global scope for a list of chosen variables
-    global lon, lat, from_date_string, to_date_string, is_precipitation_data_source_imerg, scale, station_dict, \
-        pcp_cli_file_list, tmp_cli_file_list, wnd_cli_file_list, hmd_cli_file_list, slr_cli_file_list
+    global from_date_string, to_date_string, is_precipitation_data_source_imerg, scale, \
+        pcp_cli_file_list, tmp_cli_file_list, wnd_cli_file_list, hmd_cli_file_list, slr_cli_file_list, \
+        processing_parameter_dict
 
     # check for existence of directory SWAT_INPUT_DATA
-    swat_input_data_directory = 'SWAT_INPUT_DATA'
     if not os.path.exists(swat_input_data_directory):
         os.makedirs(swat_input_data_directory)
 
     # check for existence of directory SWAT_INPUT_DATA/WEATHER_STATIONS
-    weather_station_directory = 'SWAT_INPUT_DATA/WEATHER_STATIONS'
-    if not os.path.exists(weather_station_directory):
-        os.makedirs(weather_station_directory)
+    if not os.path.exists(get_weather_station_directory()):
+        os.makedirs(get_weather_station_directory())
 
-    # check for existence of directory SWAT_INPUT_DATA/GEE_RAW_DATA
-    gee_raw_data_directory = 'GEE_RAW_DATA'
+    # check for existence of directory GEE_RAW_DATA
     if not os.path.exists(gee_raw_data_directory):
         os.makedirs(gee_raw_data_directory)
 
+    # raw data files of the former cache layout (one file per date range) are split into chunk files
+    migrate_legacy_raw_data_files()
+
+    # raw data catalog (see util/raw_data_catalog_util.py): built from the cache directory on first use, then updated
+    # as chunk files are saved; coverage checks query the catalog
+    open_raw_data_catalog()
+
+    # cache coverage of the run
+    check_raw_data_coverage(weather_stations)
+
+    # build manifest: aggregated files written from the same inputs by a former run are not written again
+    # (see util/build_manifest_util.py)
+    open_build_manifest(swat_input_data_directory, not is_restarted)
+
     # 1) create station csv file: WGEN_Siliana_stat.csv
-    create_station_file(weather_stations)
+    create_station_file(weather_stations, wgn_id_list)
+
+    # run journal: variables processed by a former run from the same inputs are skipped
+    run_parameter_dict = {'from_date': from_date_string, 'to_date': to_date_string,
+                          'weather_stations': [[wgn_id, *weather_station]
+                                               for wgn_id, weather_station in zip(wgn_id_list, weather_stations)],
+                          'is_precipitation_data_source_imerg': is_precipitation_data_source_imerg, 'scale': scale,
+                          'is_server_side_reduction': is_server_side_reduction,
+                          'retrieval_engine': retrieval_engine, 'region_sampling_method': region_sampling_method,
+                          'is_source_filtering': is_source_filtering}
+    # inputs of each variable: parameters of the run (weather stations apart) and processing code
+    processing_parameter_dict = {**{parameter: value for parameter, value in run_parameter_dict.items()
+                                    if parameter != 'weather_stations'}, 'code': get_processing_code_hash()}
+    open_run_journal(swat_input_data_directory, run_parameter_dict, not is_restarted)
+    print('\n')
 
     # How To Stop Python Script From Execution
     # https://appdividend.com/2022/07/14/how-to-stop-python-script-from-execution/
     # exit()
 
+    # batched retrieval: each request samples up to max_points_per_request weather stations at once, for the union
+    # of the bands of a collection; weather stations are then processed from cache
+    if is_batched_retrieval:
+        collection_band_dict = get_band_union_dict(get_run_collection_band_list())
+
+        # server-side reduction: daily composites of half-hourly / hourly collections
+        # (images of these collections are still needed as reference, if validated)
+        if is_server_side_reduction:
+            def prefetch_daily_composites(collection, aggregation_dict):
+                with measure_context(variable=collection), measure_span('prefetch'):
+                    prefetch_daily_composite_gee_data(weather_stations, collection, aggregation_dict,
+                                                      from_date_string, to_date_string, scale)
+
+            run_in_parallel(prefetch_daily_composites, list(get_run_daily_reduction_dict().items()),
+                            max_concurrent_variables)
+            if not is_server_side_reduction_validated:
+                collection_band_dict = {collection: list_of_bands
+                                        for collection, list_of_bands in collection_band_dict.items()
+                                        if collection not in get_run_daily_reduction_dict()}
+
+        def prefetch_collection(collection, list_of_bands):
+            with measure_context(variable=collection), measure_span('prefetch'):
+                prefetch_gee_data(weather_stations, collection, list_of_bands, from_date_string, to_date_string, scale)
+
+        run_in_parallel(prefetch_collection, list(collection_band_dict.items()), max_concurrent_variables)
+
     # 2) create monthly values csv file: WGEN_Siliana_mon.csv
-    df_aggregated_generator = None
-
-    # process all weather stations
-    for index, weather_station in enumerate(weather_stations):
-        lon = weather_station[0]
-        lat = weather_station[1]
-        df_delta_generator = process_single_weather_station(
-            wgn_id=index + 1)  # index starts at 0, weather station ID starts at 1
-
-        if df_delta_generator is not None:
-            if df_aggregated_generator is not None:
-                # axis=0: concatenate along rows
-                # ignore_index=True: a continuous index value is maintained across the rows in the concatenated data frame
-                df_aggregated_generator = pd.concat([df_aggregated_generator, df_delta_generator], axis=0,
-                                                    ignore_index=True)
-            else:
-                df_aggregated_generator = df_delta_generator
+    # process all weather stations: several stations in flight at the same time
+    # each completed variable is recorded in the run journal (weather file, daily weather generator values)
+    run_in_parallel(process_single_weather_station,
+                    [(wgn_id, weather_station[0], weather_station[1])
+                     for wgn_id, weather_station in zip(wgn_id_list, weather_stations)],
+                    max_concurrent_stations)
+
+    # aggregated files are built from the run journal, in weather station order: identical to a sequential run,
+    # whether weather stations were processed by this run or by a former one
+    for wgn_id in wgn_id_list:
+        # update CLI-file lists, in fixed order of CLI-files
+        for file_extension in cli_file_extension_list:
+            file_name = get_journal_entry(wgn_id, file_extension)['file']
+            if file_name is not None:
+                update_cli_file_list(file_extension, file_name)
+
+    # weather generator data of all weather stations
+    with measure_span('generator_data'):
+        df_aggregated_generator = get_journal_generator_data(wgn_id_list)
 
     if df_aggregated_generator is not None:
-        # dataframe to CSV
-        file_path = 'SWAT_INPUT_DATA' + '/' + 'WGEN_Siliana_mon.csv'
-        df_aggregated_generator.to_csv(file_path, encoding='utf-8', index=False, header=True)
-        # # dataframe to Excel
-        # file_path = 'SWAT_INPUT_DATA' + '/' + 'WGEN_Siliana_mon.xlsx'
-        # df_aggregated_generator.to_excel(file_path, encoding='utf-8', index=False, header=True)
-        print(file_path + ' saved')
+        with measure_span('excel_export'):
+            save_generator_xlsx_files(df_aggregated_generator)
+
+        def save_generator_file(file_path):
+            # dataframe to CSV
+            df_aggregated_generator.to_csv(file_path, encoding='utf-8', index=False, header=True)
+            # # dataframe to Excel
+            # file_path = 'SWAT_INPUT_DATA' + '/' + 'WGEN_Siliana_mon.xlsx'
+            # df_aggregated_generator.to_excel(file_path, encoding='utf-8', index=False, header=True)
+            print(file_path + ' saved')
+
+        with measure_span('csv_write'):
+            update_output(get_swat_input_data_directory() + '/' + generator_file_name,
+                          get_text_hash(df_aggregated_generator.to_csv(index=False)), save_generator_file)
         print('\n')
 
+    # weather files are written in the background: all of them are on disk before CLI-files refer to them
+    with measure_span('weather_file_wait'):
+        wait_for_weather_files()
+
     # 3) save all CLI-files
-    save_all_cli_files()
+    with measure_span('csv_write'):
+        save_all_cli_files()
 
+    # run report: time spent by stage, weather station and variable, GEE requests, cache hits, peak memory
+    save_run_report(swat_input_data_directory + '/' + run_report_file_name, run_parameter_dict,
+                    {'requests': get_request_statistics()})
+    print('\n')
 
-if __name__ == '__main__':
-    lon = 0.0
-    lat = 0.0
+    # 4) periods that could not be retrieved, if any
+    if not is_offline:
+        check_failed_chunks(weather_stations)
 
+
+if __name__ == '__main__':
     from_date_string = '2015-01-01'  # adapt value
     to_date_string = '2020-07-10'  # adapt value
 
@@ -684,8 +813,6 @@ if __name__ == '__main__':
         [9.3924, 35.8575, 987]
     ]
 
-    station_dict = {}
-
     # first 2 rows of all CLI-files
     # <ext>.cli
     # FILENAME
@@ -701,4 +828,129 @@ if __name__ == '__main__':
     # scale in meters
     scale = 30  # can keep this value
 
-    main(weather_station_list)
+    # concurrency limits: 1 for a sequential run
+    max_concurrent_stations = 4  # weather stations processed at the same time
+    max_concurrent_variables = 6  # variables (pcp, tmp, wnd, hmd, slr, dew) retrieved at the same time, per station
+    max_concurrent_requests = 8  # GEE requests in flight, over all stations and variables
+
+    # GEE request rate: requests started per second on average, and bursts; throttled or failed requests are retried
+    # with exponential backoff (see util/request_util.py)
+    max_requests_per_second = 10
+    request_burst_size = 10
+
+    # batched retrieval: one request samples several weather stations (MultiPoint), instead of one request per station
+    is_batched_retrieval = True
+    max_points_per_request = 35
+
+    # source filtering: images selected by GEE before transfer, GFS analysis and short-lead forecasts (instead of all
+    # forecast hours), ERA5-Land accumulations of the whole day (instead of 24 hourly accumulations): daily solar
+    # radiation is then the accumulation of the day (see google_earth_engine_util.source_filter_dict)
+    # validated: daily values also computed from whole collections (reference), and compared
+    is_source_filtering = False
+    is_source_filtering_validated = False
+
+    # retrieval engine: 'point' (getRegion of weather stations) or 'region' (one raster block per collection and
+    # chunk, covering all weather stations, sampled locally: request count independent of the number of weather
+    # stations); sampling of region rasters: 'nearest' (as getRegion) or 'bilinear'
+    retrieval_engine = 'point'
+    region_sampling_method = 'nearest'
+
+    # streaming reduction: raw data reduced to daily values chunk by chunk, instead of whole records in memory
+    is_streaming_reduction = True
+
+    # server-side reduction: half-hourly / hourly collections reduced to daily composites by GEE, before getRegion
+    # validated: daily values also computed locally from all images (reference), and compared
+    is_server_side_reduction = False
+    is_server_side_reduction_validated = False
+
+    # command line: python retrieve_station_data.py [--offline] [--restart]
+    # [--station-file FILE | --grid-bbox LON_MIN LAT_MIN LON_MAX LAT_MAX | --grid-polygon FILE]
+    # [--grid-spacing DEGREES | --grid-collection COLLECTION]
+    # [--shard INDEX/COUNT [--shard-method range|hash]] [--retrieval-engine point|region]
+    # [--region-sampling nearest|bilinear] [--source-filtering] [--output-directory DIRECTORY] [--profile FILE]
+    # shards of a weather station list are merged with script merge_shards.py
+    # https://docs.python.org/3/library/argparse.html
+    parser = argparse.ArgumentParser(description='retrieve weather station data, using Google Earth Engine API')
+    parser.add_argument('--offline', action='store_true',
+                        help='use raw data of ' + gee_raw_data_directory + ' only, fail if some is missing')
+    parser.add_argument('--restart', action='store_true',
+                        help='ignore the run journal and build manifest of a former run: process all weather '
+                             'stations again')
+    station_group = parser.add_mutually_exclusive_group()
+    station_group.add_argument('--station-file',
+                               help='csv file of weather stations (columns lon, lat, elev), instead of '
+                                    'weather_station_list')
+    # gridded basin mode: one virtual weather station per grid cell, elevations sampled on a DEM (see
+    # util/station_util.py)
+    station_group.add_argument('--grid-bbox', nargs=4, type=float,
+                               metavar=('LON_MIN', 'LAT_MIN', 'LON_MAX', 'LAT_MAX'),
+                               help='virtual weather stations on a grid over a bounding box')
+    station_group.add_argument('--grid-polygon', metavar='FILE',
+                               help='virtual weather stations on a grid over a GeoJSON polygon (e.g. basin outline)')
+    parser.add_argument('--grid-spacing', type=float, metavar='DEGREES', help='grid cell size, e.g. 0.1')
+    parser.add_argument('--grid-collection', choices=list(collection_grid_dict),
+                        help='grid of the native pixels of a collection: one weather station per pixel')
+    parser.add_argument('--shard', help='process shard INDEX/COUNT of weather stations only, e.g. 0/8 (INDEX from 0)')
+    parser.add_argument('--shard-method', choices=shard_method_list, default='range',
+                        help='weather stations of a shard: contiguous block (range), or spread by location (hash)')
+    parser.add_argument('--retrieval-engine', choices=retrieval_engine_list, default=retrieval_engine,
+                        help='getRegion of weather stations (point), or raster blocks sampled locally (region)')
+    parser.add_argument('--region-sampling', choices=region_sampling_method_list, default=region_sampling_method,
+                        help='sampling of raster blocks of region retrieval (default: nearest)')
+    parser.add_argument('--source-filtering', action='store_true',
+                        help='GFS short-lead forecasts and ERA5-Land daily accumulations only '
+                             '(see is_source_filtering)')
+    parser.add_argument('--output-directory', default='SWAT_INPUT_DATA',
+                        help='directory of SWAT+ input files (default: SWAT_INPUT_DATA)')
+    parser.add_argument('--profile', metavar='FILE',
+                        help='save cProfile statistics of the run to FILE (python -m pstats FILE)')
+    arguments = parser.parse_args()
+    is_offline = arguments.offline
+    is_restarted = arguments.restart
+    retrieval_engine = arguments.retrieval_engine
+    is_source_filtering = is_source_filtering or arguments.source_filtering
+    region_sampling_method = arguments.region_sampling
+    swat_input_data_directory = arguments.output_directory
+
+    if arguments.station_file is not None:
+        weather_station_list = read_station_file(arguments.station_file)
+
+    if arguments.grid_bbox is not None or arguments.grid_polygon is not None:
+        if (arguments.grid_spacing is None) == (arguments.grid_collection is None):
+            parser.error('gridded basin mode: give either --grid-spacing or --grid-collection')
+        # elevations from cache only in offline mode
+        set_offline(is_offline)
+        try:
+            weather_station_list = get_grid_station_list(arguments.grid_bbox, arguments.grid_polygon,
+                                                         arguments.grid_spacing, arguments.grid_collection)
+        except (ValueError, RuntimeError) as exception:
+            print('grid not created: ' + str(exception))
+            sys.exit(1)
+        if len(weather_station_list) == 0:
+            print('grid not created: no grid point with elevation')
+            sys.exit(1)
+        print('gridded basin mode: ' + str(len(weather_station_list)) + ' weather station(s)')
+        print('\n')
+
+    # weather station IDs are those of the whole list, whatever the shard
+    shard_wgn_id_list = None
+    if arguments.shard is not None:
+        try:
+            shard_index, shard_count = parse_shard(arguments.shard)
+        except ValueError as exception:
+            parser.error(str(exception))
+        shard_wgn_id_list = get_shard_wgn_id_list(weather_station_list, shard_index, shard_count,
+                                                  arguments.shard_method)
+        print('shard ' + arguments.shard + ' (' + arguments.shard_method + '): ' + str(len(shard_wgn_id_list)) +
+              ' of ' + str(len(weather_station_list)) + ' weather station(s)')
+
+    # run report, saved to the output directory at the end of the run
+    run_report_file_name = 'run_report.json'
+
+    if arguments.profile is not None:
+        start_profile()
+    try:
+        main(weather_station_list, shard_wgn_id_list)
+    finally:
+        if arguments.profile is not None:
+            end_profile(arguments.profile)
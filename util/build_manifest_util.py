@@ -0,0 +1,142 @@
+"""
+Author........... Gabriel Böhnke
+University....... UCLouvain, Faculty of bioscience engineering
+Email............ gabriel.bohnke@student.uclouvain.be
+
+Description...... build manifest util functions: content hashes of the inputs of each output file, for incremental
+                  regeneration of SWAT+ input files
+Version.......... 1.00
+Last changed on.. 17.10.2026
+"""
+
+import os
+import json
+import hashlib
+import threading
+
+# build graph of an output directory:
+# - weather files and daily weather generator values: one run journal entry per weather station and variable, with
+#   the hash of its inputs (see util/journal_util.py)
+# - aggregated files (station file, weather generator files, CLI-files): build manifest, one hash of inputs per file
+# an output is current if it exists and was written from the same inputs: it is not written again
+# JSON file: {output file (relative to the output directory): hash of its inputs}
+# example: {"OPTIONAL_XLSX_FILES/WGEN_station_001_mon.xlsx": "3f5c...", "WGEN_Siliana_mon.csv": "9ab1...", ...}
+manifest_file_name = 'build_manifest.json'
+manifest_directory = 'SWAT_INPUT_DATA'
+manifest_dict = {}
+manifest_lock = threading.Lock()
+
+# hashes of raw data files: {file path: (size, modification time, hash)}, files are hashed once per run
+# (chunk files of a pixel are shared by weather stations)
+file_hash_dict = {}
+file_hash_lock = threading.Lock()
+
+
+def get_json_value(value):
+    # numpy scalars (e.g. numpy.int64, numpy.float64) as python values
+    return value.item()
+
+
+def get_value_hash(value):
+    # SHA-256 of JSON values (keys sorted): same values, same hash, whatever the run
+    # https://docs.python.org/3/library/hashlib.html
+    return hashlib.sha256(json.dumps(value, sort_keys=True, default=get_json_value).encode('utf-8')).hexdigest()
+
+
+def get_text_hash(text):
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+
+def get_file_hash(file_path):
+    # content hash, read by blocks of 1 MB
+    file_status = os.stat(file_path)
+    with file_hash_lock:
+        cached = file_hash_dict.get(file_path)
+    if cached is not None and cached[:2] == (file_status.st_size, file_status.st_mtime_ns):
+        return cached[2]
+    sha256 = hashlib.sha256()
+    with open(file_path, 'rb') as file:
+        for block in iter(lambda: file.read(1024 * 1024), b''):
+            sha256.update(block)
+    file_hash = sha256.hexdigest()
+    with file_hash_lock:
+        file_hash_dict[file_path] = (file_status.st_size, file_status.st_mtime_ns, file_hash)
+    return file_hash
+
+
+def get_files_hash(file_path_list):
+    # files given by name and content: a new chunk file, or a changed one, gives another hash
+    return get_value_hash([[os.path.basename(file_path), get_file_hash(file_path)] for file_path in file_path_list])
+
+
+def get_manifest_file_path(directory):
+    return directory + '/' + manifest_file_name
+
+
+def read_build_manifest(directory):
+    file_path = get_manifest_file_path(directory)
+    if not os.path.exists(file_path):
+        return {}
+    try:
+        with open(file_path, 'r', encoding='utf-8') as file:
+            return json.load(file)
+    except ValueError:
+        # unreadable manifest: all aggregated files are written again
+        return {}
+
+
+def write_build_manifest(directory, output_dict):
+    # written to a temporary file, then renamed: the manifest on disk is always complete
+    file_path = get_manifest_file_path(directory)
+    with open(file_path + '.tmp', 'w', encoding='utf-8') as file:
+        json.dump(output_dict, file, indent=1, sort_keys=True)
+    os.replace(file_path + '.tmp', file_path)
+
+
+def open_build_manifest(directory, is_resumed=True):
+    global manifest_dict, manifest_directory
+    with manifest_lock:
+        manifest_directory = directory
+        manifest_dict = read_build_manifest(directory) if is_resumed else {}
+
+
+def get_output_name(file_path):
+    # e.g. SWAT_INPUT_DATA/WEATHER_STATIONS/pcp.cli -> WEATHER_STATIONS/pcp.cli
+    return os.path.relpath(file_path, manifest_directory).replace(os.sep, '/')
+
+
+def is_output_current(file_path, inputs_hash):
+    with manifest_lock:
+        recorded_hash = manifest_dict.get(get_output_name(file_path))
+    return recorded_hash == inputs_hash and os.path.exists(file_path)
+
+
+def record_output(file_path, inputs_hash):
+    # manifest saved after each output: an interrupted run keeps the outputs already written
+    with manifest_lock:
+        manifest_dict[get_output_name(file_path)] = inputs_hash
+        write_build_manifest(manifest_directory, manifest_dict)
+
+
+def update_output(file_path, inputs_hash, save_function):
+    # output saved by save_function(file_path) only if stale: missing, or written from other inputs
+    # returns True if saved
+    if is_output_current(file_path, inputs_hash):
+        print(file_path + ' up to date')
+        return False
+    save_function(file_path)
+    record_output(file_path, inputs_hash)
+    return True
+
+
+def invalidate_outputs(directory, output_name_list=None):
+    # outputs of the manifest are written again by the next run (None: all of them); returns the invalidated names
+    output_dict = read_build_manifest(directory)
+    if output_name_list is None:
+        output_name_list = list(output_dict)
+    output_name_list = [output_name for output_name in output_name_list if output_name in output_dict]
+    for output_name in output_name_list:
+        del output_dict[output_name]
+    if os.path.exists(directory):
+        write_build_manifest(directory, output_dict)
+    return output_name_list
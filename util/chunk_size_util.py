@@ -0,0 +1,111 @@
+"""
+Author........... Gabriel Böhnke
+University....... UCLouvain, Faculty of bioscience engineering
+Email............ gabriel.bohnke@student.uclouvain.be
+
+Description...... adaptive chunk size (in days) of GEE requests
+Version.......... 1.00
+Last changed on.. 17.10.2026
+"""
+
+import threading
+
+# ImageCollection.getRegion fails with "Too many values" above this number of values (images x points x columns)
+# https://developers.google.com/earth-engine/apidocs/ee-imagecollection-getregion
+get_region_max_values = 1048576
+
+# getRegion columns besides bands: id, longitude, latitude, time
+get_region_fixed_column_count = 4
+
+# cadence of collections: number of images per day
+collection_images_per_day_dict = {
+    'NASA/GPM_L3/IMERG_V06': 48,  # half-hourly
+    'ECMWF/ERA5/DAILY': 1,  # daily
+    'ECMWF/ERA5_LAND/HOURLY': 24,  # hourly
+    'NOAA/GFS0P25': 4 * 209,  # 4 model runs per day, forecast hours 0-120 hourly + 123-384 every 3 hours
+    # images selected at the source (see google_earth_engine_util.source_filter_dict)
+    'NOAA/GFS0P25/SHORT_LEAD': 4 * 6,  # 4 model runs per day, forecast hours 0-5
+    'ECMWF/ERA5_LAND/HOURLY/DAILY_ACCUMULATION': 1  # 00:00 only
+}
+default_images_per_day = 24
+
+# daily composites (server-side reduction): one image per day, whatever the cadence of the collection
+# chunk sizes of composites are learnt separately, under key <collection>/daily_composite
+daily_composite_suffix = '/daily_composite'
+
+# region retrieval (see google_earth_engine_util.fetch_region_interval): one raster block of images x bands x pixels
+# per request, chunk sizes learnt separately, under key <collection>/region, point count being the pixel count
+# bands of a computePixels request (images x bands), and payload in bytes (float64 values)
+# https://developers.google.com/earth-engine/apidocs/ee-data-computepixels
+region_suffix = '/region'
+compute_pixels_max_bands = 1024
+compute_pixels_max_bytes = 48 * 1024 * 1024
+
+# largest chunk: a longer chunk is never requested, whatever the estimate
+max_interval_size_in_days = 3000
+
+# chunk size learnt by collection: next request starts from the last successful size,
+# and never grows to a size that failed before
+interval_size_dict = {}
+failed_interval_size_dict = {}
+succeeded_interval_size_dict = {}
+interval_size_lock = threading.Lock()
+
+
+def get_images_per_day(collection):
+    if collection.endswith(region_suffix):
+        collection = collection[:-len(region_suffix)]
+    if collection.endswith(daily_composite_suffix):
+        return 1
+    return collection_images_per_day_dict.get(collection, default_images_per_day)
+
+
+def estimate_interval_size_in_days(collection, band_count, point_count=1):
+    # largest chunk staying below the getRegion limit (computePixels limits for region retrieval), according to
+    # cadence of the collection
+    images_per_day = get_images_per_day(collection)
+    if collection.endswith(region_suffix):
+        bands_per_day = images_per_day * band_count
+        return max(1, min(max_interval_size_in_days, compute_pixels_max_bands // bands_per_day,
+                          compute_pixels_max_bytes // (bands_per_day * point_count * 8)))
+    values_per_day = images_per_day * point_count * (get_region_fixed_column_count + band_count)
+    return max(1, min(max_interval_size_in_days, get_region_max_values // values_per_day))
+
+
+def get_interval_size_in_days(collection, band_count, point_count=1):
+    key = (collection, band_count, point_count)
+    with interval_size_lock:
+        if key not in interval_size_dict:
+            interval_size_dict[key] = estimate_interval_size_in_days(collection, band_count, point_count)
+        return interval_size_dict[key]
+
+
+def record_success(collection, band_count, point_count, interval_size_in_days):
+    # grow the window after a success, up to the estimate; once a size failed, grow halfway towards it only
+    # (binary search of the largest working size: a failing size is never requested twice)
+    key = (collection, band_count, point_count)
+    with interval_size_lock:
+        succeeded_interval_size_dict[key] = max(succeeded_interval_size_dict.get(key, 0), interval_size_in_days)
+        new_interval_size_in_days = min(estimate_interval_size_in_days(collection, band_count, point_count),
+                                        interval_size_in_days * 2)
+        if key in failed_interval_size_dict:
+            new_interval_size_in_days = min(new_interval_size_in_days,
+                                            (interval_size_in_days + failed_interval_size_dict[key]) // 2)
+        interval_size_dict[key] = max(1, interval_size_in_days, new_interval_size_in_days)
+
+
+def record_failure(collection, band_count, point_count, interval_size_in_days):
+    # after a failure, fall back to the largest size that already succeeded, or halve the window:
+    # returns the new size, None if a single day already failed
+    key = (collection, band_count, point_count)
+    if interval_size_in_days <= 1:
+        return None
+    with interval_size_lock:
+        failed_interval_size_dict[key] = min(failed_interval_size_dict.get(key, interval_size_in_days),
+                                             interval_size_in_days)
+        succeeded_interval_size = succeeded_interval_size_dict.get(key, 0)
+        if succeeded_interval_size >= interval_size_in_days:
+            # succeeded before with this size: failure is not caused by the chunk size
+            succeeded_interval_size = 0
+        interval_size_dict[key] = max(1, interval_size_in_days // 2, succeeded_interval_size)
+        return interval_size_dict[key]
@@ -0,0 +1,24 @@
+"""
+Author........... Gabriel Böhnke
+University....... UCLouvain, Faculty of bioscience engineering
+Email............ gabriel.bohnke@student.uclouvain.be
+
+Description...... concurrency util functions
+Version.......... 1.00
+Last changed on.. 17.10.2026
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+
+
+# concurrent.futures - Launching parallel tasks
+# https://docs.python.org/3/library/concurrent.futures.html#threadpoolexecutor
+def run_in_parallel(function, list_of_arguments, max_workers):
+    # results are returned in the order of list_of_arguments, whatever the order of completion:
+    # output files built from these results stay identical to a sequential run
+    if max_workers is None or max_workers <= 1 or len(list_of_arguments) <= 1:
+        return [function(*arguments) for arguments in list_of_arguments]
+
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(list_of_arguments))) as executor:
+        futures = [executor.submit(function, *arguments) for arguments in list_of_arguments]
+        return [future.result() for future in futures]
@@ -0,0 +1,68 @@
+"""
+Author........... Gabriel Böhnke
+University....... UCLouvain, Faculty of bioscience engineering
+Email............ gabriel.bohnke@student.uclouvain.be
+
+Description...... date index util functions
+Version.......... 1.00
+Last changed on.. 17.10.2026
+"""
+
+import numpy as np
+
+
+def get_day_array(datetime_values):
+    # time axis parsed once: days as numpy datetime64[D] (time of day dropped), used as key of daily aggregations
+    return np.asarray(datetime_values, dtype='datetime64[ns]').astype('datetime64[D]')
+
+
+def get_year_and_day_of_year(day_array):
+    # year and day of year (1-366) as integer arrays, without any per-year callback
+    # numpy datetime64: conversion to years truncates to January 1st
+    # https://numpy.org/doc/stable/reference/arrays.datetime.html
+    year_start_array = day_array.astype('datetime64[Y]')
+    year_array = year_start_array.astype(np.int64) + 1970
+    day_of_year_array = (day_array - year_start_array.astype('datetime64[D]')).astype(np.int64) + 1
+    return year_array, day_of_year_array
+
+
+def get_missing_day_list(day_array, from_date=None, to_date=None):
+    # periods without record: list of (first missing day, last missing day)
+    # from_date (included) and to_date (excluded): missing days at the start and the end of the period are found too
+    day_array = np.sort(day_array)
+    if from_date is not None:
+        day_array = np.concatenate([[np.datetime64(from_date, 'D') - 1], day_array])
+    if to_date is not None:
+        day_array = np.concatenate([day_array, [np.datetime64(to_date, 'D')]])
+
+    gap_index_array = np.flatnonzero(np.diff(day_array).astype(np.int64) > 1)
+    return [(day_array[index] + 1, day_array[index + 1] - 1) for index in gap_index_array]
+
+
+def add_year_and_step_columns(df_daily, date_column, description, from_date=None, to_date=None):
+    # SWAT+ weather files: year + step (day of year) of each daily record
+    # the step is the day of year, not the row number in the year: a day missing from GEE data does not shift the
+    # steps of the following days
+    day_array = get_day_array(df_daily[date_column])
+    df_daily['year'], df_daily['step'] = get_year_and_day_of_year(day_array)
+
+    missing_day_list = get_missing_day_list(day_array, from_date, to_date)
+    if len(missing_day_list) > 0:
+        print('WARNING:', description, '-', sum(int((last_day - first_day).astype(np.int64)) + 1
+                                                for first_day, last_day in missing_day_list), 'missing day(s):',
+              ', '.join(str(first_day) if first_day == last_day else str(first_day) + ' to ' + str(last_day)
+                        for first_day, last_day in missing_day_list))
+
+    return missing_day_list
+
+
+def get_daily_values(df_result, aggregation_dict):
+    # several measures per day: one row per day, day (time of day dropped) kept in column 'datetime'
+    # aggregation_dict: {output column: (band, function)}, e.g. {'total_precipitation': ('precipitationCal', 'sum')}
+    # used as chunk reducer too (see raw_data_cache_util.load_bands): a chunk holding only some of the bands is reduced
+    # for these bands only
+    if df_result is None:
+        return None
+    return df_result.assign(datetime=get_day_array(df_result['datetime'])).groupby('datetime', as_index=False).agg(
+        **{column: aggregation for column, aggregation in aggregation_dict.items()
+           if aggregation[0] in df_result.columns})
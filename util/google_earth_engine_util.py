@@ -5,40 +5,161 @@ Email............ gabriel.bohnke@student.uclouvain.be
 
 Description...... Google Earth Engine util functions
 Version.......... 1.00
-Last changed on.. 18.07.2022
+Last changed on.. 17.10.2026
 """
 
-import os
-import ee  # requires package earthengine-api
+import numpy as np
 import pandas as pd
 import datetime
-from util.performance_util import start_time_measure, end_time_measure
+import threading
+import math
+from operator import itemgetter
+from util.performance_util import start_time_measure, end_time_measure, measure_span, add_counter
+from util.request_util import call_with_retry, is_retryable_error
+from util.chunk_size_util import get_interval_size_in_days, record_success, record_failure, daily_composite_suffix, \
+    region_suffix
+from util.raw_data_cache_util import gee_raw_data_directory, get_pixel_center, get_pixel_key, get_chunk_list_dict, \
+    get_missing_intervals, save_chunk_list, load_bands, collection_grid_dict, bilinear_collection_suffix, \
+    get_chunk_file_list
+
+# maximum number of weather stations sampled by the same getRegion call (batched retrieval)
+max_points_per_request = 35
+
+# Earth Engine API: imported, authenticated and initialized on first use only (see initialize_earth_engine)
+# a run finding all its raw data in cache never needs package earthengine-api, gcloud or network
+ee = None
+is_earth_engine_initialized = False
+earth_engine_lock = threading.Lock()
+
+# offline mode: Earth Engine is never used, a missing raw data file is an error
+is_offline = False
+
+# retrieval engine: 'point' (getRegion of the locations, see call_cloud_service) or 'region' (one raster block
+# covering all locations, sampled locally, see fetch_region_interval); region retrieval applies to collections of
+# known native grid only (see raw_data_cache_util.collection_grid_dict), other collections use getRegion
+retrieval_engine_list = ['point', 'region']
+retrieval_engine = 'point'
+
+# sampling of region rasters: 'nearest' (value of the native pixel, as getRegion) or 'bilinear' (between the 4
+# nearest pixel centers, cached apart: see raw_data_cache_util.bilinear_collection_suffix)
+region_sampling_method_list = ['nearest', 'bilinear']
+region_sampling_method = 'nearest'
+
+# masked pixels (no data) of region rasters: unmasked with this value by GEE, then read as NaN
+region_missing_value = -9999.0
+
+# source filtering: images selected by GEE before getRegion / computePixels, retrieved as a collection of its own
+# (own cache, chunk sizes and grid: see raw_data_cache_util.collection_grid_dict, chunk_size_util)
+# {filtered collection: (collection, function returning the filter, time shift in days)}
+# - NOAA/GFS0P25: analysis and short-lead forecasts only (forecast hours 0 to gfs_max_forecast_hours), instead of
+#   forecast hours 0 to 384 of each model run (images are stamped with the time of their model run)
+# - ECMWF/ERA5_LAND/HOURLY: accumulations of the whole day only: the image of 00:00 holds the accumulation over the
+#   day before (time shift: requests are shifted by 1 day, records stamped back to the day of the accumulation)
+# https://developers.google.com/earth-engine/datasets/catalog/NOAA_GFS0P25
+# https://confluence.ecmwf.int/display/CKB/ERA5-Land%3A+data+documentation (section 'Accumulations')
+gfs_max_forecast_hours = 5
+source_filter_dict = {
+    'NOAA/GFS0P25/SHORT_LEAD': ('NOAA/GFS0P25', lambda: ee.Filter.lte('forecast_hours', gfs_max_forecast_hours), 0),
+    'ECMWF/ERA5_LAND/HOURLY/DAILY_ACCUMULATION': ('ECMWF/ERA5_LAND/HOURLY',
+                                                  lambda: ee.Filter.calendarRange(0, 0, 'hour'), 1)
+}
+# filtered collection of each collection: {collection: filtered collection}
+source_filter_collection_dict = {collection: filtered_collection
+                                 for filtered_collection, (collection, _, _) in source_filter_dict.items()}
+
+# one lock by (pixel, collection): weather stations sharing a pixel, processed concurrently, fetch it only once
+pixel_lock_dict = {}
+pixel_lock_dict_lock = threading.Lock()
+
+
+def set_max_points_per_request(max_points):
+    global max_points_per_request
+    max_points_per_request = max_points
+
+
+def set_offline(offline):
+    global is_offline
+    is_offline = offline
+
+
+def set_retrieval_engine(engine, sampling_method='nearest'):
+    global retrieval_engine, region_sampling_method
+    retrieval_engine = engine
+    region_sampling_method = sampling_method
+
+
+def is_region_retrieval(collection):
+    return retrieval_engine == 'region' and collection in collection_grid_dict
+
+
+def get_cache_collection(collection):
+    # collection of the cache: bilinear samples are cached apart from pixel values
+    if is_region_retrieval(collection) and region_sampling_method == 'bilinear':
+        return collection + bilinear_collection_suffix
+    return collection
+
+
+def get_source_image_collection(collection):
+    # images of a collection, or of its source collection for a filtered collection
+    if collection in source_filter_dict:
+        source_collection, get_filter, _ = source_filter_dict[collection]
+        return ee.ImageCollection(source_collection).filter(get_filter())
+    return ee.ImageCollection(collection)
+
+
+def get_time_shift(collection):
+    if collection in source_filter_dict:
+        return datetime.timedelta(days=source_filter_dict[collection][2])
+    return datetime.timedelta(days=0)
+
+
+def get_pixel_lock(pixel_key, collection):
+    with pixel_lock_dict_lock:
+        return pixel_lock_dict.setdefault((pixel_key, collection), threading.Lock())
+
+
+def get_pixel_location_list(weather_stations, collection):
+    # pixels of the weather stations ([lon, lat, ...]) for a collection, each pixel once:
+    # list of (lon, lat, pixel_key), lon/lat being the center of the pixel
+    # (bilinear sampling: weather station locations, see get_cache_collection)
+    cache_collection = get_cache_collection(collection)
+    pixel_location_dict = {}
+    for weather_station in weather_stations:
+        pixel_key = get_pixel_key(weather_station[0], weather_station[1], cache_collection)
+        if pixel_key not in pixel_location_dict:
+            pixel_location_dict[pixel_key] = (*get_pixel_center(weather_station[0], weather_station[1],
+                                                                cache_collection), pixel_key)
+    return list(pixel_location_dict.values())
 
 
-def get_raw_data_file_path(lon, lat, date_from, date_to, category):
-    # lon/lat part: iiiddddd_iiiddddd
-    # example: 00939000_03616579 for lon=9.39 and lat=36.165789
+def initialize_earth_engine():
+    # ee.Authenticate() + ee.Initialize() only once, even if several weather stations are retrieved concurrently
+    global ee, is_earth_engine_initialized
+    with earth_engine_lock:
+        if not is_earth_engine_initialized:
+            if is_offline:
+                raise RuntimeError('offline mode: raw data missing from ' + gee_raw_data_directory +
+                                   ', Earth Engine is not used')
 
-    # https://stackoverflow.com/questions/455612/limiting-floats-to-two-decimal-points
-    # https://stackoverflow.com/questions/34688196/how-to-add-trailing-zeroes-to-an-integer
-    # integer part: if fewer than 3 integer positions, add leading zeroes
-    # decimal part: if more than 5 decimals: rounding on 5th one; if fewer, add trailing zeroes
-    lon_lat_part = str(lon).split('.')[0].zfill(3) + '{:<05}'.format(
-        str(float("{:.5f}".format(lon))).split('.')[1]) + '_' + str(lat).split('.')[0].zfill(3) + '{:<05}'.format(
-        str(float("{:.5f}".format(lat))).split('.')[1])
+            import ee as earth_engine  # requires package earthengine-api
+            ee = earth_engine
 
-    # example file name: 00939000_03616579_2015-01-01_2016-03-01_tmp.csv
-    file_name = lon_lat_part + '_' + date_from + '_' + date_to + '_' + category + '.csv'
+            print('>>> Earth Engine - authentication and initialization...')
+            # # authenticate on GEE, using web page + paste of token
+            # ee.Authenticate(auth_mode='paste')
+            # authenticate on GEE, using gcloud
+            ee.Authenticate()
+            ee.Initialize()
+            is_earth_engine_initialized = True
 
-    gee_raw_data_directory = 'GEE_RAW_DATA'
-    file_path = gee_raw_data_directory + '/' + file_name
 
-    return file_path
+# getRegion columns besides bands
+get_region_column_list = ['longitude', 'latitude', 'time']
 
 
 # inspired by: https://developers.google.com/earth-engine/tutorials/community/intro-to-python-api
-def ee_array_to_df(arr, list_of_bands):
-    """Transforms client-side ee.Image.getRegion array to pandas.DataFrame."""
+def ee_array_to_df_generic(arr, list_of_bands, is_coordinate_kept=False):
+    """Transforms client-side ee.Image.getRegion array to pandas.DataFrame (generic parser, through object dtype)."""
     df = pd.DataFrame(arr)
 
     # rearrange header.
@@ -56,97 +177,459 @@ def ee_array_to_df(arr, list_of_bands):
     df['datetime'] = pd.to_datetime(df['time'], unit='ms')
 
     # keep columns of interest.
-    df = df[['datetime', *list_of_bands]]
+    if is_coordinate_kept:
+        # pixel coordinates are needed to split a multi-point response by weather station
+        df = df[['longitude', 'latitude', 'datetime', *list_of_bands]].copy()
+        df[['longitude', 'latitude']] = df[['longitude', 'latitude']].astype(float)
+    else:
+        df = df[['datetime', *list_of_bands]]
 
     return df
 
 
-def call_cloud_service(point_of_interest, collection, list_of_bands, date_from, date_to, scale):
-    # selection of appropriate bands and dates
-    selection = collection.select(list_of_bands).filterDate(date_from.strftime('%Y-%m-%d'),
-                                                            date_to.strftime('%Y-%m-%d'))
+def ee_array_to_df_typed(arr, list_of_bands, is_coordinate_kept=False):
+    """Transforms client-side ee.Image.getRegion array to pandas.DataFrame (typed parser, without object dtype)."""
+    # header is read once: position of each column of interest in the rows
+    headers = arr[0]
+    row_list = arr[1:]
 
-    try:
-        # get data for the pixel intersecting point of interest
-        data = selection.getRegion(point_of_interest, scale).getInfo()
-        df = ee_array_to_df(data, list_of_bands)
-    except ee.ee_exception.EEException:
-        df = None
+    # one float64 array per column, filled straight from the rows: None (no data) becomes NaN
+    # time in milliseconds is exact in float64 (below 2**53)
+    # operator.itemgetter: https://docs.python.org/3/library/operator.html#operator.itemgetter
+    array_dict = {column: np.array(list(map(itemgetter(headers.index(column)), row_list)), dtype=np.float64)
+                  for column in [*get_region_column_list, *list_of_bands]}
 
-    return df
+    # remove rows without data inside.
+    is_valid = np.ones(len(row_list), dtype=bool)
+    for array in array_dict.values():
+        is_valid &= ~np.isnan(array)
+    if not is_valid.all():
+        array_dict = {column: array[is_valid] for column, array in array_dict.items()}
 
+    # time field (epoch milliseconds) into a datetime.
+    data = {'datetime': array_dict['time'].astype(np.int64).astype('datetime64[ms]').astype('datetime64[ns]')}
+    data.update({band: array_dict[band] for band in list_of_bands})
+    if is_coordinate_kept:
+        # pixel coordinates are needed to split a multi-point response by weather station
+        data = {'longitude': array_dict['longitude'], 'latitude': array_dict['latitude'], **data}
 
-# Parameter 'interval_size_in_days' cuts retrieval into chunks, to bypass memory issues of GEE.
-# For band 'relative_humidity_2m_above_ground', set 90. For band 'surface_net_solar_radiation', set 180.
-# Otherwise set a high number, e.g. 3000
-def get_gee_data(lon, lat, collection, list_of_bands, from_date_string, to_date_string, interval_size_in_days, scale,
-                 category):
-    file_path = get_raw_data_file_path(lon, lat, from_date_string, to_date_string, category)
+    # dataframe backed by the typed arrays
+    return pd.DataFrame(data, copy=False)
 
-    if not os.path.exists(file_path):
 
-        ee.Initialize()
+def ee_array_to_df(arr, list_of_bands, is_coordinate_kept=False):
+    """Transforms client-side ee.Image.getRegion array to pandas.DataFrame."""
+    try:
+        return ee_array_to_df_typed(arr, list_of_bands, is_coordinate_kept)
+    except (TypeError, ValueError):
+        # unexpected values (e.g. text instead of numbers): generic parser
+        return ee_array_to_df_generic(arr, list_of_bands, is_coordinate_kept)
 
-        cloud_retrieval_time = start_time_measure(">>> " + " ".join(list_of_bands) + " - starting cloud retrieval...")
 
-        point_of_interest = ee.Geometry.Point(lon, lat)
-        image_collection = ee.ImageCollection(collection)
+def get_composite_band(band, function):
+    # band of a daily composite, e.g. precipitationCal_sum: name given by ee.ImageCollection.reduce as well
+    return band + '_' + function
 
-        # FROM-date (included)
-        from_date = datetime.datetime.strptime(from_date_string, '%Y-%m-%d').date()
 
-        # TO-date (excluded)
-        to_date = datetime.datetime.strptime(to_date_string, '%Y-%m-%d').date()
+def get_daily_composite_collection(image_collection, aggregation_list, date_from, date_to):
+    # server-side reduction: one image per day of [date_from, date_to), built by GEE before getRegion
+    # aggregation_list: list of (band, function), function in 'sum', 'mean', 'max'
+    # https://developers.google.com/earth-engine/guides/ic_reducing
+    reducer_dict = {'sum': ee.Reducer.sum, 'mean': ee.Reducer.mean, 'max': ee.Reducer.max}
+    start_date = ee.Date(date_from.strftime('%Y-%m-%d'))
 
-        # initialize variables for WHILE-loop
-        lower_date_boundary = from_date
-        upper_date_boundary = from_date + datetime.timedelta(days=interval_size_in_days)
+    def get_daily_composite(day_offset):
+        day_start_date = start_date.advance(day_offset, 'day')
+        day_image_collection = image_collection.filterDate(day_start_date, day_start_date.advance(1, 'day'))
+        image = ee.Image.cat([day_image_collection.select(band).reduce(reducer_dict[function]()).rename(
+            get_composite_band(band, function)) for band, function in aggregation_list])
+        return image.set('system:time_start', day_start_date.millis(), 'image_count', day_image_collection.size())
 
-        df_result = None
+    # days without image (e.g. gaps of the collection) have no composite, as they would have no record
+    return ee.ImageCollection(ee.List.sequence(0, (date_to - date_from).days - 1).map(get_daily_composite)).filter(
+        ee.Filter.gt('image_count', 0))
 
-        while upper_date_boundary < to_date:
 
-            df_delta = call_cloud_service(point_of_interest, image_collection, list_of_bands, lower_date_boundary,
-                                          upper_date_boundary, scale)
-            if df_delta is not None:
-                delta_size = len(df_delta)
-                if df_result is not None:
-                    # axis=0: concatenate along rows
-                    # ignore_index=True: a continuous index value is maintained across the rows in the concatenated data frame
-                    df_result = pd.concat([df_result, df_delta], axis=0, ignore_index=True)
-                else:
-                    df_result = df_delta
-            else:
-                delta_size = 0
-
-            print("period from", lower_date_boundary, "to", upper_date_boundary, "records found:", delta_size)
-            lower_date_boundary = upper_date_boundary
-            upper_date_boundary += datetime.timedelta(days=interval_size_in_days)
-
-        # any remaining interval chunk to be processed?
-        if lower_date_boundary < to_date:
-
-            df_delta = call_cloud_service(point_of_interest, image_collection, list_of_bands, lower_date_boundary, to_date,
-                                          scale)
-            if df_delta is not None:
-                delta_size = len(df_delta)
-                if df_result is not None:
-                    df_result = pd.concat([df_result, df_delta], axis=0, ignore_index=True)
-                else:
-                    df_result = df_delta
-            else:
-                delta_size = 0
-            print("period from", lower_date_boundary, "to", to_date, "records found:", delta_size)
+def call_cloud_service(geometry, collection, list_of_bands, date_from, date_to, scale, is_coordinate_kept=False):
+    # selection of appropriate bands and dates
+    selection = collection.select(list_of_bands).filterDate(date_from.strftime('%Y-%m-%d'),
+                                                            date_to.strftime('%Y-%m-%d'))
 
-        end_time_measure(cloud_retrieval_time, ">>> " + " ".join(list_of_bands) + " - retrieval time: ")
+    # get data for the pixels intersecting point(s) of interest
+    # throttling and transient errors are retried with backoff (see util/request_util.py); other errors, or errors
+    # still there after all retries, are raised to the caller
+    with measure_span('gee_request'):
+        data, request_time = call_with_retry(lambda: selection.getRegion(geometry, scale).getInfo(),
+                                             "period from " + str(date_from) + " to " + str(date_to))
+
+    with measure_span('parse'):
+        df_result = ee_array_to_df(data, list_of_bands, is_coordinate_kept)
+
+    # rows and values (rows x columns, as counted by GEE limits) of the response, bytes of the parsed dataframe
+    add_counter('gee_requests')
+    add_counter('gee_rows', len(data) - 1)
+    add_counter('gee_values', (len(data) - 1) * len(data[0]))
+    add_counter('parsed_bytes', int(df_result.memory_usage(index=False).sum()))
+
+    # returns the dataframe, and the duration of the request (seconds)
+    return df_result, request_time
+
+
+def split_by_location(df_multi_point, location_list, scale):
+    # getRegion over a MultiPoint returns the coordinates of each pixel, not of each point:
+    # each point receives the rows of the nearest pixel (several points may share a pixel)
+    df_list = []
+    pixel_array = df_multi_point[['longitude', 'latitude']].drop_duplicates().to_numpy()
+
+    # a pixel farther than 2 pixel sizes is not the pixel of the point (e.g. point without data)
+    max_distance = 2 * scale / 111320  # meters to degrees
+
+    for lon, lat, _ in location_list:
+        df_location = df_multi_point.iloc[0:0]
+        if len(pixel_array) > 0:
+            distance_array = ((pixel_array[:, 0] - lon) ** 2 + (pixel_array[:, 1] - lat) ** 2) ** (1 / 2)
+            nearest_index = distance_array.argmin()
+            if distance_array[nearest_index] <= max_distance:
+                pixel_lon, pixel_lat = pixel_array[nearest_index]
+                df_location = df_multi_point[(df_multi_point['longitude'] == pixel_lon) & (
+                        df_multi_point['latitude'] == pixel_lat)]
+        df_list.append(df_location.drop(columns=['longitude', 'latitude']).reset_index(drop=True))
+
+    return df_list
+
+
+def get_region_grid(location_list, collection):
+    # raster block of region retrieval: native pixels of the collection covering all locations (lon/lat, EPSG:4326),
+    # plus 1 pixel around them for bilinear sampling
+    # column index from west, row index from south (pixel edges on pixel_offset + index * pixel_size)
+    pixel_size, pixel_offset = collection_grid_dict[collection]
+    margin = 1 if region_sampling_method == 'bilinear' else 0
+
+    # rounding before floor: a coordinate on a pixel edge stays on its side (see raw_data_cache_util.get_pixel_center)
+    def get_index(coordinate):
+        return math.floor(round((coordinate - pixel_offset) / pixel_size, 9))
+
+    column_list = [get_index(lon) for lon, _, _ in location_list]
+    row_list = [get_index(lat) for _, lat, _ in location_list]
+    column_from, column_to = min(column_list) - margin, max(column_list) + margin
+    row_from, row_to = min(row_list) - margin, max(row_list) + margin
+    return {'pixel_size': pixel_size, 'pixel_offset': pixel_offset, 'column_from': column_from, 'row_to': row_to,
+            'width': column_to - column_from + 1, 'height': row_to - row_from + 1}
+
+
+def sample_region(value_array, region_grid, location_list):
+    # values of each location in a raster block: value_array (images, bands, height, width), 1st row to the north
+    # returns array (images, bands, locations); NaN: no data
+    pixel_size, pixel_offset = region_grid['pixel_size'], region_grid['pixel_offset']
+    lon_array = np.array([lon for lon, _, _ in location_list])
+    lat_array = np.array([lat for _, lat, _ in location_list])
+
+    if region_sampling_method == 'nearest':
+        # pixel holding the location
+        column_array = np.floor(np.round((lon_array - pixel_offset) / pixel_size, 9)).astype(np.int64) - region_grid[
+            'column_from']
+        row_array = region_grid['row_to'] - np.floor(np.round((lat_array - pixel_offset) / pixel_size, 9)).astype(
+            np.int64)
+        return value_array[:, :, row_array, column_array]
+
+    # bilinear: weighted mean of the 4 nearest pixel centers (integer coordinates: pixel centers); pixels without
+    # data are left out and the weights of the others scaled up
+    # https://en.wikipedia.org/wiki/Bilinear_interpolation
+    x_array = (lon_array - pixel_offset) / pixel_size - 0.5 - region_grid['column_from']
+    y_array = region_grid['row_to'] + 0.5 - (lat_array - pixel_offset) / pixel_size
+    column_array, row_array = np.floor(x_array).astype(np.int64), np.floor(y_array).astype(np.int64)
+    x_weight_array, y_weight_array = x_array - column_array, y_array - row_array
+    weighted_sum_array = np.zeros(value_array.shape[:2] + (len(location_list),))
+    weight_sum_array = np.zeros(value_array.shape[:2] + (len(location_list),))
+    for row_shift, column_shift, weight_array in [
+            (0, 0, (1 - y_weight_array) * (1 - x_weight_array)), (0, 1, (1 - y_weight_array) * x_weight_array),
+            (1, 0, y_weight_array * (1 - x_weight_array)), (1, 1, y_weight_array * x_weight_array)]:
+        corner_array = value_array[:, :, row_array + row_shift, column_array + column_shift]
+        is_valid = ~np.isnan(corner_array)
+        weighted_sum_array += np.where(is_valid, corner_array, 0) * weight_array
+        weight_sum_array += is_valid * weight_array
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return np.where(weight_sum_array > 0, weighted_sum_array / weight_sum_array, np.nan)
+
+
+def call_region_service(region_grid, image_collection, list_of_bands, date_from, date_to, location_list):
+    # region retrieval: all images of the period as one raster block over all locations, whatever their number,
+    # downloaded as a numpy array (computePixels, NPY), then sampled locally at each location
+    # https://developers.google.com/earth-engine/apidocs/ee-data-computepixels
+    # 2 requests: times of the images, then pixels of all images (1 band per image and band, see toBands)
+    selection = image_collection.select(list_of_bands).filterDate(date_from.strftime('%Y-%m-%d'),
+                                                                  date_to.strftime('%Y-%m-%d'))
+    description = "period from " + str(date_from) + " to " + str(date_to)
+
+    with measure_span('gee_request'):
+        time_list, request_time = call_with_retry(
+            lambda: selection.aggregate_array('system:time_start').getInfo(), description)
+        add_counter('gee_requests')
+
+        if len(time_list) == 0:
+            value_array = np.zeros((0, len(list_of_bands), region_grid['height'], region_grid['width']))
+        else:
+            pixel_size = region_grid['pixel_size']
+            image = selection.toBands().unmask(region_missing_value).toDouble()
+            pixel_array, pixel_request_time = call_with_retry(lambda: ee.data.computePixels({
+                'expression': image,
+                'fileFormat': 'NUMPY_NDARRAY',
+                'grid': {'dimensions': {'width': region_grid['width'], 'height': region_grid['height']},
+                         'affineTransform': {
+                             'scaleX': pixel_size, 'shearX': 0,
+                             'translateX': region_grid['pixel_offset'] + region_grid['column_from'] * pixel_size,
+                             'shearY': 0, 'scaleY': -pixel_size,
+                             'translateY': region_grid['pixel_offset'] + (region_grid['row_to'] + 1) * pixel_size},
+                         'crsCode': 'EPSG:4326'}}), description)
+            request_time += pixel_request_time
+            add_counter('gee_requests')
+            add_counter('gee_values', pixel_array.size * len(pixel_array.dtype.names))
+
+            # structured array (height, width), one field per band of toBands: <image index>_<band>, image by image
+            if len(pixel_array.dtype.names) != len(time_list) * len(list_of_bands):
+                raise ee.ee_exception.EEException('computePixels: ' + str(len(pixel_array.dtype.names)) +
+                                                  ' bands for ' + str(len(time_list)) + ' image(s)')
+
+    with measure_span('parse'):
+        if len(time_list) > 0:
+            value_array = np.stack([pixel_array[name] for name in pixel_array.dtype.names]).astype(
+                np.float64).reshape(len(time_list), len(list_of_bands), region_grid['height'], region_grid['width'])
+            value_array[value_array == region_missing_value] = np.nan
+        location_value_array = sample_region(value_array, region_grid, location_list)
+
+        # one dataframe per location, as parsed from getRegion: rows without data removed
+        datetime_array = np.array(time_list, dtype=np.int64).astype('datetime64[ms]').astype('datetime64[ns]')
+        df_list = []
+        for index in range(len(location_list)):
+            is_valid = ~np.isnan(location_value_array[:, :, index]).any(axis=1)
+            df_list.append(pd.DataFrame({'datetime': datetime_array[is_valid],
+                                         **{band: location_value_array[is_valid, band_index, index]
+                                            for band_index, band in enumerate(list_of_bands)}}))
+
+    add_counter('gee_rows', len(time_list))
+    add_counter('parsed_bytes', int(sum(df.memory_usage(index=False).sum() for df in df_list)))
+
+    # returns one dataframe per location, and the duration of the requests (seconds)
+    return df_list, request_time
+
+
+def fetch_missing_interval(location_list, image_collection, collection, list_of_bands, from_date, to_date, scale,
+                           aggregation_list=None):
+    # location_list: list of (lon, lat, location_key); several locations are fetched by the same requests
+    # chunk size is adaptive: it starts from the largest size estimated for the collection, is halved when GEE fails
+    # (e.g. memory issues), and grows again after successes.
+    # A chunk failing for good (a single day fails, or retries of throttling/transient errors are exhausted) is not
+    # cached: the next chunks are fetched, and missing periods are reported at the end of the run.
+    # aggregation_list (optional): list_of_bands are bands of daily composites, built by GEE for each chunk
+    # region retrieval: chunk size depends on the pixels of the raster block, not on the number of locations
+    if aggregation_list is None:
+        chunk_size_key = collection
+    else:
+        chunk_size_key = collection + daily_composite_suffix
+
+    region_grid = None
+    geometry = None
+    if is_region_retrieval(collection):
+        chunk_size_key += region_suffix
+        region_grid = get_region_grid(location_list, collection)
+        point_count = region_grid['width'] * region_grid['height']
+    elif len(location_list) == 1:
+        geometry = ee.Geometry.Point(location_list[0][0], location_list[0][1])
+        point_count = 1
+    else:
+        geometry = ee.Geometry.MultiPoint([[lon, lat] for lon, lat, _ in location_list])
+        point_count = len(location_list)
+    cache_collection = get_cache_collection(collection)
+    time_shift = get_time_shift(collection)
 
-        # save raw data in csv format
-        df_result.to_csv(file_path, encoding='utf-8', index=False, header=True)
+    lower_date_boundary = from_date
 
-    else:
+    while lower_date_boundary < to_date:
+
+        interval_size_in_days = get_interval_size_in_days(chunk_size_key, len(list_of_bands), point_count)
+        upper_date_boundary = min(lower_date_boundary + datetime.timedelta(days=interval_size_in_days), to_date)
+
+        # period of the request (time shift of filtered collections, see source_filter_dict)
+        request_from_date, request_to_date = lower_date_boundary + time_shift, upper_date_boundary + time_shift
 
-        print(">>> " + " ".join(list_of_bands) + " - retrieving data from " + file_path)
-        df_result = pd.read_csv(file_path)
+        if aggregation_list is None:
+            chunk_image_collection = image_collection
+        else:
+            chunk_image_collection = get_daily_composite_collection(image_collection, aggregation_list,
+                                                                    request_from_date, request_to_date)
+
+        try:
+            if region_grid is None:
+                df_delta, request_time = call_cloud_service(geometry, chunk_image_collection, list_of_bands,
+                                                            request_from_date, request_to_date, scale,
+                                                            len(location_list) > 1)
+            else:
+                df_delta_list, request_time = call_region_service(region_grid, chunk_image_collection, list_of_bands,
+                                                                  request_from_date, request_to_date, location_list)
+        except (ee.ee_exception.EEException, ConnectionError, TimeoutError) as exception:
+            print("period from", lower_date_boundary, "to", upper_date_boundary, "failed:", exception)
+            if is_retryable_error(exception):
+                # retries exhausted: a smaller chunk would not help
+                new_interval_size_in_days = None
+            else:
+                new_interval_size_in_days = record_failure(chunk_size_key, len(list_of_bands), point_count,
+                                                           (upper_date_boundary - lower_date_boundary).days)
+            if new_interval_size_in_days is None:
+                print("period from", lower_date_boundary, "to", upper_date_boundary, "not retrieved:",
+                      " ".join(list_of_bands), "(" + str(len(location_list)) + " location(s))")
+                lower_date_boundary = upper_date_boundary
+                continue
+            print("retrying with chunks of", new_interval_size_in_days, "days")
+            continue
+
+        # a chunk cut at TO-date says nothing about the chunk size
+        if (upper_date_boundary - lower_date_boundary).days == interval_size_in_days:
+            record_success(chunk_size_key, len(list_of_bands), point_count, interval_size_in_days)
+
+        if region_grid is not None:
+            record_count = sum(len(df_location_delta) for df_location_delta in df_delta_list)
+        elif len(location_list) == 1:
+            df_delta_list = [df_delta]
+            record_count = len(df_delta)
+        else:
+            df_delta_list = split_by_location(df_delta, location_list, scale)
+            record_count = len(df_delta)
+
+        # records stamped back to the day of their values
+        if time_shift.days != 0:
+            df_delta_list = [df_location_delta.assign(datetime=df_location_delta['datetime'] - time_shift)
+                             for df_location_delta in df_delta_list]
+
+        # chunk is cached right away: it is not fetched again, even if the run is interrupted afterwards
+        with measure_span('cache_write'):
+            save_chunk_list([(location_key, df_location_delta) for (_, _, location_key), df_location_delta
+                             in zip(location_list, df_delta_list)], cache_collection, list_of_bands,
+                            lower_date_boundary, upper_date_boundary, scale)
+
+        print("period from", lower_date_boundary, "to", upper_date_boundary, "records found:", record_count,
+              "(" + str(len(location_list)) + " location(s))", "- request time: {:.2f} s".format(request_time))
+        lower_date_boundary = upper_date_boundary
+
+
+def get_missing_band_dict(location_key, chunk_list_dict, list_of_bands, from_date, to_date):
+    # periods not cached yet, by band: only those are fetched from the cloud
+    # chunk_list_dict: cached chunks, see raw_data_cache_util.get_chunk_list_dict
+    # bands missing the same periods are fetched together: {tuple of missing intervals: list of bands}
+    missing_band_dict = {}
+    for band in list_of_bands:
+        missing_interval_list = get_missing_intervals(chunk_list_dict[(location_key, band)], from_date, to_date)
+        if len(missing_interval_list) > 0:
+            missing_band_dict.setdefault(tuple(missing_interval_list), []).append(band)
+            add_counter('cache_misses')
+        else:
+            add_counter('cache_hits')
+    return missing_band_dict
+
+
+def fetch_gee_data(location_list, collection, list_of_bands, from_date, to_date, scale, aggregation_list=None):
+    # fetch into cache all periods missing for the locations: locations missing the same periods of the same bands
+    # are fetched together, by batches of max_points_per_request
+    # aggregation_list (optional): daily composites, list_of_bands are then the bands of the composites (cached as
+    # such, e.g. GEE_RAW_DATA/<location>/NASA_GPM_L3_IMERG_V06/precipitationCal_sum)
+    # coverage of all locations from a single catalog query (see util/raw_data_catalog_util.py)
+    chunk_list_dict = get_chunk_list_dict([location_key for _, _, location_key in location_list],
+                                          get_cache_collection(collection), list_of_bands)
+    missing_location_dict = {}
+    for lon, lat, location_key in location_list:
+        for missing_interval_list, list_of_missing_bands in get_missing_band_dict(location_key, chunk_list_dict,
+                                                                                  list_of_bands, from_date,
+                                                                                  to_date).items():
+            missing_location_dict.setdefault((missing_interval_list, tuple(list_of_missing_bands)), []).append(
+                (lon, lat, location_key))
+
+    for (missing_interval_list, list_of_missing_bands), missing_location_list in missing_location_dict.items():
+
+        initialize_earth_engine()
+
+        cloud_retrieval_time = start_time_measure(
+            ">>> " + " ".join(list_of_missing_bands) + " - starting cloud retrieval...")
+
+        image_collection = get_source_image_collection(collection)
+
+        # composites of the missing bands only
+        if aggregation_list is None:
+            missing_aggregation_list = None
+        else:
+            missing_aggregation_list = [(band, function) for band, function in aggregation_list
+                                        if get_composite_band(band, function) in list_of_missing_bands]
+
+        # region retrieval: all locations in the same raster block, whatever their number
+        if is_region_retrieval(collection):
+            batch_size = len(missing_location_list)
+        else:
+            batch_size = max_points_per_request
+
+        for index in range(0, len(missing_location_list), batch_size):
+            for missing_from_date, missing_to_date in missing_interval_list:
+                fetch_missing_interval(missing_location_list[index:index + batch_size], image_collection,
+                                       collection, list(list_of_missing_bands), missing_from_date, missing_to_date,
+                                       scale, missing_aggregation_list)
+
+        end_time_measure(cloud_retrieval_time, ">>> " + " ".join(list_of_missing_bands) + " - retrieval time: ")
+
+
+def prefetch_gee_data(weather_stations, collection, list_of_bands, from_date_string, to_date_string, scale,
+                      aggregation_list=None):
+    # batched retrieval: all weather stations ([lon, lat, elev]) are sampled by the same requests, and the cache of
+    # each station is filled. get_gee_data then finds everything in cache.
+    # each pixel of the collection is sampled once, whatever the number of weather stations inside
+    fetch_gee_data(get_pixel_location_list(weather_stations, collection), collection, list_of_bands,
+                   datetime.datetime.strptime(from_date_string, '%Y-%m-%d').date(),
+                   datetime.datetime.strptime(to_date_string, '%Y-%m-%d').date(), scale, aggregation_list)
+
+
+def prefetch_daily_composite_gee_data(weather_stations, collection, aggregation_dict, from_date_string,
+                                      to_date_string, scale):
+    # batched retrieval of daily composites (see get_daily_composite_gee_data)
+    aggregation_list = list(aggregation_dict.values())
+    prefetch_gee_data(weather_stations, collection,
+                      [get_composite_band(band, function) for band, function in aggregation_list], from_date_string,
+                      to_date_string, scale, aggregation_list)
+
+
+def get_band_union_dict(collection_band_list):
+    # band-union planner: all bands needed from a collection, over all variables, are fetched by the same requests
+    # collection_band_list: list of (collection, list of bands); returns {collection: list of bands}
+    # bands keep the order of their first use
+    collection_band_dict = {}
+    for collection, list_of_bands in collection_band_list:
+        union_list_of_bands = collection_band_dict.setdefault(collection, [])
+        for band in list_of_bands:
+            if band not in union_list_of_bands:
+                union_list_of_bands.append(band)
+    return collection_band_dict
+
+
+def get_band_slice(df_collection, list_of_bands):
+    # slice of a variable in the data of its collection (deep copy: variables change units in place)
+    if df_collection is None:
+        return None
+    return df_collection[['datetime', *list_of_bands]].copy(deep=True)
+
+
+# Retrieval is cut into chunks, to bypass memory issues of GEE: see util/chunk_size_util.py
+# chunk_reducer (optional): each cached chunk is reduced as it is read, e.g. to daily values (streaming reduction)
+def get_gee_data(lon, lat, collection, list_of_bands, from_date_string, to_date_string, scale, chunk_reducer=None):
+    # data of the native pixel of the collection holding lon/lat: shared by all weather stations of the pixel
+    [(pixel_lon, pixel_lat, location_key)] = get_pixel_location_list([[lon, lat]], collection)
+
+    # FROM-date (included)
+    from_date = datetime.datetime.strptime(from_date_string, '%Y-%m-%d').date()
+
+    # TO-date (excluded)
+    to_date = datetime.datetime.strptime(to_date_string, '%Y-%m-%d').date()
+
+    with get_pixel_lock(location_key, collection):
+        fetch_gee_data([(pixel_lon, pixel_lat, location_key)], collection, list_of_bands, from_date, to_date, scale)
+
+    print(">>> " + " ".join(list_of_bands) + " - retrieving data from " + gee_raw_data_directory + '/' + location_key)
+    df_result = load_bands(location_key, get_cache_collection(collection), list_of_bands, from_date, to_date,
+                           chunk_reducer)
 
     if df_result is not None:
         result_size = len(df_result)
@@ -157,3 +640,85 @@ def get_gee_data(lon, lat, collection, list_of_bands, from_date_string, to_date_
     print("total records found:", result_size)
 
     return df_result
+
+
+def get_raw_data_file_list(lon, lat, collection, list_of_bands, from_date_string, to_date_string):
+    # cached raw data files of lon/lat read by get_gee_data (or get_daily_composite_gee_data, for composite bands)
+    [(_, _, location_key)] = get_pixel_location_list([[lon, lat]], collection)
+    return get_chunk_file_list(location_key, get_cache_collection(collection), list_of_bands,
+                               datetime.datetime.strptime(from_date_string, '%Y-%m-%d').date(),
+                               datetime.datetime.strptime(to_date_string, '%Y-%m-%d').date())
+
+
+def get_daily_composite_gee_data(lon, lat, collection, aggregation_dict, from_date_string, to_date_string, scale):
+    # server-side reduction: daily values computed by GEE (daily composites), instead of all images of the day
+    # aggregation_dict: {output column: (band, function)}, as for date_util.get_daily_values, which gives the same
+    # columns from images reduced locally
+    aggregation_list = list(aggregation_dict.values())
+    composite_band_list = [get_composite_band(band, function) for band, function in aggregation_list]
+
+    [(pixel_lon, pixel_lat, location_key)] = get_pixel_location_list([[lon, lat]], collection)
+    from_date = datetime.datetime.strptime(from_date_string, '%Y-%m-%d').date()
+    to_date = datetime.datetime.strptime(to_date_string, '%Y-%m-%d').date()
+
+    with get_pixel_lock(location_key, collection):
+        fetch_gee_data([(pixel_lon, pixel_lat, location_key)], collection, composite_band_list, from_date, to_date,
+                       scale, aggregation_list)
+
+    print(">>> " + " ".join(composite_band_list) + " - retrieving daily composites from " + gee_raw_data_directory +
+          '/' + location_key)
+    df_result = load_bands(location_key, get_cache_collection(collection), composite_band_list, from_date, to_date)
+    if df_result is None:
+        return None
+
+    print("total daily records found:", len(df_result))
+
+    return df_result.rename(columns={get_composite_band(band, function): column
+                                     for column, (band, function) in aggregation_dict.items()})
+
+
+def get_nearest_pixel_values(df_multi_point, lon_array, lat_array, band, scale):
+    # value of the nearest pixel of each point (NaN: no pixel within 2 pixel sizes, e.g. point without data)
+    # as split_by_location, for thousands of points at once: distances computed by blocks of points
+    df_pixels = df_multi_point.drop_duplicates(['longitude', 'latitude'])
+    pixel_lon_array, pixel_lat_array = df_pixels['longitude'].to_numpy(), df_pixels['latitude'].to_numpy()
+    pixel_value_array = df_pixels[band].to_numpy(dtype=np.float64)
+    value_array = np.full(len(lon_array), np.nan)
+    if len(df_pixels) == 0:
+        return value_array
+
+    max_distance = 2 * scale / 111320  # meters to degrees
+    block_size = 1000
+    for index in range(0, len(lon_array), block_size):
+        distance_array = ((pixel_lon_array - lon_array[index:index + block_size, None]) ** 2 +
+                          (pixel_lat_array - lat_array[index:index + block_size, None]) ** 2) ** (1 / 2)
+        nearest_index_array = distance_array.argmin(axis=1)
+        is_near = distance_array[np.arange(len(nearest_index_array)), nearest_index_array] <= max_distance
+        value_array[index:index + block_size] = np.where(is_near, pixel_value_array[nearest_index_array], np.nan)
+    return value_array
+
+
+def get_elevation_data(lon_array, lat_array, collection, band, scale):
+    # elevation of points, sampled on a DEM by a single getRegion request (MultiPoint); returns float64 array (NaN: no
+    # DEM data)
+    # tiles of the points only (filterBounds), mosaicked into a single image: one row per point, instead of one row per
+    # tile and point (tens of thousands of tiles); the mosaic has no date, it is stamped with epoch 0 (rows without
+    # time are dropped by ee_array_to_df)
+    # https://developers.google.com/earth-engine/datasets/catalog/COPERNICUS_DEM_GLO30
+    # https://developers.google.com/earth-engine/apidocs/ee-imagecollection-mosaic
+    initialize_earth_engine()
+    geometry = ee.Geometry.MultiPoint([[lon, lat] for lon, lat in zip(lon_array.tolist(), lat_array.tolist())])
+    mosaic = ee.ImageCollection(collection).filterBounds(geometry).select([band]).mosaic().set('system:time_start', 0)
+    selection = ee.ImageCollection([mosaic])
+
+    with measure_span('gee_request'):
+        data, request_time = call_with_retry(lambda: selection.getRegion(geometry, scale).getInfo(),
+                                             "elevation of " + str(len(lon_array)) + " point(s)")
+    add_counter('gee_requests')
+    add_counter('gee_rows', len(data) - 1)
+    add_counter('gee_values', (len(data) - 1) * len(data[0]))
+
+    df_result = ee_array_to_df(data, [band], True)
+    print("elevation of", len(lon_array), "point(s) - records found:", len(df_result),
+          "- request time: {:.2f} s".format(request_time))
+    return get_nearest_pixel_values(df_result, lon_array, lat_array, band, scale)
@@ -0,0 +1,133 @@
+"""
+Author........... Gabriel Böhnke
+University....... UCLouvain, Faculty of bioscience engineering
+Email............ gabriel.bohnke@student.uclouvain.be
+
+Description...... run journal util functions: per-station, per-variable completion, for resumable runs
+Version.......... 1.00
+Last changed on.. 17.10.2026
+"""
+
+import os
+import json
+import threading
+
+# JSON Lines: one JSON document per line, appended as work completes (a crash can only cut the last line)
+# https://jsonlines.org/
+# 1st line: parameters of the last run
+# example of 1st line: {"run": {"from_date": "2015-01-01", "to_date": "2020-07-10", ...}}
+# next lines: one completed variable of a weather station, with the hash of its inputs (parameters, weather station,
+# processing code, raw data files: see util/build_manifest_util.py), its weather file (None: no data, or no file) and
+# its daily values used for weather generator data (None: not used); monthly statistics of all weather stations are
+# computed from them in a single pass
+# example: {"wgn_id": 1, "variable": "tmp", "inputs": "7d0e...", "file": "station_001.tmp", "generator_input":
+# {"date": ["2015-01-01", ...], "tmp_max": [14.52, ...], "tmp_min": [6.87, ...]}}
+# a journal is resumed whatever the parameters of the former run: variables whose inputs changed (e.g. coordinates
+# of a single weather station) are processed again, the other ones are skipped
+# one journal per output directory (see open_run_journal)
+journal_file_name = 'run_journal.jsonl'
+journal_file_path = 'SWAT_INPUT_DATA/' + journal_file_name
+
+# completed variables: {(wgn_id, variable): journal entry}
+journal_entry_dict = {}
+journal_lock = threading.Lock()
+
+
+def get_json_value(value):
+    # numpy scalars (e.g. numpy.int64, numpy.float64) as python values; floats are written with repr: no precision loss
+    return value.item()
+
+
+def read_journal():
+    # entries of a journal, None if there is no journal
+    if not os.path.exists(journal_file_path):
+        return None
+    entry_dict = {}
+    with open(journal_file_path, 'r', encoding='utf-8') as file:
+        line_list = file.read().splitlines()
+    if len(line_list) == 0:
+        return None
+    for line in line_list[1:]:
+        try:
+            entry = json.loads(line)
+        except ValueError:
+            # last line cut by a crash: this variable is processed again
+            continue
+        entry_dict[(entry['wgn_id'], entry['variable'])] = entry
+    return entry_dict
+
+
+def open_run_journal(directory, run_parameter_dict, is_resumed=True):
+    # run_parameter_dict: JSON values only (lists, not tuples), written as 1st line
+    global journal_entry_dict, journal_file_path
+    journal_file_path = directory + '/' + journal_file_name
+    entry_dict = read_journal() if is_resumed else None
+    with journal_lock:
+        if entry_dict is None:
+            journal_entry_dict = {}
+            with open(journal_file_path, 'w', encoding='utf-8') as file:
+                file.write(json.dumps({'run': run_parameter_dict}) + '\n')
+            print(journal_file_path + ' started')
+        else:
+            journal_entry_dict = entry_dict
+            # rewritten with complete lines only: lines appended next never follow a line cut by a crash
+            with open(journal_file_path + '.tmp', 'w', encoding='utf-8') as file:
+                file.write(json.dumps({'run': run_parameter_dict}) + '\n')
+                file.writelines(json.dumps(entry) + '\n' for entry in entry_dict.values())
+            os.replace(journal_file_path + '.tmp', journal_file_path)
+            print(journal_file_path + ' resumed: ' + str(len(entry_dict)) + ' variable(s) processed by a former run')
+
+
+def is_variable_completed(wgn_id, variable, weather_station_directory, inputs_hash):
+    # completed: recorded in the journal from the same inputs, and its weather file is still there (weather files are
+    # written atomically, and variables recorded only once their weather file is on disk: see
+    # swat_file_util.wait_for_weather_file)
+    with journal_lock:
+        entry = journal_entry_dict.get((wgn_id, variable))
+    # entries of former journals without daily weather generator values are processed again
+    return entry is not None and entry.get('inputs') == inputs_hash and 'generator_input' in entry and (
+            entry['file'] is None or os.path.exists(weather_station_directory + '/' + entry['file']))
+
+
+def record_variable(wgn_id, variable, inputs_hash, file_name, generator_input):
+    # generator_input: dict of lists, daily values by column (see retrieve_station_data.get_variable_generator_input)
+    entry = {'wgn_id': wgn_id, 'variable': variable, 'inputs': inputs_hash, 'file': file_name,
+             'generator_input': generator_input}
+    line = json.dumps(entry, default=get_json_value) + '\n'
+    with journal_lock:
+        # on disk before the next variable: a preempted machine loses the variables in flight only
+        # https://docs.python.org/3/library/os.html#os.fsync
+        with open(journal_file_path, 'a', encoding='utf-8') as file:
+            file.write(line)
+            file.flush()
+            os.fsync(file.fileno())
+        journal_entry_dict[(wgn_id, variable)] = json.loads(line)
+
+
+def get_journal_entry(wgn_id, variable):
+    with journal_lock:
+        return journal_entry_dict.get((wgn_id, variable))
+
+
+def invalidate_variables(directory, wgn_id_list=None, variable_list=None):
+    # entries of weather stations and variables (None: all) removed from the journal of an output directory, with
+    # their weather files: processed again by the next run; returns the removed entries
+    global journal_file_path
+    journal_file_path = directory + '/' + journal_file_name
+    if not os.path.exists(journal_file_path):
+        return []
+    with open(journal_file_path, 'r', encoding='utf-8') as file:
+        first_line = file.readline()
+    entry_dict = read_journal() or {}
+    removed_key_list = [(wgn_id, variable) for wgn_id, variable in entry_dict
+                        if (wgn_id_list is None or wgn_id in wgn_id_list) and
+                        (variable_list is None or variable in variable_list)]
+    removed_entry_list = [entry_dict.pop(key) for key in removed_key_list]
+    with open(journal_file_path + '.tmp', 'w', encoding='utf-8') as file:
+        file.write(first_line)
+        file.writelines(json.dumps(entry) + '\n' for entry in entry_dict.values())
+    os.replace(journal_file_path + '.tmp', journal_file_path)
+    for entry in removed_entry_list:
+        if entry['file'] is not None and os.path.exists(directory + '/WEATHER_STATIONS/' + entry['file']):
+            os.remove(directory + '/WEATHER_STATIONS/' + entry['file'])
+    return removed_entry_list
@@ -3,14 +3,26 @@ Author........... Gabriel Böhnke
 University....... UCLouvain, Faculty of bioscience engineering
 Email............ gabriel.bohnke@student.uclouvain.be
 
-Description...... performance util functions
+Description...... performance util functions: time measures, instrumentation (spans, counters), run report, profile
 Version.......... 1.00
-Last changed on.. 02.05.2022
+Last changed on.. 17.10.2026
 """
 
+import sys
+import json
 import time
+import cProfile
+import threading
+from contextlib import contextmanager
 from datetime import timedelta
 
+# peak memory of the process: Unix only
+# https://docs.python.org/3/library/resource.html
+try:
+    import resource
+except ImportError:
+    resource = None
+
 
 # How do I get time of a Python program's execution?
 # https://stackoverflow.com/questions/1557571/how-do-i-get-time-of-a-python-programs-execution
@@ -25,3 +37,133 @@ def end_time_measure(start_time, print_prefix=None):
     if print_prefix:
         print(print_prefix + str((timedelta(seconds=end_time - start_time))).split('.')[0])  # remove µs
     return end_time
+
+
+# instrumentation: timing spans and counters, by stage, weather station and variable (None if not relevant)
+# variable: a variable (e.g. 'pcp'), or a collection for retrievals shared by several variables
+# examples of stages: 'gee_request', 'parse', 'cache_read', 'cache_write', 'process', 'weather_file_write'
+span_dict = {}  # {(stage, station, variable): {'count', 'total_time', 'max_time', 'peak_memory_mb'}}
+counter_dict = {}  # {(name, station, variable): value}, e.g. ('gee_rows', None, 'NASA/GPM_L3/IMERG_V06'): 52608
+instrumentation_lock = threading.Lock()
+instrumentation_start_time = time.monotonic()
+
+# weather station and variable of the current thread: default labels of spans and counters recorded by util functions
+# (e.g. a GEE request does not know the weather station it is made for)
+# https://docs.python.org/3/library/threading.html#thread-local-data
+span_context = threading.local()
+
+profiler = None
+
+
+def get_peak_memory_in_mb():
+    # peak resident memory of the whole process (all threads), None if unknown
+    if resource is None:
+        return None
+    peak_memory = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss: kilobytes on Linux, bytes on macOS
+    if sys.platform == 'darwin':
+        peak_memory = peak_memory / 1024
+    return round(peak_memory / 1024, 1)
+
+
+def get_span_labels(station, variable):
+    if station is None:
+        station = getattr(span_context, 'station', None)
+    if variable is None:
+        variable = getattr(span_context, 'variable', None)
+    return station, variable
+
+
+@contextmanager
+def measure_context(station=None, variable=None):
+    # labels of spans and counters recorded by the current thread, until the end of the block
+    previous_station, previous_variable = getattr(span_context, 'station', None), getattr(span_context, 'variable',
+                                                                                           None)
+    span_context.station, span_context.variable = get_span_labels(station, variable)
+    try:
+        yield
+    finally:
+        span_context.station, span_context.variable = previous_station, previous_variable
+
+
+def record_span(stage, duration, station=None, variable=None):
+    key = (stage, *get_span_labels(station, variable))
+    peak_memory_in_mb = get_peak_memory_in_mb()
+    with instrumentation_lock:
+        span = span_dict.setdefault(key, {'count': 0, 'total_time': 0.0, 'max_time': 0.0, 'peak_memory_mb': None})
+        span['count'] += 1
+        span['total_time'] += duration
+        span['max_time'] = max(span['max_time'], duration)
+        if peak_memory_in_mb is not None:
+            span['peak_memory_mb'] = max(span['peak_memory_mb'] or 0, peak_memory_in_mb)
+
+
+@contextmanager
+def measure_span(stage, station=None, variable=None):
+    # example: with measure_span('parse'): df = ee_array_to_df(...)
+    start_time = time.perf_counter()
+    try:
+        yield
+    finally:
+        record_span(stage, time.perf_counter() - start_time, station, variable)
+
+
+def add_counter(name, value=1, station=None, variable=None):
+    key = (name, *get_span_labels(station, variable))
+    with instrumentation_lock:
+        counter_dict[key] = counter_dict.get(key, 0) + value
+
+
+def get_run_report(run_parameter_dict=None, extra_dict=None):
+    # machine-readable summary of the run: totals by stage, then spans and counters by weather station and variable
+    with instrumentation_lock:
+        span_list = [{'stage': stage, 'station': station, 'variable': variable, **span}
+                     for (stage, station, variable), span in span_dict.items()]
+        counter_list = [{'name': name, 'station': station, 'variable': variable, 'value': value}
+                        for (name, station, variable), value in counter_dict.items()]
+
+    stage_dict = {}
+    for span in span_list:
+        stage = stage_dict.setdefault(span['stage'], {'count': 0, 'total_time': 0.0, 'max_time': 0.0})
+        stage['count'] += span['count']
+        stage['total_time'] += span['total_time']
+        stage['max_time'] = max(stage['max_time'], span['max_time'])
+
+    total_counter_dict = {}
+    for counter in counter_list:
+        total_counter_dict[counter['name']] = total_counter_dict.get(counter['name'], 0) + counter['value']
+
+    # sorted: reports of two runs can be compared line by line
+    sort_key = (lambda item: tuple(str(item[key]) for key in ['stage', 'name', 'station', 'variable'] if key in item))
+    return {'run': run_parameter_dict,
+            'total_time': time.monotonic() - instrumentation_start_time,
+            'peak_memory_mb': get_peak_memory_in_mb(),
+            'stages': dict(sorted(stage_dict.items())),
+            'counters': dict(sorted(total_counter_dict.items())),
+            **(extra_dict or {}),
+            'spans': sorted(span_list, key=sort_key),
+            'counter_details': sorted(counter_list, key=sort_key)}
+
+
+def save_run_report(file_path, run_parameter_dict=None, extra_dict=None):
+    with open(file_path, 'w', encoding='utf-8') as file:
+        json.dump(get_run_report(run_parameter_dict, extra_dict), file, indent=2)
+    print(file_path + ' saved')
+
+
+# The Python Profilers
+# https://docs.python.org/3/library/profile.html
+def start_profile():
+    # cProfile measures the thread it is enabled in: set concurrency limits to 1 to profile the whole processing
+    global profiler
+    profiler = cProfile.Profile()
+    profiler.enable()
+
+
+def end_profile(file_path):
+    # statistics can be read with: python -m pstats <file>
+    if profiler is None:
+        return
+    profiler.disable()
+    profiler.dump_stats(file_path)
+    print(file_path + ' saved')
@@ -0,0 +1,451 @@
+"""
+Author........... Gabriel Böhnke
+University....... UCLouvain, Faculty of bioscience engineering
+Email............ gabriel.bohnke@student.uclouvain.be
+
+Description...... GEE raw data cache util functions
+Version.......... 1.00
+Last changed on.. 17.10.2026
+"""
+
+import io
+import os
+import re
+import math
+import hashlib
+import datetime
+import numpy as np
+import pandas as pd
+from util.performance_util import measure_span
+from util.raw_data_catalog_util import get_catalog_file_path, is_catalog_available, record_chunk_list, \
+    replace_catalog, get_catalog_chunk_dict, get_catalog_scale_dict, get_fetch_time
+
+# Cache layout: one file per (location, collection, band, time chunk)
+# GEE_RAW_DATA/<location>/<collection>/<band>/<from-date>_<to-date>.npz
+# example: GEE_RAW_DATA/00937500_03637500/ECMWF_ERA5_DAILY/maximum_2m_air_temperature/2015-01-01_2020-07-10.npz
+# location: center of the native pixel of the collection (see collection_grid_dict), so weather stations sharing a
+# pixel share its data; lon/lat of the weather station for collections of unknown grid
+# FROM-date is included, TO-date is excluded: a chunk file covers its period, even if GEE found no records in it.
+gee_raw_data_directory = 'GEE_RAW_DATA'
+
+# format of new chunk files; both formats are read
+# 'npz': compressed binary columns, int64 epoch milliseconds + float32 band values (float64 if float32 would round)
+# 'csv': text columns, ISO datetime strings + band values
+raw_data_file_format = 'npz'
+raw_data_file_format_list = ['npz', 'csv']
+
+# legacy cache layout: one file per (location, date range, category), all bands of the category in the same file
+# example: GEE_RAW_DATA/00945730_03647590_2015-01-01_2020-07-10_tmp.csv
+legacy_file_name_pattern = re.compile(r'^([-\d]+_[-\d]+)_(\d{4}-\d{2}-\d{2})_(\d{4}-\d{2}-\d{2})_([a-z]{3})\.csv$')
+
+# collection and bands of each raw data category
+raw_data_category_dict = {
+    'pcp': ('NASA/GPM_L3/IMERG_V06', ['precipitationCal']),
+    'tmp': ('ECMWF/ERA5/DAILY', ['maximum_2m_air_temperature', 'minimum_2m_air_temperature']),
+    'wnd': ('ECMWF/ERA5/DAILY', ['u_component_of_wind_10m', 'v_component_of_wind_10m']),
+    'hmd': ('NOAA/GFS0P25', ['relative_humidity_2m_above_ground']),
+    'slr': ('ECMWF/ERA5_LAND/HOURLY', ['surface_net_solar_radiation']),
+    'dew': ('ECMWF/ERA5/DAILY', ['dewpoint_2m_temperature'])
+}
+
+
+def get_location_key(lon, lat):
+    # lon/lat part: iiiddddd_iiiddddd
+    # example: 00939000_03616579 for lon=9.39 and lat=36.165789
+
+    # https://stackoverflow.com/questions/455612/limiting-floats-to-two-decimal-points
+    # https://stackoverflow.com/questions/34688196/how-to-add-trailing-zeroes-to-an-integer
+    # integer part: if fewer than 3 integer positions, add leading zeroes
+    # decimal part: if more than 5 decimals: rounding on 5th one; if fewer, add trailing zeroes
+    return str(lon).split('.')[0].zfill(3) + '{:<05}'.format(
+        str(float("{:.5f}".format(lon))).split('.')[1]) + '_' + str(lat).split('.')[0].zfill(3) + '{:<05}'.format(
+        str(float("{:.5f}".format(lat))).split('.')[1])
+
+
+def get_location_from_key(location_key):
+    # inverse of get_location_key: 00945730_03647590 -> (9.4573, 36.4759)
+    return tuple(int(part) / 10 ** 5 for part in location_key.split('_'))
+
+
+# native grid of collections: pixel size (degrees), and offset of pixel edges from multiples of the pixel size
+# (checked on bundled raw data: weather stations inside the same pixel have identical records)
+collection_grid_dict = {
+    'ECMWF/ERA5/DAILY': (0.25, 0),  # edges on multiples of 0.25°
+    'NOAA/GFS0P25': (0.25, 0.125),  # grid points (pixel centers) on multiples of 0.25°
+    'ECMWF/ERA5_LAND/HOURLY': (0.1, 0.05),  # pixel centers on multiples of 0.1°
+    'NASA/GPM_L3/IMERG_V06': (0.1, 0),  # edges on multiples of 0.1°
+    # images selected at the source (see google_earth_engine_util.source_filter_dict): grid of their collection
+    'NOAA/GFS0P25/SHORT_LEAD': (0.25, 0.125),
+    'ECMWF/ERA5_LAND/HOURLY/DAILY_ACCUMULATION': (0.1, 0.05)
+}
+
+
+# region retrieval with bilinear sampling (see google_earth_engine_util.fetch_region_interval): values of weather
+# station locations, not of pixels, cached apart under <collection>/BILINEAR (a collection of unknown grid: the
+# location is the weather station lon/lat)
+# example: GEE_RAW_DATA/00945730_03647590/ECMWF_ERA5_DAILY_BILINEAR/maximum_2m_air_temperature/...
+bilinear_collection_suffix = '/BILINEAR'
+
+
+def get_pixel_center(lon, lat, collection):
+    # center of the native pixel of the collection holding lon/lat; lon/lat itself for collections of unknown grid
+    if collection not in collection_grid_dict:
+        return lon, lat
+    pixel_size, pixel_offset = collection_grid_dict[collection]
+
+    # rounding before floor: a coordinate on a pixel edge (e.g. 9.3 / 0.1 = 92.99999999999999) stays on its side
+    def get_center(coordinate):
+        pixel_index = math.floor(round((coordinate - pixel_offset) / pixel_size, 9))
+        return round(pixel_offset + (pixel_index + 0.5) * pixel_size, 5)
+
+    return get_center(lon), get_center(lat)
+
+
+def get_pixel_key(lon, lat, collection):
+    # cache location of lon/lat for a collection, e.g. 00937500_03637500 for ECMWF/ERA5/DAILY at lon=9.4573, lat=36.4759
+    return get_location_key(*get_pixel_center(lon, lat, collection))
+
+
+def get_chunk_directory(location_key, collection, band):
+    # example: GEE_RAW_DATA/00945730_03647590/ECMWF_ERA5_DAILY/maximum_2m_air_temperature
+    return gee_raw_data_directory + '/' + location_key + '/' + collection.replace('/', '_') + '/' + band
+
+
+def get_chunk_file_path(location_key, collection, band, date_from, date_to, file_format):
+    # example: GEE_RAW_DATA/00945730_03647590/ECMWF_ERA5_DAILY/maximum_2m_air_temperature/2015-01-01_2020-07-10.npz
+    return get_chunk_directory(location_key, collection, band) + '/' + date_from.strftime(
+        '%Y-%m-%d') + '_' + date_to.strftime('%Y-%m-%d') + '.' + file_format
+
+
+def get_chunk_list(location_key, collection, band):
+    # cached chunks of a band, sorted by FROM-date: list of (from_date, to_date, file_path)
+    chunk_directory = get_chunk_directory(location_key, collection, band)
+    chunk_list = []
+    if os.path.exists(chunk_directory):
+        for file_name in os.listdir(chunk_directory):
+            file_name_part, file_extension = os.path.splitext(file_name)
+            if file_extension[1:] in raw_data_file_format_list:
+                date_from_string, date_to_string = file_name_part.split('_')
+                chunk_list.append((datetime.datetime.strptime(date_from_string, '%Y-%m-%d').date(),
+                                   datetime.datetime.strptime(date_to_string, '%Y-%m-%d').date(),
+                                   chunk_directory + '/' + file_name))
+    return sorted(chunk_list)
+
+
+def get_missing_intervals(chunk_list, from_date, to_date):
+    # intervals of [from_date, to_date) not covered by any cached chunk: list of (from_date, to_date)
+    missing_interval_list = []
+    covered_until = from_date
+    for chunk_from_date, chunk_to_date, _ in chunk_list:
+        if chunk_to_date <= covered_until or chunk_from_date >= to_date:
+            continue
+        if chunk_from_date > covered_until:
+            missing_interval_list.append((covered_until, chunk_from_date))
+        covered_until = max(covered_until, chunk_to_date)
+    if covered_until < to_date:
+        missing_interval_list.append((covered_until, to_date))
+    return missing_interval_list
+
+
+def get_chunk_file_list(location_key, collection, list_of_bands, from_date, to_date):
+    # cached chunk files of bands overlapping [from_date, to_date): raw data files read by load_bands
+    return [file_path for band in list_of_bands
+            for chunk_from_date, chunk_to_date, file_path in get_chunk_list(location_key, collection, band)
+            if chunk_to_date > from_date and chunk_from_date < to_date]
+
+
+def write_chunk_file(file_path, df_band, band):
+    # file is renamed into place once written, so an interrupted run never leaves a partial chunk file that would
+    # claim coverage of its period; returns SHA-256 of the file (see util/raw_data_catalog_util.py)
+    if file_path.endswith('.npz'):
+        # int64 epoch milliseconds, as returned by getRegion
+        time = pd.to_datetime(df_band['datetime']).to_numpy(dtype='datetime64[ms]').astype(np.int64)
+
+        # float32 only if lossless: values read back are then exactly those retrieved from GEE
+        values = df_band[band].to_numpy(dtype=np.float64)
+        values_float32 = values.astype(np.float32)
+        if np.array_equal(values_float32.astype(np.float64), values, equal_nan=True):
+            values = values_float32
+
+        # numpy.savez_compressed
+        # https://numpy.org/doc/stable/reference/generated/numpy.savez_compressed.html
+        buffer = io.BytesIO()
+        np.savez_compressed(buffer, time=time, values=values)
+        content = buffer.getvalue()
+    else:
+        content = df_band[['datetime', band]].to_csv(index=False, header=True).encode('utf-8')
+
+    # content hashed in memory: the file is not read back
+    with open(file_path + '.tmp', 'wb') as file:
+        file.write(content)
+    os.replace(file_path + '.tmp', file_path)
+    return hashlib.sha256(content).hexdigest()
+
+
+def read_chunk_file(file_path, band):
+    # 'datetime' column is returned as datetime64, whatever the file format
+    if file_path.endswith('.npz'):
+        with np.load(file_path) as data:
+            return pd.DataFrame({'datetime': pd.to_datetime(data['time'], unit='ms'),
+                                 band: data['values'].astype(np.float64)})
+
+    # round_trip: values are read back exactly as they were written
+    df_band = pd.read_csv(file_path, float_precision='round_trip')
+    df_band['datetime'] = pd.to_datetime(df_band['datetime'])
+    return df_band
+
+
+def save_chunk_list(location_chunk_list, collection, list_of_bands, date_from, date_to, scale=None):
+    # chunks of several locations, list of (location_key, df_chunk): one file per location and band, then one catalog
+    # row per file, all rows in one transaction (see util/raw_data_catalog_util.py)
+    row_list = []
+    for location_key, df_chunk in location_chunk_list:
+        for band in list_of_bands:
+            chunk_directory = get_chunk_directory(location_key, collection, band)
+            os.makedirs(chunk_directory, exist_ok=True)
+            file_path = get_chunk_file_path(location_key, collection, band, date_from, date_to, raw_data_file_format)
+            row_list.append({'file_path': file_path, 'location_key': location_key, 'collection': collection,
+                             'band': band, 'scale': scale, 'from_date': date_from.isoformat(),
+                             'to_date': date_to.isoformat(), 'row_count': len(df_chunk),
+                             'checksum': write_chunk_file(file_path, df_chunk, band), 'fetch_time': get_fetch_time()})
+    record_chunk_list(row_list)
+
+
+def save_chunk(location_key, collection, df_chunk, list_of_bands, date_from, date_to, scale=None):
+    # one file per band
+    save_chunk_list([(location_key, df_chunk)], collection, list_of_bands, date_from, date_to, scale)
+
+
+def get_chunk_list_dict(location_key_list, collection, list_of_bands):
+    # cached chunks of bands of locations: {(location_key, band): chunk list (see get_chunk_list)}
+    # coverage checks: from the raw data catalog (single query), or from the cache directory if there is no catalog
+    if is_catalog_available():
+        return get_catalog_chunk_dict(location_key_list, collection, list_of_bands)
+    return {(location_key, band): get_chunk_list(location_key, collection, band)
+            for location_key in location_key_list for band in list_of_bands}
+
+
+def load_band(location_key, collection, band, from_date, to_date, chunk_reducer=None):
+    # assemble [from_date, to_date) of a band from its cached chunks; overlapping chunks are read only once
+    # chunk_reducer (optional): applied to each chunk as it is read (e.g. daily values): the full record of the band is
+    # never held in memory, only one chunk and the reduced values
+    df_list = []
+    covered_until = from_date
+    for chunk_from_date, chunk_to_date, file_path in get_chunk_list(location_key, collection, band):
+        if chunk_to_date <= covered_until or chunk_from_date >= to_date:
+            continue
+        with measure_span('cache_read'):
+            df_chunk = read_chunk_file(file_path, band)
+
+        # keep records of the chunk not read yet, and inside the requested period
+        lower_date_boundary = max(covered_until, chunk_from_date)
+        upper_date_boundary = min(to_date, chunk_to_date)
+        if chunk_from_date < lower_date_boundary or upper_date_boundary < chunk_to_date:
+            df_chunk = df_chunk[(df_chunk['datetime'] >= pd.Timestamp(lower_date_boundary)) & (
+                    df_chunk['datetime'] < pd.Timestamp(upper_date_boundary))]
+
+        # chunks start and end at midnight: a day is never split over two chunks
+        if chunk_reducer is not None:
+            with measure_span('reduce'):
+                df_chunk = chunk_reducer(df_chunk)
+
+        df_list.append(df_chunk)
+        covered_until = max(covered_until, chunk_to_date)
+
+    if len(df_list) == 0:
+        return None
+
+    return pd.concat(df_list, axis=0, ignore_index=True)
+
+
+def load_bands(location_key, collection, list_of_bands, from_date, to_date, chunk_reducer=None):
+    # all bands of a retrieval come from the same getRegion calls: join them on their common datetime column
+    # (chunks of each band are reduced first, if a chunk reducer is given)
+    df_result = None
+    for band in list_of_bands:
+        df_band = load_band(location_key, collection, band, from_date, to_date, chunk_reducer)
+        if df_band is None:
+            return None
+        if df_result is None:
+            df_result = df_band
+        else:
+            df_result = df_result.merge(df_band, on='datetime', how='inner')
+    return df_result
+
+
+def get_missing_raw_data_list(weather_stations, collection_band_dict, from_date, to_date):
+    # cache coverage of a run, resolved up front: raw data needed by the weather stations ([lon, lat, ...]) and not
+    # cached yet, list of (pixel_key, collection, band, list of missing intervals), each pixel once
+    missing_raw_data_list = []
+    for collection, list_of_bands in collection_band_dict.items():
+        pixel_key_list = []
+        for weather_station in weather_stations:
+            pixel_key = get_pixel_key(weather_station[0], weather_station[1], collection)
+            if pixel_key not in pixel_key_list:
+                pixel_key_list.append(pixel_key)
+        chunk_list_dict = get_chunk_list_dict(pixel_key_list, collection, list_of_bands)
+        for pixel_key in pixel_key_list:
+            for band in list_of_bands:
+                missing_interval_list = get_missing_intervals(chunk_list_dict[(pixel_key, band)], from_date, to_date)
+                if len(missing_interval_list) > 0:
+                    missing_raw_data_list.append((pixel_key, collection, band, missing_interval_list))
+    return missing_raw_data_list
+
+
+def migrate_legacy_raw_data_files():
+    # split whole-range files of the legacy layout into per-band chunk files of the current layout
+    if not os.path.exists(gee_raw_data_directory):
+        return
+
+    for file_name in sorted(os.listdir(gee_raw_data_directory)):
+        match = legacy_file_name_pattern.match(file_name)
+        if match is None:
+            continue
+        location_key, date_from_string, date_to_string, category = match.groups()
+        if category not in raw_data_category_dict:
+            continue
+        collection, list_of_bands = raw_data_category_dict[category]
+
+        date_from = datetime.datetime.strptime(date_from_string, '%Y-%m-%d').date()
+        date_to = datetime.datetime.strptime(date_to_string, '%Y-%m-%d').date()
+
+        # weather station to its pixel: bands already cached by another weather station of the pixel are skipped
+        pixel_key = get_pixel_key(*get_location_from_key(location_key), collection)
+        list_of_missing_bands = [band for band in list_of_bands if len(get_missing_intervals(
+            get_chunk_list(pixel_key, collection, band), date_from, date_to)) > 0]
+
+        # legacy file is parsed as it used to be parsed on a cache hit: chunk files then hold the same values
+        legacy_file_path = gee_raw_data_directory + '/' + file_name
+        if len(list_of_missing_bands) > 0:
+            save_chunk(pixel_key, collection, pd.read_csv(legacy_file_path), list_of_missing_bands, date_from, date_to)
+        os.remove(legacy_file_path)
+        print(legacy_file_path + ' migrated to ' + gee_raw_data_directory + '/' + pixel_key)
+
+    migrate_station_raw_data_files()
+
+
+def migrate_station_raw_data_files():
+    # chunk files cached by weather station lon/lat (former layout) are moved to the pixel of their collection;
+    # chunks already cached by another weather station of the same pixel are removed
+    collection_directory_dict = {collection.replace('/', '_'): collection for collection in collection_grid_dict}
+    moved_file_count = 0
+    is_changed = False
+
+    for location_key in sorted(os.listdir(gee_raw_data_directory)):
+        location_directory = gee_raw_data_directory + '/' + location_key
+        if not os.path.isdir(location_directory):
+            continue
+        for collection_directory in sorted(os.listdir(location_directory)):
+            if collection_directory not in collection_directory_dict:
+                continue
+            collection = collection_directory_dict[collection_directory]
+            pixel_key = get_pixel_key(*get_location_from_key(location_key), collection)
+            if pixel_key == location_key:
+                continue
+
+            for band in sorted(os.listdir(location_directory + '/' + collection_directory)):
+                for chunk_from_date, chunk_to_date, file_path in get_chunk_list(location_key, collection, band):
+                    if len(get_missing_intervals(get_chunk_list(pixel_key, collection, band), chunk_from_date,
+                                                 chunk_to_date)) > 0:
+                        os.makedirs(get_chunk_directory(pixel_key, collection, band), exist_ok=True)
+                        os.replace(file_path, get_chunk_directory(pixel_key, collection, band) + '/' +
+                                   os.path.basename(file_path))
+                        moved_file_count += 1
+                    else:
+                        os.remove(file_path)
+                    is_changed = True
+
+            # empty directories of the weather station are removed
+            for band in os.listdir(location_directory + '/' + collection_directory):
+                if len(os.listdir(location_directory + '/' + collection_directory + '/' + band)) == 0:
+                    os.rmdir(location_directory + '/' + collection_directory + '/' + band)
+            if len(os.listdir(location_directory + '/' + collection_directory)) == 0:
+                os.rmdir(location_directory + '/' + collection_directory)
+        if len(os.listdir(location_directory)) == 0:
+            os.rmdir(location_directory)
+
+    if moved_file_count > 0:
+        print(str(moved_file_count) + ' raw data files moved to the pixel of their collection')
+    if is_changed and is_catalog_available():
+        rebuild_raw_data_catalog()
+
+
+def convert_raw_data_files(file_format):
+    # one-shot conversion of all chunk files of the cache into the given format
+    global raw_data_file_format
+    raw_data_file_format = file_format
+
+    # legacy files are migrated first, directly into the given format
+    migrate_legacy_raw_data_files()
+
+    converted_file_count = 0
+    for directory_path, _, file_name_list in os.walk(gee_raw_data_directory):
+        for file_name in sorted(file_name_list):
+            file_name_part, file_extension = os.path.splitext(file_name)
+            if file_extension[1:] not in raw_data_file_format_list or file_extension[1:] == file_format:
+                continue
+            # directory path: GEE_RAW_DATA/<location>/<collection>/<band>
+            band = os.path.basename(directory_path)
+            file_path = directory_path.replace(os.sep, '/') + '/' + file_name
+            write_chunk_file(directory_path.replace(os.sep, '/') + '/' + file_name_part + '.' + file_format,
+                             read_chunk_file(file_path, band), band)
+            os.remove(file_path)
+            converted_file_count += 1
+
+    print(str(converted_file_count) + ' raw data files converted to ' + file_format + ' format')
+    if converted_file_count > 0 and is_catalog_available():
+        rebuild_raw_data_catalog()
+
+
+def get_catalog_row(file_path, location_key, collection, band):
+    # catalog row of a chunk file already on disk: scale unknown, modification time as fetch time
+    file_name_part = os.path.splitext(os.path.basename(file_path))[0]
+    date_from_string, date_to_string = file_name_part.split('_')
+    sha256 = hashlib.sha256()
+    with open(file_path, 'rb') as file:
+        for block in iter(lambda: file.read(1024 * 1024), b''):
+            sha256.update(block)
+    if file_path.endswith('.npz'):
+        with np.load(file_path) as data:
+            row_count = len(data['time'])
+    else:
+        row_count = len(pd.read_csv(file_path, usecols=['datetime']))
+    return {'file_path': file_path, 'location_key': location_key, 'collection': collection, 'band': band,
+            'scale': None, 'from_date': date_from_string, 'to_date': date_to_string, 'row_count': row_count,
+            'checksum': sha256.hexdigest(), 'fetch_time': get_fetch_time(os.path.getmtime(file_path))}
+
+
+def rebuild_raw_data_catalog():
+    # catalog rebuilt from the chunk files of the cache directory (GEE_RAW_DATA/<location>/<collection>/<band>/...),
+    # e.g. after files were added or removed by hand; scales of former rows are kept
+    # collection names from directory names: collections of the project, other directories are taken as they are
+    collection_list = [collection for collection, _ in raw_data_category_dict.values()] + list(collection_grid_dict)
+    collection_directory_dict = {collection.replace('/', '_'): collection
+                                 for collection in collection_list + [collection + bilinear_collection_suffix
+                                                                      for collection in collection_list]}
+    former_scale_dict = get_catalog_scale_dict() if is_catalog_available() else {}
+
+    row_list = []
+    if os.path.exists(gee_raw_data_directory):
+        for location_key in sorted(os.listdir(gee_raw_data_directory)):
+            location_directory = gee_raw_data_directory + '/' + location_key
+            if not os.path.isdir(location_directory):
+                continue
+            for collection_directory in sorted(os.listdir(location_directory)):
+                collection = collection_directory_dict.get(collection_directory, collection_directory)
+                for band in sorted(os.listdir(location_directory + '/' + collection_directory)):
+                    for _, _, file_path in get_chunk_list(location_key, collection, band):
+                        row = get_catalog_row(file_path, location_key, collection, band)
+                        row['scale'] = former_scale_dict.get((file_path, row['checksum']))
+                        row_list.append(row)
+    else:
+        os.makedirs(gee_raw_data_directory)
+
+    replace_catalog(row_list)
+    print(get_catalog_file_path() + ' rebuilt: ' + str(len(row_list)) + ' raw data file(s)')
+
+
+def open_raw_data_catalog():
+    # catalog built from the cache directory on first use; afterwards, chunk files are recorded as they are saved
+    if not is_catalog_available():
+        rebuild_raw_data_catalog()
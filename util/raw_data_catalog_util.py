@@ -0,0 +1,146 @@
+"""
+Author........... Gabriel Böhnke
+University....... UCLouvain, Faculty of bioscience engineering
+Email............ gabriel.bohnke@student.uclouvain.be
+
+Description...... raw data catalog util functions: SQLite index of the chunk files of GEE_RAW_DATA
+Version.......... 1.00
+Last changed on.. 17.10.2026
+"""
+
+import os
+import sqlite3
+import datetime
+import threading
+from contextlib import closing
+
+# one row per chunk file of the cache (see raw_data_cache_util.get_chunk_file_path): location, collection, band,
+# scale in meters (None: unknown, e.g. migrated or rebuilt rows), period [from_date, to_date), records, SHA-256 of the
+# file and fetch time (UTC; modification time of the file for rebuilt rows)
+# coverage of locations is answered by a single query, instead of listing thousands of directories
+# sqlite3: https://docs.python.org/3/library/sqlite3.html
+# in the cache directory (see get_catalog_file_path)
+catalog_file_name = 'raw_data_catalog.sqlite'
+catalog_column_list = ['file_path', 'location_key', 'collection', 'band', 'scale', 'from_date', 'to_date',
+                       'row_count', 'checksum', 'fetch_time']
+
+# one writer at a time in this process (other processes, e.g. shards sharing the cache, wait for the lock of SQLite)
+catalog_lock = threading.Lock()
+
+# seconds waited for the lock of another process
+catalog_timeout = 60
+
+
+def get_catalog_file_path():
+    # e.g. GEE_RAW_DATA/raw_data_catalog.sqlite; imported here: raw_data_cache_util imports this module
+    from util.raw_data_cache_util import gee_raw_data_directory
+    return gee_raw_data_directory + '/' + catalog_file_name
+
+
+def is_catalog_available():
+    # the catalog is created by raw_data_cache_util.rebuild_raw_data_catalog only: a catalog missing some chunk files
+    # would report them missing
+    return os.path.exists(get_catalog_file_path())
+
+
+def get_catalog_connection():
+    # write-ahead log: readers are not blocked by a writer; synchronous NORMAL: a power loss may lose the last rows,
+    # never corrupt the catalog (chunk files of lost rows are fetched again)
+    # https://www.sqlite.org/wal.html
+    connection = sqlite3.connect(get_catalog_file_path(), timeout=catalog_timeout)
+    connection.execute('PRAGMA journal_mode=WAL')
+    connection.execute('PRAGMA synchronous=NORMAL')
+    connection.execute('CREATE TABLE IF NOT EXISTS chunk (file_path TEXT PRIMARY KEY, location_key TEXT NOT NULL, '
+                       'collection TEXT NOT NULL, band TEXT NOT NULL, scale INTEGER, from_date TEXT NOT NULL, '
+                       'to_date TEXT NOT NULL, row_count INTEGER NOT NULL, checksum TEXT NOT NULL, '
+                       'fetch_time TEXT NOT NULL)')
+    connection.execute('CREATE INDEX IF NOT EXISTS chunk_location ON chunk (collection, band, location_key)')
+    return connection
+
+
+def get_fetch_time(timestamp=None):
+    # e.g. 2026-10-17T09:41:07+00:00 (now, or a POSIX timestamp)
+    if timestamp is None:
+        return datetime.datetime.now(datetime.timezone.utc).isoformat(timespec='seconds')
+    return datetime.datetime.fromtimestamp(timestamp, datetime.timezone.utc).isoformat(timespec='seconds')
+
+
+def record_chunk_list(row_list):
+    # rows of chunk files once on disk (a chunk file without row is fetched again: never the other way round),
+    # all rows of a chunk in one transaction; nothing is recorded if there is no catalog
+    # row: dict of catalog_column_list
+    if not is_catalog_available():
+        return
+    with catalog_lock, closing(get_catalog_connection()) as connection, connection:
+        connection.executemany('INSERT OR REPLACE INTO chunk VALUES (' + ', '.join('?' * len(catalog_column_list)) +
+                               ')', [[row[column] for column in catalog_column_list] for row in row_list])
+
+
+def replace_catalog(row_list):
+    # whole catalog replaced in one transaction (e.g. rebuilt from the cache directory): a query never sees a
+    # partial catalog
+    with catalog_lock, closing(get_catalog_connection()) as connection, connection:
+        connection.execute('DELETE FROM chunk')
+        connection.executemany('INSERT INTO chunk VALUES (' + ', '.join('?' * len(catalog_column_list)) + ')',
+                               [[row[column] for column in catalog_column_list] for row in row_list])
+
+
+def get_catalog_chunk_dict(location_key_list, collection, list_of_bands):
+    # cached chunks of bands of locations: {(location_key, band): list of (from_date, to_date, file_path)}, sorted by
+    # FROM-date, as raw_data_cache_util.get_chunk_list; a single query whatever the number of locations
+    # rows of chunk files no longer on disk (e.g. removed by hand) are dropped: their periods are fetched again, the
+    # catalog never claims data that load_band cannot read
+    chunk_dict = {(location_key, band): [] for location_key in location_key_list for band in list_of_bands}
+    missing_file_path_list = []
+    with closing(get_catalog_connection()) as connection:
+        cursor = connection.execute('SELECT location_key, band, from_date, to_date, file_path FROM chunk '
+                                    'WHERE collection = ? AND band IN (' + ', '.join('?' * len(list_of_bands)) +
+                                    ') ORDER BY from_date, to_date', [collection, *list_of_bands])
+        for location_key, band, from_date_string, to_date_string, file_path in cursor:
+            if (location_key, band) not in chunk_dict:
+                continue
+            if not os.path.exists(file_path):
+                missing_file_path_list.append(file_path)
+                continue
+            chunk_dict[(location_key, band)].append(
+                (datetime.date.fromisoformat(from_date_string), datetime.date.fromisoformat(to_date_string), file_path))
+    if len(missing_file_path_list) > 0:
+        remove_chunk_list(missing_file_path_list)
+        print(str(len(missing_file_path_list)) + ' raw data file(s) of the catalog not found: fetched again')
+    return chunk_dict
+
+
+def remove_chunk_list(file_path_list):
+    # rows of chunk files removed from the catalog, in one transaction
+    with catalog_lock, closing(get_catalog_connection()) as connection, connection:
+        connection.executemany('DELETE FROM chunk WHERE file_path = ?', [[file_path] for file_path in file_path_list])
+
+
+def get_catalog_scale_dict():
+    # scale of each chunk file: {(file_path, checksum): scale}
+    with closing(get_catalog_connection()) as connection:
+        return {(file_path, checksum): scale for file_path, checksum, scale
+                in connection.execute('SELECT file_path, checksum, scale FROM chunk')}
+
+
+def get_catalog_location_key_list():
+    with closing(get_catalog_connection()) as connection:
+        return [location_key for location_key, in
+                connection.execute('SELECT DISTINCT location_key FROM chunk ORDER BY location_key')]
+
+
+def get_catalog_summary(location_key_list=None):
+    # cached data by collection and band (of the given locations, None: all): list of (collection, band, locations,
+    # files, first FROM-date, last TO-date, records)
+    # locations loaded into a temporary table and joined: any number of locations (a parameter per location would
+    # exceed the limit of bound parameters, 999 before SQLite 3.32)
+    # https://www.sqlite.org/limits.html#max_variable_number
+    query = ('SELECT collection, band, COUNT(DISTINCT chunk.location_key), COUNT(*), MIN(from_date), MAX(to_date), '
+             'SUM(row_count) FROM chunk')
+    with closing(get_catalog_connection()) as connection:
+        if location_key_list is not None:
+            connection.execute('CREATE TEMP TABLE summary_location (location_key TEXT PRIMARY KEY)')
+            connection.executemany('INSERT OR IGNORE INTO summary_location VALUES (?)',
+                                   [[location_key] for location_key in location_key_list])
+            query += ' JOIN summary_location ON summary_location.location_key = chunk.location_key'
+        return connection.execute(query + ' GROUP BY collection, band ORDER BY collection, band').fetchall()
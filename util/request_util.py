@@ -0,0 +1,136 @@
+"""
+Author........... Gabriel Böhnke
+University....... UCLouvain, Faculty of bioscience engineering
+Email............ gabriel.bohnke@student.uclouvain.be
+
+Description...... GEE request util functions: concurrency limit, rate limit, retry with backoff, timing
+Version.......... 1.00
+Last changed on.. 17.10.2026
+"""
+
+import time
+import random
+import threading
+
+# maximum number of getInfo() calls in flight at the same time, over all weather stations and variables
+max_concurrent_requests = 8
+cloud_request_semaphore = threading.BoundedSemaphore(max_concurrent_requests)
+
+# token bucket: at most max_requests_per_second requests started per second on average, bursts of request_burst_size
+# GEE quotas: https://developers.google.com/earth-engine/guides/usage
+# https://en.wikipedia.org/wiki/Token_bucket
+max_requests_per_second = 10
+request_burst_size = 10
+token_count = request_burst_size
+token_refill_time = time.monotonic()
+token_lock = threading.Lock()
+
+# exponential backoff with jitter, for errors worth retrying as they are (throttling, transient server errors)
+# https://aws.amazon.com/blogs/architecture/exponential-backoff-and-jitter/
+max_retry_count = 5
+initial_backoff_in_seconds = 2
+max_backoff_in_seconds = 120
+retryable_error_message_list = ['too many concurrent aggregations', 'too many requests', 'quota exceeded',
+                                'rate limit', '429', 'internal error', 'service unavailable', '503',
+                                'deadline exceeded', 'connection reset']
+
+# timing of requests: count, retries, failures, total and max duration (seconds)
+request_statistics_dict = {'requests': 0, 'retries': 0, 'failures': 0, 'total_time': 0.0, 'max_time': 0.0}
+request_statistics_lock = threading.Lock()
+
+
+def set_max_concurrent_requests(max_requests):
+    global max_concurrent_requests, cloud_request_semaphore
+    max_concurrent_requests = max_requests
+    cloud_request_semaphore = threading.BoundedSemaphore(max_requests)
+
+
+def set_request_rate(requests_per_second, burst_size):
+    global max_requests_per_second, request_burst_size, token_count
+    with token_lock:
+        max_requests_per_second = requests_per_second
+        request_burst_size = burst_size
+        token_count = min(token_count, burst_size)
+
+
+def acquire_request_token():
+    # wait until the token bucket holds a token, then take it
+    global token_count, token_refill_time
+    while True:
+        with token_lock:
+            current_time = time.monotonic()
+            token_count = min(request_burst_size,
+                              token_count + (current_time - token_refill_time) * max_requests_per_second)
+            token_refill_time = current_time
+            if token_count >= 1:
+                token_count -= 1
+                return
+            waiting_time = (1 - token_count) / max_requests_per_second
+        time.sleep(waiting_time)
+
+
+def is_retryable_error(exception):
+    # throttling and transient errors; errors caused by the request itself (e.g. too many values, memory limit) are
+    # not retried as they are: the caller reduces the chunk size
+    if isinstance(exception, (ConnectionError, TimeoutError)):
+        return True
+    message = str(exception).lower()
+    return any(retryable_error_message in message for retryable_error_message in retryable_error_message_list)
+
+
+def get_backoff_in_seconds(attempt):
+    # full jitter: random waiting time between 0 and the exponential backoff
+    return random.uniform(0, min(max_backoff_in_seconds, initial_backoff_in_seconds * 2 ** attempt))
+
+
+def call_with_retry(function, description):
+    # function: request without argument, e.g. lambda: selection.getRegion(geometry, scale).getInfo()
+    # returns (result, duration in seconds of the successful attempt); raises the last exception if the request
+    # fails for good (retries exhausted, or error not worth retrying)
+    attempt = 0
+    while True:
+        acquire_request_token()
+        with cloud_request_semaphore:
+            start_time = time.monotonic()
+            try:
+                result = function()
+                exception = None
+            except Exception as request_exception:
+                exception = request_exception
+            duration = time.monotonic() - start_time
+
+        with request_statistics_lock:
+            request_statistics_dict['requests'] += 1
+            request_statistics_dict['total_time'] += duration
+            request_statistics_dict['max_time'] = max(request_statistics_dict['max_time'], duration)
+            if exception is not None:
+                if is_retryable_error(exception) and attempt < max_retry_count:
+                    request_statistics_dict['retries'] += 1
+                else:
+                    request_statistics_dict['failures'] += 1
+
+        if exception is None:
+            return result, duration
+        if not is_retryable_error(exception) or attempt >= max_retry_count:
+            raise exception
+
+        backoff_in_seconds = get_backoff_in_seconds(attempt)
+        attempt += 1
+        print(description, "- retry", attempt, "of", max_retry_count, "in {:.1f} s:".format(backoff_in_seconds),
+              exception)
+        time.sleep(backoff_in_seconds)
+
+
+def get_request_statistics():
+    with request_statistics_lock:
+        return dict(request_statistics_dict)
+
+
+def print_request_statistics():
+    with request_statistics_lock:
+        if request_statistics_dict['requests'] == 0:
+            return
+        mean_time = request_statistics_dict['total_time'] / request_statistics_dict['requests']
+        print('GEE requests:', request_statistics_dict['requests'], '- retries:', request_statistics_dict['retries'],
+              '- failures:', request_statistics_dict['failures'], '- mean time: {:.2f} s'.format(mean_time),
+              '- max time: {:.2f} s'.format(request_statistics_dict['max_time']))
@@ -0,0 +1,136 @@
+"""
+Author........... Gabriel Böhnke
+University....... UCLouvain, Faculty of bioscience engineering
+Email............ gabriel.bohnke@student.uclouvain.be
+
+Description...... shard util functions: weather stations of a shard, merge of shard output directories
+Version.......... 1.00
+Last changed on.. 17.10.2026
+"""
+
+import os
+import zlib
+import shutil
+import pandas as pd
+from util.raw_data_cache_util import get_location_key
+from util.weather_generator_util import generator_column_list
+from util.swat_file_util import station_file_name, generator_file_name, cli_file_extension_list, cli_file_second_row
+
+# a shard is given as <index>/<count>, index from 0 to count - 1 (e.g. index of a job array on a batch cluster)
+# range: contiguous block of weather stations; hash: weather stations spread by location (stable across runs)
+shard_method_list = ['range', 'hash']
+
+
+def parse_shard(shard_string):
+    # example: '2/8' -> (2, 8)
+    index_string, count_string = shard_string.split('/')
+    shard_index, shard_count = int(index_string), int(count_string)
+    if shard_count < 1 or not 0 <= shard_index < shard_count:
+        raise ValueError('shard index must be from 0 to ' + str(shard_count - 1) + ': ' + shard_string)
+    return shard_index, shard_count
+
+
+def get_shard_wgn_id_list(weather_stations, shard_index, shard_count, shard_method):
+    # weather station IDs (1 for the 1st weather station of the whole list) of a shard: IDs, file names and
+    # weather generator rows of a shard are those of a run over all weather stations
+    wgn_id_list = list(range(1, len(weather_stations) + 1))
+    if shard_method == 'range':
+        # blocks of equal size (+/- 1)
+        return wgn_id_list[len(weather_stations) * shard_index // shard_count:
+                           len(weather_stations) * (shard_index + 1) // shard_count]
+    if shard_method == 'hash':
+        # crc32 of the location key: unlike hash(), the same on every node and every run
+        # https://docs.python.org/3/library/zlib.html#zlib.crc32
+        return [wgn_id for wgn_id, weather_station in zip(wgn_id_list, weather_stations)
+                if zlib.crc32(get_location_key(weather_station[0], weather_station[1]).encode()) % shard_count ==
+                shard_index]
+    raise ValueError('unknown shard method: ' + shard_method + ' (expected: ' + ', '.join(shard_method_list) + ')')
+
+
+def read_station_file(file_path):
+    # weather stations of a csv file with columns lon, lat, elev (other columns ignored)
+    # example of row: 9.4573,36.4759,114
+    # column by column: integer elevations stay integers
+    df_stations = pd.read_csv(file_path, float_precision='round_trip')
+    return [list(weather_station) for weather_station in zip(df_stations['lon'].tolist(), df_stations['lat'].tolist(),
+                                                             df_stations['elev'].tolist())]
+
+
+def read_cli_file(file_path):
+    # weather file names of a CLI-file (first 2 rows skipped)
+    if not os.path.exists(file_path):
+        return []
+    with open(file_path, 'r', encoding='utf-8') as file:
+        return file.read().splitlines()[2:]
+
+
+def copy_directory_files(source_directory, target_directory, excluded_extension_list):
+    if not os.path.exists(source_directory):
+        return 0
+    if not os.path.exists(target_directory):
+        os.makedirs(target_directory)
+    file_count = 0
+    for file_name in sorted(os.listdir(source_directory)):
+        if file_name.split('.')[-1] not in excluded_extension_list:
+            shutil.copyfile(source_directory + '/' + file_name, target_directory + '/' + file_name)
+            file_count += 1
+    return file_count
+
+
+def merge_shard_directories(shard_directory_list, output_directory):
+    # SWAT+ input set of all weather stations, from output directories of shards: station file and weather generator
+    # file sorted by weather station ID, CLI-files listing weather files in weather station order, weather files
+    # copied; the result does not depend on the order of shard directories
+    # float_precision='round_trip': values written again exactly as read
+    # https://pandas.pydata.org/docs/reference/api/pandas.read_csv.html
+    df_stations = pd.concat([pd.read_csv(shard_directory + '/' + station_file_name, float_precision='round_trip')
+                             for shard_directory in shard_directory_list], axis=0, ignore_index=True)
+    duplicate_id_list = sorted(set(df_stations.loc[df_stations['id'].duplicated(), 'id']))
+    if len(duplicate_id_list) > 0:
+        raise ValueError('weather station(s) in more than one shard: ' + ', '.join(map(str, duplicate_id_list)))
+    df_stations = df_stations.sort_values('id', kind='stable').reset_index(drop=True)
+
+    missing_id_list = sorted(set(range(1, df_stations['id'].max() + 1)) - set(df_stations['id']))
+    if len(missing_id_list) > 0:
+        print('WARNING: weather station ID(s) missing from shards:', ', '.join(map(str, missing_id_list)))
+
+    df_generator_list = [pd.read_csv(shard_directory + '/' + generator_file_name, float_precision='round_trip')
+                         for shard_directory in shard_directory_list
+                         if os.path.exists(shard_directory + '/' + generator_file_name)]
+
+    weather_station_directory = output_directory + '/WEATHER_STATIONS'
+    if not os.path.exists(weather_station_directory):
+        os.makedirs(weather_station_directory)
+
+    file_path = output_directory + '/' + station_file_name
+    df_stations.to_csv(file_path, encoding='utf-8', index=False, header=True)
+    print(file_path + ' saved')
+
+    if len(df_generator_list) > 0:
+        df_generator_data = pd.concat(df_generator_list, axis=0, ignore_index=True).sort_values(
+            ['wgn_id', 'month'], kind='stable')
+        df_generator_data = df_generator_data[[column for column in generator_column_list
+                                               if column in df_generator_data.columns]]
+        file_path = output_directory + '/' + generator_file_name
+        df_generator_data.to_csv(file_path, encoding='utf-8', index=False, header=True)
+        print(file_path + ' saved')
+
+    # weather files and optional xlsx files: file names hold the weather station ID, no file is renamed
+    file_count = 0
+    for shard_directory in shard_directory_list:
+        file_count += copy_directory_files(shard_directory + '/WEATHER_STATIONS', weather_station_directory,
+                                           ['cli', 'part'])
+        copy_directory_files(shard_directory + '/OPTIONAL_XLSX_FILES', output_directory + '/OPTIONAL_XLSX_FILES', [])
+    print(str(file_count) + ' weather file(s) copied to ' + weather_station_directory)
+
+    # CLI-files: weather files in weather station order
+    wgn_id_dict = dict(zip(df_stations['name'], df_stations['id']))
+    for file_extension in cli_file_extension_list:
+        file_name_list = sorted([file_name for shard_directory in shard_directory_list
+                                 for file_name in read_cli_file(shard_directory + '/WEATHER_STATIONS/' +
+                                                                file_extension + '.cli')],
+                                key=lambda file_name: wgn_id_dict[file_name.rsplit('.', 1)[0]])
+        file_path = weather_station_directory + '/' + file_extension + '.cli'
+        with open(file_path, 'w', encoding='utf-8') as file:
+            file.writelines(row + '\n' for row in [file_extension + '.cli', cli_file_second_row, *file_name_list])
+        print(file_path + ' saved')
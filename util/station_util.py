@@ -0,0 +1,211 @@
+"""
+Author........... Gabriel Böhnke
+University....... UCLouvain, Faculty of bioscience engineering
+Email............ gabriel.bohnke@student.uclouvain.be
+
+Description...... weather station util functions: gridded basin mode (virtual weather stations of a bounding box or
+                  polygon), batched and cached elevations, station registry
+Version.......... 1.00
+Last changed on.. 17.10.2026
+"""
+
+import os
+import json
+import math
+import numpy as np
+import pandas as pd
+from util.raw_data_cache_util import gee_raw_data_directory, collection_grid_dict, get_location_key
+from util.google_earth_engine_util import get_elevation_data
+from util.chunk_size_util import get_region_max_values, get_region_fixed_column_count
+
+# DEM sampled for elevations of virtual weather stations (Copernicus GLO-30, about 30 m)
+# https://developers.google.com/earth-engine/datasets/catalog/COPERNICUS_DEM_GLO30
+dem_collection = 'COPERNICUS/DEM/GLO30'
+dem_band = 'DEM'
+dem_scale = 30
+
+# points sampled by the same getRegion request: 1 row per point (DEM tiles mosaicked, see
+# google_earth_engine_util.get_elevation_data), of the fixed columns and the DEM band, below the values limit of GEE
+max_points_per_elevation_request = get_region_max_values // (get_region_fixed_column_count + 1)
+
+# elevation cache: {location key: elevation in meters}, one JSON file per DEM
+# example: GEE_RAW_DATA/elevation_COPERNICUS_DEM_GLO30.json
+elevation_file_path = gee_raw_data_directory + '/elevation_' + dem_collection.replace('/', '_') + '.json'
+
+# station registry: one array per column, sorted by weather station ID, instead of a list per weather station
+# (thousands of virtual weather stations); rain years are the same for all weather stations of a run
+station_registry_dict = {'id': np.array([], dtype=np.int64), 'lon': np.array([]), 'lat': np.array([]),
+                         'elev': np.array([], dtype=np.int64)}
+station_rain_years = 0
+
+
+def get_grid_coordinate_array(min_coordinate, max_coordinate, pixel_size, pixel_offset):
+    # centers of the pixels of a grid (pixel size, offset of pixel edges) between min and max, rounded as location keys
+    # rounding before ceil/floor: a center on the boundary (e.g. 9.35 / 0.1) stays inside
+    first_index = math.ceil(round((min_coordinate - pixel_offset) / pixel_size - 0.5, 9))
+    last_index = math.floor(round((max_coordinate - pixel_offset) / pixel_size - 0.5, 9))
+    return np.round(pixel_offset + (np.arange(first_index, last_index + 1) + 0.5) * pixel_size, 5)
+
+
+def read_polygon_file(file_path):
+    # rings of a GeoJSON polygon (Polygon or MultiPolygon, as geometry, feature or feature collection), lon/lat
+    # in degrees: list of arrays of [lon, lat], holes included
+    # https://datatracker.ietf.org/doc/html/rfc7946#section-3.1.6
+    with open(file_path, 'r', encoding='utf-8') as file:
+        geojson = json.load(file)
+    if geojson['type'] == 'FeatureCollection':
+        geometry_list = [feature['geometry'] for feature in geojson['features']]
+    elif geojson['type'] == 'Feature':
+        geometry_list = [geojson['geometry']]
+    else:
+        geometry_list = [geojson]
+
+    ring_list = []
+    for geometry in geometry_list:
+        if geometry['type'] == 'Polygon':
+            polygon_list = [geometry['coordinates']]
+        elif geometry['type'] == 'MultiPolygon':
+            polygon_list = geometry['coordinates']
+        else:
+            raise ValueError('GeoJSON geometry must be a Polygon or a MultiPolygon: ' + geometry['type'])
+        ring_list += [np.array(ring, dtype=np.float64)[:, :2] for polygon in polygon_list for ring in polygon]
+    return ring_list
+
+
+def is_inside_polygon(lon_array, lat_array, ring_list):
+    # even-odd rule: a point is inside if a ray from it crosses the rings an odd number of times (holes excluded)
+    # https://en.wikipedia.org/wiki/Point_in_polygon#Ray_casting_algorithm
+    is_inside = np.zeros(len(lon_array), dtype=bool)
+    for ring in ring_list:
+        for (lon_1, lat_1), (lon_2, lat_2) in zip(ring, np.roll(ring, -1, axis=0)):
+            if lat_1 == lat_2:
+                continue
+            is_crossing = ((lat_1 > lat_array) != (lat_2 > lat_array)) & (
+                    lon_array < lon_1 + (lat_array - lat_1) * (lon_2 - lon_1) / (lat_2 - lat_1))
+            is_inside ^= is_crossing
+    return is_inside
+
+
+def get_grid_location_array(bounding_box=None, ring_list=None, spacing=None, collection=None):
+    # virtual weather stations: one per grid cell of a bounding box [lon_min, lat_min, lon_max, lat_max], or of the
+    # bounding box of a polygon, keeping cells whose center is inside
+    # grid: cells of <spacing> degrees from the south-west corner, or native pixels of a collection (see
+    # raw_data_cache_util.collection_grid_dict: one weather station per pixel of source data)
+    # returns (lon array, lat array), north to south then west to east
+    if ring_list is not None:
+        point_array = np.concatenate(ring_list)
+        bounding_box = [point_array[:, 0].min(), point_array[:, 1].min(), point_array[:, 0].max(),
+                        point_array[:, 1].max()]
+    lon_min, lat_min, lon_max, lat_max = bounding_box
+    if lon_min > lon_max or lat_min > lat_max:
+        raise ValueError('bounding box must be LON_MIN LAT_MIN LON_MAX LAT_MAX')
+
+    if collection is not None:
+        pixel_size, pixel_offset = collection_grid_dict[collection]
+        lon_array = get_grid_coordinate_array(lon_min, lon_max, pixel_size, pixel_offset)
+        lat_array = get_grid_coordinate_array(lat_min, lat_max, pixel_size, pixel_offset)
+    else:
+        if spacing is None or spacing <= 0:
+            raise ValueError('grid spacing must be positive')
+        lon_array = get_grid_coordinate_array(lon_min, lon_max, spacing, lon_min)
+        lat_array = get_grid_coordinate_array(lat_min, lat_max, spacing, lat_min)
+
+    # numpy.meshgrid: https://numpy.org/doc/stable/reference/generated/numpy.meshgrid.html
+    lon_grid, lat_grid = np.meshgrid(lon_array, lat_array[::-1])
+    lon_array, lat_array = lon_grid.ravel(), lat_grid.ravel()
+    if ring_list is not None:
+        is_inside = is_inside_polygon(lon_array, lat_array, ring_list)
+        lon_array, lat_array = lon_array[is_inside], lat_array[is_inside]
+    return lon_array, lat_array
+
+
+def read_elevation_file():
+    if not os.path.exists(elevation_file_path):
+        return {}
+    with open(elevation_file_path, 'r', encoding='utf-8') as file:
+        return json.load(file)
+
+
+def save_elevation_file(elevation_dict):
+    # written to a partial file, then renamed: the cache file on disk is always complete
+    if not os.path.exists(gee_raw_data_directory):
+        os.makedirs(gee_raw_data_directory)
+    with open(elevation_file_path + '.part', 'w', encoding='utf-8') as file:
+        json.dump(elevation_dict, file, sort_keys=True)
+    os.replace(elevation_file_path + '.part', elevation_file_path)
+
+
+def get_elevation_array(lon_array, lat_array):
+    # elevations (meters, rounded) of points: cached ones read from the elevation file, missing ones sampled on the
+    # DEM by batches of max_points_per_elevation_request points, then cached (None: no DEM data, e.g. sea)
+    # Earth Engine is used only if some elevations are missing (an error in offline mode)
+    elevation_dict = read_elevation_file()
+    location_key_list = [get_location_key(lon, lat) for lon, lat in zip(lon_array.tolist(), lat_array.tolist())]
+    missing_index_array = np.array([index for index, location_key in enumerate(location_key_list)
+                                    if location_key not in elevation_dict], dtype=np.int64)
+    print(str(len(location_key_list) - len(missing_index_array)) + ' elevation(s) found in ' + elevation_file_path +
+          ', ' + str(len(missing_index_array)) + ' to retrieve')
+
+    for index in range(0, len(missing_index_array), max_points_per_elevation_request):
+        batch_index_array = missing_index_array[index:index + max_points_per_elevation_request]
+        value_array = get_elevation_data(lon_array[batch_index_array], lat_array[batch_index_array], dem_collection,
+                                         dem_band, dem_scale)
+        for batch_index, value in zip(batch_index_array.tolist(), value_array.tolist()):
+            elevation_dict[location_key_list[batch_index]] = None if math.isnan(value) else int(round(value))
+        # cached after each request: not sampled again, even if the run is interrupted afterwards
+        save_elevation_file(elevation_dict)
+
+    return [elevation_dict[location_key] for location_key in location_key_list]
+
+
+def get_grid_station_list(bounding_box=None, polygon_file_path=None, spacing=None, collection=None):
+    # weather stations [lon, lat, elev] of the gridded basin mode; points without elevation are left out
+    ring_list = None if polygon_file_path is None else read_polygon_file(polygon_file_path)
+    lon_array, lat_array = get_grid_location_array(bounding_box, ring_list, spacing, collection)
+    print(str(len(lon_array)) + ' grid point(s)')
+    elevation_list = get_elevation_array(lon_array, lat_array)
+
+    weather_station_list = [[lon, lat, elev] for lon, lat, elev in
+                            zip(lon_array.tolist(), lat_array.tolist(), elevation_list) if elev is not None]
+    if len(weather_station_list) < len(lon_array):
+        print(str(len(lon_array) - len(weather_station_list)) + ' grid point(s) without DEM data left out')
+    return weather_station_list
+
+
+def get_station_name(wgn_id):
+    # 7 -> station_007
+    return 'station_' + str(wgn_id).zfill(3)
+
+
+def set_station_registry(wgn_id_list, weather_stations, rain_years):
+    # weather_stations: [lon, lat, elev] of each ID of wgn_id_list
+    global station_registry_dict, station_rain_years
+    id_array = np.array(wgn_id_list, dtype=np.int64)
+    # column by column: integer elevations stay integers
+    column_dict = {'lon': np.array([weather_station[0] for weather_station in weather_stations]),
+                   'lat': np.array([weather_station[1] for weather_station in weather_stations]),
+                   'elev': np.array([weather_station[2] for weather_station in weather_stations])}
+    order_array = np.argsort(id_array, kind='stable')
+    station_registry_dict = {'id': id_array[order_array],
+                             **{column: array[order_array] for column, array in column_dict.items()}}
+    station_rain_years = rain_years
+
+
+def get_station_dataframe():
+    # content of the station file: columns id, name, lat, lon, elev, rain_yrs
+    return pd.DataFrame({'id': station_registry_dict['id'],
+                         'name': [get_station_name(wgn_id) for wgn_id in station_registry_dict['id'].tolist()],
+                         'lat': station_registry_dict['lat'], 'lon': station_registry_dict['lon'],
+                         'elev': station_registry_dict['elev'], 'rain_yrs': station_rain_years})
+
+
+def get_station_details(station_name):
+    # example: 'station_001' -> [1, 'station_001', 36.4759, 9.4573, 114, 6]
+    # indexes: 0 station ID, 1 station name, 2 lat, 3 lon, 4 elev, 5 rain years
+    wgn_id = int(station_name.rsplit('_', 1)[1])
+    index = int(np.searchsorted(station_registry_dict['id'], wgn_id))
+    if index == len(station_registry_dict['id']) or station_registry_dict['id'][index] != wgn_id:
+        raise KeyError(station_name)
+    return [wgn_id, station_name, station_registry_dict['lat'][index].item(),
+            station_registry_dict['lon'][index].item(), station_registry_dict['elev'][index].item(),
+            station_rain_years]
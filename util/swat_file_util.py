@@ -0,0 +1,143 @@
+"""
+Author........... Gabriel Böhnke
+University....... UCLouvain, Faculty of bioscience engineering
+Email............ gabriel.bohnke@student.uclouvain.be
+
+Description...... SWAT+ weather file util functions
+Version.......... 1.00
+Last changed on.. 17.10.2026
+"""
+
+import os
+import threading
+import numpy as np
+from concurrent.futures import ThreadPoolExecutor
+from util.performance_util import measure_span
+
+# SWAT+ input set: station file, weather generator file, then weather files and CLI-files of all weather stations
+# output directory is set per run (e.g. one directory per shard, see util/shard_util.py)
+swat_input_data_directory = 'SWAT_INPUT_DATA'
+weather_station_directory = swat_input_data_directory + '/WEATHER_STATIONS'
+optional_directory = swat_input_data_directory + '/OPTIONAL_XLSX_FILES'
+station_file_name = 'WGEN_Siliana_stat.csv'
+generator_file_name = 'WGEN_Siliana_mon.csv'
+
+# CLI-files: one per weather file extension, listing weather files of all weather stations
+# first 2 rows of all CLI-files
+# <ext>.cli
+# FILENAME
+cli_file_extension_list = ['pcp', 'tmp', 'wnd', 'hmd', 'slr']
+cli_file_second_row = 'FILENAME'
+
+# SWAT+ weather file: 5 columns separated by a space, empty columns are left blank
+# example of station_001.tmp:
+# station_001.tmp
+# NBYR TSTEP LAT LONG ELEV
+# 6 0 36.4759 9.4573 114
+# 2015 1 7.993280029296898 -0.9363464355468523
+weather_file_column_count = 5
+weather_file_second_row = ['NBYR', 'TSTEP', 'LAT', 'LONG', 'ELEV']
+
+# weather files are formatted and written by background threads: disk writes overlap with the processing of
+# the next variables and weather stations
+max_concurrent_file_writes = 2
+weather_file_executor = None
+weather_file_future_list = []
+weather_file_future_dict = {}  # {file name: future of its last write}, see wait_for_weather_file
+weather_file_lock = threading.Lock()
+
+
+def set_swat_input_data_directory(directory):
+    global swat_input_data_directory, weather_station_directory, optional_directory
+    swat_input_data_directory = directory
+    weather_station_directory = directory + '/WEATHER_STATIONS'
+    optional_directory = directory + '/OPTIONAL_XLSX_FILES'
+
+
+def get_swat_input_data_directory():
+    return swat_input_data_directory
+
+
+def get_weather_station_directory():
+    return weather_station_directory
+
+
+def get_optional_directory():
+    return optional_directory
+
+
+def format_column(values):
+    # column values as text, the way pandas.DataFrame.to_csv writes them: str() of each value,
+    # missing values (NaN) as empty fields
+    values = np.asarray(values)
+    if values.dtype.kind == 'f':
+        # numpy formats floats in bulk with the shortest repr, exactly as str(float)
+        text_array = values.astype(str)
+        text_array[np.isnan(values)] = ''
+        return text_array.tolist()
+    return [str(value) for value in values.tolist()]
+
+
+def write_weather_file(file_path, file_name, station_details, year_array, step_array, list_of_value_arrays):
+    # station_details: [id, name, lat, lon, elev, rain_yrs], e.g. [1, 'station_001', 36.4759, 9.4573, 114, 6]
+    # background thread: weather station and variable given by the file name (see util/performance_util.py)
+    with measure_span('weather_file_write', station_details[1], file_name.rsplit('.', 1)[1]):
+        write_weather_file_content(file_path, file_name, station_details, year_array, step_array,
+                                   list_of_value_arrays)
+
+
+def write_weather_file_content(file_path, file_name, station_details, year_array, step_array,
+                               list_of_value_arrays):
+    column_list = [format_column(year_array), format_column(step_array),
+                   *[format_column(value_array) for value_array in list_of_value_arrays]]
+    # blank columns up to 5 columns: rows then end with a space for each blank column
+    column_list += [[''] * len(year_array) for _ in range(weather_file_column_count - len(column_list))]
+
+    header = ''.join([file_name + ' ' * (weather_file_column_count - 1) + '\n',
+                      ' '.join(weather_file_second_row) + '\n',
+                      ' '.join(str(value) for value in [station_details[5], 0, station_details[2],
+                                                        station_details[3], station_details[4]]) + '\n'])
+
+    # one write for the whole file, no intermediate dataframe
+    # written to a partial file, then renamed: a weather file on disk is always complete (see util/journal_util.py)
+    # (suffix .part, as .tmp is the extension of temperature files)
+    with open(file_path + '.part', 'w', encoding='utf-8') as file:
+        file.write(header)
+        file.writelines(' '.join(row) + '\n' for row in zip(*column_list))
+    os.replace(file_path + '.part', file_path)
+
+    print(file_path + ' saved')
+
+
+def save_weather_file(file_name, station_details, year_array, step_array, list_of_value_arrays):
+    # arrays are copied: the caller may go on changing its dataframe while the file is written
+    global weather_file_executor
+    file_path = weather_station_directory + '/' + file_name
+    with weather_file_lock:
+        if weather_file_executor is None:
+            weather_file_executor = ThreadPoolExecutor(max_workers=max_concurrent_file_writes)
+        future = weather_file_executor.submit(
+            write_weather_file, file_path, file_name, station_details, np.array(year_array),
+            np.array(step_array), [np.array(value_array) for value_array in list_of_value_arrays])
+        weather_file_future_list.append(future)
+        weather_file_future_dict[file_name] = future
+
+
+def wait_for_weather_file(file_name):
+    # the weather file is on disk once this returns (e.g. before its variable is recorded in the run journal); a failed
+    # write is raised here
+    with weather_file_lock:
+        future = weather_file_future_dict.pop(file_name, None)
+    if future is not None:
+        future.result()
+
+
+def wait_for_weather_files():
+    # all weather files are on disk once this returns; a failed write is raised here
+    global weather_file_future_list
+    with weather_file_lock:
+        future_list = weather_file_future_list
+        weather_file_future_list = []
+        weather_file_future_dict.clear()
+    for future in future_list:
+        future.result()
@@ -0,0 +1,166 @@
+"""
+Author........... Gabriel Böhnke
+University....... UCLouvain, Faculty of bioscience engineering
+Email............ gabriel.bohnke@student.uclouvain.be
+
+Description...... weather generator (WGEN) statistics util functions
+Version.......... 1.00
+Last changed on.. 17.10.2026
+"""
+
+import numpy as np
+import pandas as pd
+
+
+def get_wet_dry_transitions(precipitation):
+    # day-to-day transitions of a daily precipitation series, with shifted arrays instead of a rolling window
+    # wet_dry: dry day following a wet day (current == 0 and previous > 0)
+    # wet_wet: wet day following a wet day (current > 0 and previous > 0)
+    # first day has no previous day: 0.0 (NaN comparisons are False as well)
+    current = np.asarray(precipitation, dtype=np.float64)
+    previous = np.empty_like(current)
+    previous[:1] = np.nan
+    previous[1:] = current[:-1]
+
+    with np.errstate(invalid='ignore'):
+        is_previous_wet = previous > 0
+        wet_dry = (current == 0) & is_previous_wet
+        wet_wet = (current > 0) & is_previous_wet
+
+    return wet_dry.astype(np.float64), wet_wet.astype(np.float64)
+
+
+def get_transition_probabilities(month, precipitation):
+    # monthly probabilities of transitions wet -> dry and wet -> wet: number of transitions / number of days
+    # returns a dataframe with columns 'month', 'wet_dry', 'wet_wet', sorted by month (months without days omitted)
+    wet_dry, wet_wet = get_wet_dry_transitions(precipitation)
+
+    # counting by month (1-12) with numpy.bincount, instead of a groupby
+    month = np.asarray(month, dtype=np.int64)
+    row_counter = np.bincount(month, minlength=13)
+    wet_dry_counter = np.bincount(month, weights=wet_dry, minlength=13)
+    wet_wet_counter = np.bincount(month, weights=wet_wet, minlength=13)
+    month_array = np.flatnonzero(row_counter)
+
+    return pd.DataFrame({'month': month_array,
+                         'wet_dry': wet_dry_counter[month_array] / row_counter[month_array],
+                         'wet_wet': wet_wet_counter[month_array] / row_counter[month_array]})
+
+
+# columns of the monthly weather generator file (WGEN_<basin>_mon.csv), in SWAT+ order
+generator_column_list = ['id', 'wgn_id', 'month', 'tmp_max_ave', 'tmp_min_ave', 'tmp_max_sd', 'tmp_min_sd', 'pcp_ave',
+                         'pcp_sd', 'pcp_skew', 'wet_dry', 'wet_wet', 'pcp_days', 'pcp_hhr', 'slr_ave', 'dew_ave',
+                         'wnd_ave']
+
+
+def get_generator_input(wgn_id, df_daily, date_column, column_dict):
+    # daily values of a weather station, as expected by get_generator_data: 'wgn_id', 'date' + renamed value columns
+    # column_dict: {source column: generator input column}, e.g. {'wind_speed': 'wnd'}
+    if df_daily is None:
+        return None
+    df_input = df_daily[[date_column, *column_dict.keys()]].rename(columns={date_column: 'date', **column_dict})
+    df_input.insert(0, 'wgn_id', wgn_id)
+    return df_input
+
+
+def add_year_month_columns(df_daily):
+    # dates are parsed once, for all weather stations together
+    date = pd.to_datetime(df_daily['date'])
+    df_daily['year'] = date.dt.year
+    df_daily['month'] = date.dt.month
+
+
+def get_generator_data(df_daily_temperature, df_daily_precipitation, df_daily_solar_radiation, df_daily_dewpoint,
+                       df_daily_wind_speed, is_precipitation_data_source_imerg):
+    # monthly weather generator statistics of all weather stations at once
+    # input dataframes hold one row per weather station and day, all weather stations concatenated (or None):
+    # - 'wgn_id', 'date'
+    # - temperature: 'tmp_max', 'tmp_min' (°C)
+    # - precipitation: 'pcp' (mm, daily sum), 'pcp_max' (mm, daily max of half-hours - IMERG only)
+    # - solar radiation: 'slr' (MJ/m2); dewpoint: 'dew' (°C); wind speed: 'wnd' (m/s)
+    df_monthly_list = []
+
+    # 1) daily variables: all statistics in one grouped pass by (weather station, month)
+    aggregation_dict = {}
+    if df_daily_temperature is not None:
+        aggregation_dict.update(tmp_max_ave=('tmp_max', 'mean'), tmp_min_ave=('tmp_min', 'mean'),
+                                tmp_max_sd=('tmp_max', 'std'), tmp_min_sd=('tmp_min', 'std'))
+    if df_daily_solar_radiation is not None:
+        aggregation_dict.update(slr_ave=('slr', 'mean'))
+    if df_daily_dewpoint is not None:
+        aggregation_dict.update(dew_ave=('dew', 'mean'))
+    if df_daily_wind_speed is not None:
+        aggregation_dict.update(wnd_ave=('wnd', 'mean'))
+
+    df_daily = None
+    for df_variable in [df_daily_temperature, df_daily_solar_radiation, df_daily_dewpoint, df_daily_wind_speed]:
+        if df_variable is not None:
+            df_variable = df_variable.assign(date=pd.to_datetime(df_variable['date']))
+            if df_daily is None:
+                df_daily = df_variable
+            else:
+                # outer join sorted on keys: days of each weather station stay in chronological order,
+                # days missing for a variable are NaN and skipped by the statistics
+                df_daily = df_daily.merge(df_variable, on=['wgn_id', 'date'], how='outer', sort=True)
+
+    if df_daily is not None:
+        df_daily['month'] = df_daily['date'].dt.month
+        df_monthly_list.append(df_daily.groupby(['wgn_id', 'month'], as_index=False).agg(**aggregation_dict))
+
+    # 2) precipitation: monthly statistics of periods (year + month), by weather station
+    if df_daily_precipitation is not None:
+        df_precipitation = df_daily_precipitation.sort_values(['wgn_id', 'date'], kind='stable').reset_index(
+            drop=True)
+        add_year_month_columns(df_precipitation)
+
+        # transitions between consecutive days, never between two weather stations
+        wet_dry, wet_wet = get_wet_dry_transitions(df_precipitation['pcp'])
+        is_first_day = np.ones(len(df_precipitation), dtype=bool)
+        is_first_day[1:] = df_precipitation['wgn_id'].to_numpy()[1:] != df_precipitation['wgn_id'].to_numpy()[:-1]
+        wet_dry[is_first_day] = 0.0
+        wet_wet[is_first_day] = 0.0
+        df_precipitation['wet_dry'] = wet_dry
+        df_precipitation['wet_wet'] = wet_wet
+
+        # wet day: non-zero precipitation
+        df_precipitation['is_wet'] = (df_precipitation['pcp'] != 0).astype(np.int64)
+
+        if not is_precipitation_data_source_imerg:
+            # assumption that half-hour of interest has received 1/2 of pcp of day with max rainfall
+            df_precipitation['pcp_max'] = df_precipitation['pcp'] / 2
+
+        df_period = df_precipitation.groupby(['wgn_id', 'year', 'month'], as_index=False).agg(
+            pcp_sum=('pcp', 'sum'), pcp_days=('is_wet', 'sum'), pcp_max=('pcp_max', 'max'),
+            wet_dry=('wet_dry', 'sum'), wet_wet=('wet_wet', 'sum'), day_count=('pcp', 'size'))
+
+        # skew of each (weather station, month) computed on its own column of sums (1-D path): same digits as the
+        # golden WGEN_Siliana_mon.csv; a skew of several columns at once (2-D path) may differ in the last digit
+        df_monthly_precipitation = df_period.groupby(['wgn_id', 'month'], as_index=False).agg(
+            pcp_ave=('pcp_sum', 'mean'), pcp_sd=('pcp_sum', 'std'), pcp_skew=('pcp_sum', 'skew'),
+            wet_dry=('wet_dry', 'sum'), wet_wet=('wet_wet', 'sum'), day_count=('day_count', 'sum'),
+            pcp_days=('pcp_days', 'mean'), pcp_hhr=('pcp_max', 'mean'))
+
+        # probabilities of transitions: number of transitions / number of days
+        df_monthly_precipitation['wet_dry'] = df_monthly_precipitation['wet_dry'] / df_monthly_precipitation[
+            'day_count']
+        df_monthly_precipitation['wet_wet'] = df_monthly_precipitation['wet_wet'] / df_monthly_precipitation[
+            'day_count']
+        df_monthly_list.append(df_monthly_precipitation.drop(columns=['day_count']))
+
+    return merge_generator_data(df_monthly_list)
+
+
+def merge_generator_data(df_monthly_list):
+    # monthly statistics of several variables (dataframes with columns 'wgn_id', 'month' + statistics), as one
+    # dataframe in SWAT+ column order; None if there is none
+    if len(df_monthly_list) == 0:
+        return None
+
+    df_generator_data = df_monthly_list[0]
+    for df_monthly in df_monthly_list[1:]:
+        df_generator_data = df_generator_data.merge(df_monthly, on=['wgn_id', 'month'], how='outer', sort=True)
+
+    # id increases by periods of 12
+    df_generator_data['id'] = (df_generator_data['wgn_id'] - 1) * 12 + df_generator_data['month']
+
+    return df_generator_data[[column for column in generator_column_list if column in df_generator_data.columns]]